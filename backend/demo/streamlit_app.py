@@ -60,11 +60,13 @@ def display_metrics(response: Dict[str, Any]):
 
     st.header("Performance Metrics")
     metrics_df = pd.DataFrame({
-        'Metric': ['Total Time', 'API Latency', 'Memory Usage'],
+        'Metric': ['Total Time', 'API Latency', 'Tokens (prompt / completion)', 'Memory Usage', 'Memory Saved'],
         'Value': [
             f"{response['total_time']:.2f} seconds",
             f"{response['generation_time']:.2f} seconds",
-            f"{response['memory_usage']:.2f}%"
+            f"{response['prompt_tokens']} / {response['completion_tokens']}",
+            f"{response['memory_usage'] / 1024 ** 3:.2f} GB",
+            f"{response['memory_saved'] / 1024 ** 3:.2f} GB"
         ]
     })
     st.table(metrics_df)
@@ -0,0 +1,116 @@
+"""
+This script runs the reproducible offline benchmark for the Adaptive LLaMA Proxy (see src/benchmark.py).
+
+To run this script, use the following commands from the backend directory:
+python scripts/benchmark.py run --backend stub --requests 200 --seed 0 --rate 4 --output results/bench.json
+python scripts/benchmark.py run --replay recorded_requests.jsonl --scenario warm
+python scripts/benchmark.py compare results/baseline.json results/bench.json
+
+The run command will:
+1. Build a seeded workload from data/task_classification_data.json, or replay a saved or recorded one
+2. Run it in the cold and/or warm scenario, open-loop at --rate requests/sec or closed-loop with
+   --concurrency clients
+3. Write JSON results with p50/p95/p99 latency, throughput, memory and routing accuracy per scenario
+
+Use --save-workload to keep the generated workload for later replays, and --baseline to print the
+change against an earlier results file. Results carry the commit and a workload digest, so results
+from different commits are comparable when the digests match.
+"""
+
+import os
+import sys
+import json
+import logging
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.adaptive_llama_mlx import AdaptiveLlamaProxy
+from src.benchmark import (SCENARIOS, build_workload, compare, load_workload, parse_mix, run_benchmark,
+                           save_workload)
+
+
+def print_comparison(rows: list) -> None:
+    print(f"{'scenario':<8} {'metric':<38} {'baseline':>14} {'current':>14} {'change':>9}")
+    for row in rows:
+        baseline = "-" if row["baseline"] is None else f"{row['baseline']:.3f}"
+        current = "-" if row["current"] is None else f"{row['current']:.3f}"
+        change = "-" if row["changePercent"] is None else f"{row['changePercent']:+.1f}%"
+        print(f"{row['scenario']:<8} {row['metric']:<38} {baseline:>14} {current:>14} {change:>9}")
+
+
+def run(args: argparse.Namespace) -> None:
+    if args.replay:
+        workload = load_workload(args.replay)
+    else:
+        workload = build_workload(args.requests, seed=args.seed, arrival_rate=args.rate, arrival=args.arrival,
+                                  mix=parse_mix(args.mix) if args.mix else None)
+    if args.save_workload:
+        save_workload(args.save_workload, workload)
+
+    proxy = AdaptiveLlamaProxy(backend=args.backend)
+    try:
+        results = run_benchmark(proxy, workload, scenarios=args.scenario or SCENARIOS, mode=args.mode,
+                                concurrency=args.concurrency, time_scale=args.time_scale,
+                                config={"seed": None if args.replay else args.seed, "rate": args.rate,
+                                        "arrival": args.arrival, "replay": args.replay,
+                                        "routingPolicy": proxy.router.policy,
+                                        "cascade": proxy.cascade is not None,
+                                        "speculative": proxy.speculative is not None,
+                                        "batching": proxy.batching})
+    finally:
+        proxy.close()
+
+    output = json.dumps(results, indent=2, default=str)
+    if args.output:
+        directory = os.path.dirname(args.output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+        print(f"Results saved to {args.output}")
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            print_comparison(compare(json.load(f), results))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Adaptive LLaMA Proxy.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run a benchmark")
+    run_parser.add_argument("--backend", help="Generation backend (defaults to ALP_BACKEND)")
+    run_parser.add_argument("--requests", type=int, default=100, help="Number of requests to generate")
+    run_parser.add_argument("--seed", type=int, default=0, help="Seed for the generated workload")
+    run_parser.add_argument("--rate", type=float, help="Open-loop arrival rate in requests/sec")
+    run_parser.add_argument("--arrival", choices=("poisson", "uniform"), default="poisson")
+    run_parser.add_argument("--concurrency", type=int, default=1, help="Clients in closed-loop runs")
+    run_parser.add_argument("--mix", help='Label weights, e.g. "very_simple=1,simple=1,medium=1,complex=1"')
+    run_parser.add_argument("--mode", choices=("adaptive", "simple", "medium", "complex"), default="adaptive",
+                            help="Route adaptively or send every request to one tier")
+    run_parser.add_argument("--scenario", choices=SCENARIOS, action="append",
+                            help="Scenario to run, may be repeated (default: cold then warm)")
+    run_parser.add_argument("--time-scale", type=float, default=1.0, help="Multiplier for arrival offsets")
+    run_parser.add_argument("--replay", help="Replay a saved workload or a recorded request log")
+    run_parser.add_argument("--save-workload", help="Save the workload as JSON lines")
+    run_parser.add_argument("--output", help="Write the results here instead of printing them")
+    run_parser.add_argument("--baseline", help="Print the change against this earlier results file")
+
+    compare_parser = commands.add_parser("compare", help="Compare two results files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    if args.command == "run":
+        run(args)
+    else:
+        with open(args.baseline) as f, open(args.current) as g:
+            print_comparison(compare(json.load(f), json.load(g)))
+
+
+if __name__ == "__main__":
+    main()
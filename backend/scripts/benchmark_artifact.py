@@ -0,0 +1,118 @@
+"""
+This script compares the memory-mapped classifier artifact (src/artifact.py) with the joblib file across worker processes.
+
+To run this script, use the following command from the backend directory:
+python scripts/benchmark_artifact.py --workers 4
+
+This script will:
+1. Convert data/task_classifier.joblib into data/task_classifier.alp if the artifact does not exist
+   yet (or with --convert)
+2. Extract the spaCy features of the prompts in data/task_classification_data.json once
+3. For each format, start --workers fresh processes side by side. Each one loads the classifier,
+   classifies the prompts and measures its memory once all of them have loaded, so shared pages are
+   split between live processes
+4. Print the load time (including the imports the format needs), the first classification time and
+   the memory added by the classifier per worker: RSS, USS (private pages only) and PSS (shared pages
+   split between the processes sharing them), plus the PSS summed over all workers
+5. Check that both formats predict the same probabilities
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+
+import numpy as np
+import psutil
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+JOBLIB_PATH = os.path.join(DATA_DIR, 'task_classifier.joblib')
+ARTIFACT_PATH = os.path.join(DATA_DIR, 'task_classifier.alp')
+MB = 1024 ** 2
+
+
+def memory(process):
+    info = process.memory_full_info()
+    return {"rss": info.rss, "uss": info.uss, "pss": getattr(info, "pss", info.uss)}
+
+
+def worker(path, prompts, features, loaded, results, done):
+    from src.task_classifier import TaskClassifier
+
+    process = psutil.Process()
+    classifier = TaskClassifier(lazy=True)  # spaCy is not loaded; the features come precomputed
+    before = memory(process)
+    start = time.perf_counter()
+    classifier._load_artifact(path)
+    load_time = time.perf_counter() - start
+    start = time.perf_counter()
+    X = classifier._feature_matrix(prompts, features)
+    probabilities = classifier.pipeline.predict_proba(classifier._pipeline_input(X))
+    classify_time = time.perf_counter() - start
+    loaded.wait()  # Measure once every worker has loaded, so shared pages are split between all of them
+    after = memory(process)
+    results.put({"load": load_time, "classify": classify_time,
+                 "memory": {key: after[key] - before[key] for key in after},
+                 "probabilities": np.asarray(probabilities).tolist()})
+    done.wait()
+
+
+def run_format(path, workers, prompts, features):
+    context = multiprocessing.get_context("spawn")
+    loaded, results, done = context.Barrier(workers), context.Queue(), context.Event()
+    processes = [context.Process(target=worker, args=(path, prompts, features, loaded, results, done))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    reports = [results.get() for _ in processes]
+    done.set()
+    for process in processes:
+        process.join()
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the memory-mapped classifier artifact against joblib.")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--convert", action="store_true", help="Rebuild the artifact from the joblib file first")
+    args = parser.parse_args()
+
+    from src.task_classifier import TaskClassifier
+
+    if args.convert or not os.path.isdir(ARTIFACT_PATH):
+        converter = TaskClassifier(lazy=True)
+        converter.load_model(JOBLIB_PATH)
+        converter.save_artifact(ARTIFACT_PATH)
+        print(f"Converted {JOBLIB_PATH} into {ARTIFACT_PATH}")
+
+    with open(os.path.join(DATA_DIR, 'task_classification_data.json')) as f:
+        prompts = [prompt for label_prompts in json.load(f).values() for prompt in label_prompts]
+    extractor = TaskClassifier(lightweight=True)
+    features = [{name: float(value) for name, value in row.items()} for row in extractor.extract_features_many(prompts)]
+
+    sizes = {"joblib": os.path.getsize(JOBLIB_PATH),
+             "artifact": sum(os.path.getsize(os.path.join(ARTIFACT_PATH, name)) for name in os.listdir(ARTIFACT_PATH))}
+    print(f"\n{args.workers} workers, {len(prompts)} prompts")
+    print(f"{'format':<9} {'on disk MB':>10} {'load ms':>9} {'classify ms':>12} {'RSS MB':>8} {'USS MB':>8} "
+          f"{'PSS MB':>8} {'total PSS MB':>13}")
+    probabilities = {}
+    for name, path in (("joblib", JOBLIB_PATH), ("artifact", ARTIFACT_PATH)):
+        reports = run_format(path, args.workers, prompts, features)
+        probabilities[name] = np.array(reports[0]["probabilities"])
+        median = {key: float(np.median([report[key] for report in reports])) for key in ("load", "classify")}
+        mem = {key: float(np.median([report["memory"][key] for report in reports])) / MB for key in ("rss", "uss", "pss")}
+        total_pss = sum(report["memory"]["pss"] for report in reports) / MB
+        print(f"{name:<9} {sizes[name] / MB:>10.2f} {median['load'] * 1000:>9.1f} {median['classify'] * 1000:>12.1f} "
+              f"{mem['rss']:>8.1f} {mem['uss']:>8.1f} {mem['pss']:>8.1f} {total_pss:>13.1f}")
+
+    difference = np.abs(probabilities["joblib"] - probabilities["artifact"]).max()
+    agreement = (probabilities["joblib"].argmax(axis=1) == probabilities["artifact"].argmax(axis=1)).mean()
+    print(f"\nMax probability difference: {difference:.2e}, predicted class agreement: {agreement:.1%}")
+
+
+if __name__ == "__main__":
+    main()
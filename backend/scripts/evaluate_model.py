@@ -1,156 +1,101 @@
 """
-This script evaluates the Adaptive LLaMA Proxy model on a diverse dataset.
+This script evaluates the Adaptive LLaMA Proxy against single-tier baselines on the same seeded workload.
 
-To run this script, use the following command from the project root directory:
-python3 backend/scripts/evaluate_model.py
+To run this script, use the following command from the backend directory:
+python scripts/evaluate_model.py --requests 100 --seed 0
 
 This script will:
-1. Evaluate the adaptive system
-2. Evaluate the full model baseline
-3. Evaluate the compressed model baseline
-4. Plot and save comparison results
-5. Run a long-term test (24 hours by default)
-6. Plot and save long-term test results
-7. Print model sizes
-
-Note: This script may take a considerable amount of time to run, especially the long-term test.
+1. Build a seeded workload from data/task_classification_data.json (see src/benchmark.py)
+2. Run it with adaptive routing, and with every request sent to the complex (405B) and the simple (8B) tier
+3. Save the JSON results of every mode to evaluation_results.json
+4. Plot and save the latency, throughput and memory comparison as evaluation_results.png
+
+Each mode runs in the warm scenario by default, so model load times do not dominate the comparison;
+pass --scenario cold to include them. Routing accuracy is the share of requests served by the tier their
+dataset label calls for. Response quality is not judged. For load over time, use scripts/benchmark.py
+with --rate.
 """
 
-import sys
 import os
-import time
+import sys
+import json
+import argparse
+
+import matplotlib
+matplotlib.use("Agg")
 import matplotlib.pyplot as plt
-from tqdm import tqdm
 import numpy as np
-import warnings
-import nltk
-import ssl
 
-try:
-    _create_unverified_https_context = ssl._create_unverified_context
-except AttributeError:
-    pass
-else:
-    ssl._create_default_https_context = _create_unverified_https_context
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-nltk.download('wordnet', quiet=True)
+from src.adaptive_llama_mlx import AdaptiveLlamaProxy
+from src.benchmark import SCENARIOS, build_workload, run_benchmark
 
-os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
-warnings.filterwarnings("ignore", message="None of PyTorch, TensorFlow >= 2.0, or Flax have been found.")
+MODES = ('adaptive', 'complex', 'simple')
+MODE_LABELS = {'adaptive': 'Adaptive', 'complex': 'Complex (405B) only', 'simple': 'Simple (8B) only'}
 
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from src.adaptive_llama_mlx import AdaptiveLlamaProxy
-from src.utils import create_diverse_dataset
-
-def evaluate_model(alp, dataset, mode='adaptive'):
-    results = {
-        'very_simple': {'accuracy': 0, 'latency': 0, 'memory': 0},
-        'simple': {'accuracy': 0, 'latency': 0, 'memory': 0},
-        'medium': {'accuracy': 0, 'latency': 0, 'memory': 0},
-        'complex': {'accuracy': 0, 'latency': 0, 'memory': 0}
-    }
-    
-    for item in tqdm(dataset, desc=f"Evaluating {mode} mode"):
-        response = alp.adaptive_generate(item['input'], task_complexity=None if mode == 'adaptive' else mode)
-        
-        complexity = response['task_complexity']
-        latency = response['generation_time']
-        memory = response['memory_usage']
-        
-        accuracy = 1 if item['target'] in response['response'] else 0
-        
-        results[complexity]['accuracy'] += accuracy
-        results[complexity]['latency'] += latency
-        results[complexity]['memory'] += memory
-    
-    for complexity in results:
-        count = sum(1 for item in dataset if alp.classify_task(item['input']) == complexity)
-        if count > 0:
-            for metric in results[complexity]:
-                results[complexity][metric] /= count
-    
-    return results
-
-def run_long_test(alp, hours=24):
-    start_time = time.time()
-    end_time = start_time + (hours * 3600)
-    performance_over_time = []
-    
-    while time.time() < end_time:
-        dataset = create_diverse_dataset(10) 
-        results = evaluate_model(alp, dataset)
-        avg_latency = np.mean([results[c]['latency'] for c in results])
-        performance_over_time.append(((time.time() - start_time) / 3600, avg_latency))
-        time.sleep(300)  # Wait 5 minutes between evaluations
-    
-    return performance_over_time
-
-def plot_results(adaptive_results, full_results, compressed_results):
-    complexities = ['very_simple', 'simple', 'medium', 'complex']
-    metrics = ['accuracy', 'latency', 'memory']
-    
-    fig, axs = plt.subplots(1, 3, figsize=(20, 5))
-    
-    for i, metric in enumerate(metrics):
-        adaptive_values = [adaptive_results[c][metric] for c in complexities]
-        full_values = [full_results[c][metric] for c in complexities]
-        compressed_values = [compressed_results[c][metric] for c in complexities]
-        
-        x = np.arange(len(complexities))
-        width = 0.25
-        
-        axs[i].bar(x - width, adaptive_values, width, label='Adaptive')
-        axs[i].bar(x, full_values, width, label='Full Model')
-        axs[i].bar(x + width, compressed_values, width, label='Compressed Model')
-        
-        axs[i].set_ylabel(metric.capitalize())
-        axs[i].set_title(f'{metric.capitalize()} by Task Complexity')
-        axs[i].set_xticks(x)
-        axs[i].set_xticklabels(complexities, rotation=45)
-        axs[i].legend()
-    
+def evaluate(alp, workload, scenario='warm', concurrency=1):
+    return {mode: run_benchmark(alp, workload, scenarios=[scenario], mode=mode,
+                                concurrency=concurrency)["scenarios"][scenario]
+            for mode in MODES}
+
+
+def plot_results(results, path='evaluation_results.png'):
+    panels = [
+        ('Latency (ms)', lambda summary: [summary['latencyMs'][q] for q in ('p50', 'p95', 'p99')], ['p50', 'p95', 'p99']),
+        ('Throughput (req/s)', lambda summary: [summary['throughput']['requestsPerSecond']], ['requests/s']),
+        ('Peak RSS (GB)', lambda summary: [summary['memory']['peakRssBytes'] / 1024 ** 3], ['peak']),
+    ]
+    fig, axs = plt.subplots(1, len(panels), figsize=(18, 5))
+    width = 0.8 / len(results)
+    for ax, (title, values, ticks) in zip(axs, panels):
+        x = np.arange(len(ticks))
+        for i, (mode, summary) in enumerate(results.items()):
+            ax.bar(x + (i - (len(results) - 1) / 2) * width, values(summary), width, label=MODE_LABELS[mode])
+        ax.set_title(title)
+        ax.set_xticks(x)
+        ax.set_xticklabels(ticks)
+        ax.legend()
     plt.tight_layout()
-    plt.savefig('evaluation_results.png')
+    plt.savefig(path)
     plt.close()
 
-def plot_long_test_results(performance_over_time):
-    hours, latencies = zip(*performance_over_time)
-    plt.figure(figsize=(10, 5))
-    plt.plot(hours, latencies)
-    plt.xlabel('Hours')
-    plt.ylabel('Average Latency')
-    plt.title('System Performance Over Time')
-    plt.savefig('long_test_results.png')
-    plt.close()
 
 def main():
-    alp = AdaptiveLlamaProxy()
-    
-    dataset = create_diverse_dataset(10)
-    
-    print("Evaluating Adaptive System...")
-    adaptive_results = evaluate_model(alp, dataset, mode='adaptive')
-    
-    print("Evaluating Full Model Baseline...")
-    full_results = evaluate_model(alp, dataset, mode='full')
-    
-    print("Evaluating Compressed Model Baseline...")
-    compressed_results = evaluate_model(alp, dataset, mode='2bit')
-    
-    plot_results(adaptive_results, full_results, compressed_results)
+    parser = argparse.ArgumentParser(description="Compare adaptive routing with single-tier baselines.")
+    parser.add_argument("--backend", help="Generation backend (defaults to ALP_BACKEND)")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--scenario", choices=SCENARIOS, default="warm")
+    parser.add_argument("--output", default="evaluation_results.json")
+    args = parser.parse_args()
+
+    workload = build_workload(args.requests, seed=args.seed)
+    alp = AdaptiveLlamaProxy(backend=args.backend)
+    try:
+        results = evaluate(alp, workload, scenario=args.scenario, concurrency=args.concurrency)
+    finally:
+        alp.close()
+
+    with open(args.output, 'w') as f:
+        json.dump({"seed": args.seed, "scenario": args.scenario, "modes": results}, f, indent=2)
+    print(f"Results saved to {args.output}")
+    plot_results(results)
     print("Comparison results plotted and saved as 'evaluation_results.png'")
-    
-    print("Running long-term test...")
-    performance_over_time = run_long_test(alp, hours=24)
-    plot_long_test_results(performance_over_time)
-    print("Long-term test results plotted and saved as 'long_test_results.png'")
-    
-    # Print model sizes
-    for model_type, model_path in alp.model_paths.items():
-        model, _ = alp.model_cache(model_type)
-        model_size = sum(p.nbytes for p in model.parameters().values()) / (1024 * 1024 * 1024)
-        print(f"{model_type} model size: {model_size:.2f} GB")
+
+    for mode, summary in results.items():
+        latency = summary['latencyMs']
+        accuracy = summary['routing']['accuracy']
+        print(f"{MODE_LABELS[mode]:<22} p50 {latency['p50']:8.1f} ms  p95 {latency['p95']:8.1f} ms  "
+              f"p99 {latency['p99']:8.1f} ms  {summary['throughput']['requestsPerSecond']:6.2f} req/s  "
+              f"routing accuracy {accuracy:.2f}")
+
+    # Resident model sizes, as measured when each tier was loaded
+    for model_type, measured in alp.tier_memory.items():
+        print(f"{model_type} model size: {measured['residentBytes'] / 1024 ** 3:.2f} GB")
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,263 @@
+"""
+This script load-tests the /generate endpoint of the API to find its saturation point.
+
+To run this script, use the following commands from the backend directory:
+python scripts/load_test.py --rates 1,2,4,8,16 --duration 30
+python scripts/load_test.py --url http://localhost:8000 --concurrency 1,4,16,64 --duration 30
+
+Without --url, requests go to an in-process instance of src.api:app through httpx's ASGI transport,
+with the stub backend (--backend). Start a server under test with ALP_BACKEND=stub to get the same
+behavior over HTTP.
+
+--mode chooses what the in-process app serves with: the single-process proxy ("single"), the
+multi-process Supervisor ("supervisor", see src/supervisor.py) or both, one after the other, to compare
+their throughput at each step ("both"). With ALP_STUB_LATENCY_SCALE=0 the stub's generation is pure
+Python, so the comparison shows how much holding the GIL limits the single process and how throughput
+scales across cores with worker processes:
+python scripts/load_test.py --mode both --concurrency 1,4,16 --duration 10
+
+The load increases in steps, each --duration seconds long:
+- With --rates, each step is open-loop. Requests arrive at that rate (Poisson or uniform
+  inter-arrival times) whether or not earlier requests have finished, and latency is measured from
+  the arrival time, so queueing counts.
+- With --concurrency, each step is closed-loop, with that many clients sending requests back to back.
+
+Prompts are drawn with a seed from data/task_classification_data.json, weighted by --mix. --model
+chooses how requests are routed: adaptively ("full"), pinned to their dataset label's tier ("label"),
+or pinned to one tier.
+
+For every step it prints the throughput, the goodput (successful responses within --slo-ms per
+second), p50/p95/p99 latency, and the shares of requests rejected by backpressure (429), timed out
+(504) and failed otherwise. The ramp stops early once failures reach --stop-failure-rate.
+Use --output to write the results as JSON.
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.benchmark import LABEL_TIERS, build_workload, git_commit, parse_mix, percentiles
+from src.config import TIERS
+
+
+def parse_steps(value: str, kind) -> List:
+    return [kind(step) for step in value.split(",")]
+
+
+def request_body(request: Dict[str, Any], model: str) -> Dict[str, Any]:
+    if model == "label":
+        model = LABEL_TIERS[request['label']]
+    return {"prompt": request['prompt'], "model": model}
+
+
+async def send(client: httpx.AsyncClient, request: Dict[str, Any], model: str, scheduled: float) -> Dict[str, Any]:
+    record: Dict[str, Any] = {}
+    try:
+        response = await client.post("/generate", json=request_body(request, model))
+        record['status'] = response.status_code
+        if response.status_code == 200:
+            record['tier'] = response.json()["model"]
+    except Exception as e:
+        # Transport errors, malformed responses and, in process, exceptions raised by the app are all
+        # counted as failed requests rather than ending the ramp.
+        record['status'] = None
+        record['error'] = f"{type(e).__name__}: {e}"
+    record['latency'] = time.perf_counter() - scheduled
+    return record
+
+
+async def open_loop_step(client: httpx.AsyncClient, rate: float, duration: float, args: argparse.Namespace,
+                         seed: int) -> List[Dict[str, Any]]:
+    # Draw more requests than the expected count so the arrivals cover the whole step.
+    workload = build_workload(int(rate * duration * 1.5) + 10, seed=seed, arrival_rate=rate, arrival=args.arrival,
+                              mix=args.mix)
+    start = time.perf_counter()
+    tasks = []
+    for request in workload:
+        if request['arrival'] >= duration:
+            break
+        scheduled = start + request['arrival']
+        await asyncio.sleep(max(scheduled - time.perf_counter(), 0.0))
+        tasks.append(asyncio.create_task(send(client, request, args.model, scheduled)))
+    return list(await asyncio.gather(*tasks))
+
+
+async def closed_loop_step(client: httpx.AsyncClient, concurrency: int, duration: float,
+                           args: argparse.Namespace, seed: int) -> List[Dict[str, Any]]:
+    workload = build_workload(1000, seed=seed, mix=args.mix)
+    deadline = time.perf_counter() + duration
+    records: List[Dict[str, Any]] = []
+
+    async def run_client(offset: int) -> None:
+        i = offset
+        while time.perf_counter() < deadline:
+            records.append(await send(client, workload[i % len(workload)], args.model, time.perf_counter()))
+            i += concurrency
+
+    await asyncio.gather(*(run_client(offset) for offset in range(concurrency)))
+    return records
+
+
+def summarize_step(records: List[Dict[str, Any]], elapsed: float, slo: float) -> Dict[str, Any]:
+    ok = [record for record in records if record['status'] == 200]
+    rejected = sum(record['status'] == 429 for record in records)
+    timed_out = sum(record['status'] == 504 for record in records)
+    failed = len(records) - len(ok) - rejected - timed_out
+    by_tier: Dict[str, List[float]] = {}
+    for record in ok:
+        by_tier.setdefault(record['tier'], []).append(record['latency'])
+
+    def share(count: int) -> float:
+        return count / len(records) if records else 0.0
+
+    return {
+        "requests": len(records),
+        "elapsed": elapsed,
+        "throughput": len(ok) / elapsed,
+        "goodput": sum(record['latency'] <= slo for record in ok) / elapsed,
+        "latencyMs": percentiles([record['latency'] for record in ok]),
+        "byTier": {tier: {"requests": len(latencies), "latencyMs": percentiles(latencies)}
+                   for tier, latencies in sorted(by_tier.items())},
+        "backpressureRate": share(rejected),
+        "timeoutRate": share(timed_out),
+        "errorRate": share(failed),
+        "errorSamples": sorted({record.get('error') or f"HTTP {record['status']}"
+                                for record in records if record['status'] not in (200, 429, 504)})[:5],
+    }
+
+
+def print_step(step: Dict[str, Any]) -> None:
+    latency = step['latencyMs'] or {}
+    print(f"{step['load']:>10} {step['requests']:>8} {step['throughput']:>10.2f} {step['goodput']:>9.2f} "
+          f"{latency.get('p50', float('nan')):>9.1f} {latency.get('p95', float('nan')):>9.1f} "
+          f"{latency.get('p99', float('nan')):>9.1f} {step['backpressureRate']:>7.1%} "
+          f"{step['timeoutRate']:>7.1%} {step['errorRate']:>7.1%}")
+
+
+async def run(args: argparse.Namespace, app: Optional[Any] = None) -> List[Dict[str, Any]]:
+    if app is not None:
+        transport = httpx.ASGITransport(app=app)
+        base_url = "http://alp.test"
+    else:
+        transport = None
+        base_url = args.url
+    # No connection limit, so the client never queues requests that the server should see.
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    headers = {"X-API-Key": args.api_key}
+    open_loop = args.concurrency is None
+    loads = args.rates if open_loop else args.concurrency
+    steps = []
+    print(f"{'req/s' if open_loop else 'clients':>10} {'requests':>8} {'ok/s':>10} {'goodput':>9} "
+          f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'429':>7} {'504':>7} {'errors':>7}")
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, headers=headers, limits=limits,
+                                 timeout=args.timeout) as client:
+        for i, load in enumerate(loads):
+            start = time.perf_counter()
+            if open_loop:
+                records = await open_loop_step(client, load, args.duration, args, args.seed + i)
+            else:
+                records = await closed_loop_step(client, load, args.duration, args, args.seed + i)
+            step = {"load": load, **summarize_step(records, time.perf_counter() - start, args.slo_ms / 1000)}
+            steps.append(step)
+            print_step(step)
+            failure_rate = step['backpressureRate'] + step['timeoutRate'] + step['errorRate']
+            if failure_rate >= args.stop_failure_rate:
+                print(f"Stopping: {failure_rate:.1%} of requests failed at {load}")
+                break
+    return steps
+
+
+def compare_steps(single: List[Dict[str, Any]], supervisor: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """The throughput and goodput of each step served by both modes, with the supervisor's speedup."""
+    comparison = []
+    for base, step in zip(single, supervisor):
+        comparison.append({
+            "load": base['load'],
+            "throughput": {"single": base['throughput'], "supervisor": step['throughput']},
+            "goodput": {"single": base['goodput'], "supervisor": step['goodput']},
+            "speedup": step['throughput'] / base['throughput'] if base['throughput'] else None,
+        })
+    return comparison
+
+
+async def run_modes(args: argparse.Namespace, api: Any) -> Dict[str, List[Dict[str, Any]]]:
+    """Run the steps in process once per mode of --mode, swapping the app's proxy in between."""
+    results = {}
+    for mode in (("single", "supervisor") if args.mode == "both" else (args.mode,)):
+        if mode == "supervisor" and not isinstance(api.alp, api.Supervisor):
+            api.alp.close()
+            # Starting the workers blocks until they are ready, so not on the event loop.
+            api.alp = await asyncio.to_thread(api.create_proxy, True)
+        print(f"{mode.capitalize()} process{'es' if mode == 'supervisor' else ''}:")
+        results[mode] = await run(args, api.app)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the Adaptive LLaMA Proxy API.")
+    parser.add_argument("--url", help="Base URL of a running server (default: in-process ASGI app)")
+    parser.add_argument("--backend", default="stub", help="Generation backend of the in-process app")
+    parser.add_argument("--mode", choices=("single", "supervisor", "both"), default="single",
+                        help="Serve the in-process app with the single-process proxy, the Supervisor's worker "
+                             "processes, or both one after the other to compare them")
+    parser.add_argument("--api-key", default=os.environ.get("API_KEY", "load-test"))
+    loads = parser.add_mutually_exclusive_group()
+    loads.add_argument("--rates", type=lambda value: parse_steps(value, float), default=[1.0, 2.0, 4.0, 8.0],
+                       help="Open-loop arrival rates in requests/sec, one step each")
+    loads.add_argument("--concurrency", type=lambda value: parse_steps(value, int),
+                       help="Closed-loop client counts, one step each")
+    parser.add_argument("--arrival", choices=("poisson", "uniform"), default="poisson")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds per step")
+    parser.add_argument("--mix", type=parse_mix, help='Label weights, e.g. "very_simple=1,simple=1,medium=1,complex=1"')
+    parser.add_argument("--model", choices=("full", "label") + TIERS, default="full",
+                        help='Route adaptively ("full"), by dataset label ("label"), or to one tier')
+    parser.add_argument("--slo-ms", type=float, default=2000.0, help="Latency target counted in the goodput")
+    parser.add_argument("--timeout", type=float, default=600.0, help="Client timeout in seconds")
+    parser.add_argument("--stop-failure-rate", type=float, default=0.5,
+                        help="Stop ramping once this share of a step's requests fail")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results as JSON")
+    args = parser.parse_args()
+
+    if args.url is not None:
+        results = {"server": asyncio.run(run(args))}
+    else:
+        # src.api builds its proxy on import, so the backend and the mode have to be chosen first.
+        os.environ["ALP_BACKEND"] = args.backend
+        os.environ["ALP_SUPERVISOR"] = "1" if args.mode == "supervisor" else "0"
+        from src import api
+        try:
+            results = asyncio.run(run_modes(args, api))
+        finally:
+            api.shutdown_workers()
+
+    for mode, steps in results.items():
+        best = max(steps, key=lambda step: step['goodput'])
+        print(f"Peak goodput ({mode}): {best['goodput']:.2f} req/s within {args.slo_ms:.0f} ms at {best['load']}")
+    comparison = compare_steps(results["single"], results["supervisor"]) if len(results) == 2 else None
+    if comparison:
+        print(f"{'load':>10} {'single ok/s':>12} {'supervisor ok/s':>16} {'speedup':>8}")
+        for step in comparison:
+            speedup = f"{step['speedup']:.2f}x" if step['speedup'] is not None else "-"
+            print(f"{step['load']:>10} {step['throughput']['single']:>12.2f} "
+                  f"{step['throughput']['supervisor']:>16.2f} {speedup:>8}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"meta": {"commit": git_commit(), "target": args.url or "asgi",
+                                "backend": None if args.url else args.backend, "cpus": os.cpu_count()},
+                       "config": {key: value for key, value in vars(args).items() if key not in ("api_key", "output")},
+                       "steps": results if len(results) > 1 else next(iter(results.values())),
+                       "comparison": comparison}, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+This script summarizes the trace files written by the tracing layer (src/tracing.py) into a per-stage breakdown.
+
+To run this script, use the following command from the backend directory:
+python scripts/summarize_traces.py traces/alp-traces.jsonl
+
+Spans are grouped by their call path (e.g. POST /generate > route > classify > extract_features). For every
+path it prints how many times the stage ran, its total, self (excluding child stages) and mean time,
+and its share of the time spent in root spans with the same name.
+
+Options:
+    --folded      print folded stacks ("a;b;c <self microseconds>") instead, for flamegraph.pl or speedscope
+    --root NAME   only include traces whose root span is NAME (e.g. adaptive_generate)
+    --min-share   hide stages below this share of their root's time, in percent (default 0)
+"""
+
+import os
+import sys
+import glob
+import json
+import argparse
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+def read_spans(paths: List[str]) -> Iterator[dict]:
+    for pattern in paths:
+        files = sorted(glob.glob(os.path.join(pattern, "*.jsonl"))) if os.path.isdir(pattern) else glob.glob(pattern)
+        for path in files:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    for resource_spans in json.loads(line).get("resourceSpans", []):
+                        for scope_spans in resource_spans.get("scopeSpans", []):
+                            yield from scope_spans.get("spans", [])
+
+
+def span_paths(spans: List[dict]) -> Iterator[Tuple[Tuple[str, ...], float, float]]:
+    """Yield (call path, duration, self time) for every span, in seconds."""
+    by_id = {span["spanId"]: span for span in spans}
+    durations = {span_id: (int(span["endTimeUnixNano"]) - int(span["startTimeUnixNano"])) / 1e9
+                 for span_id, span in by_id.items()}
+    child_time: Dict[str, float] = defaultdict(float)
+    for span_id, span in by_id.items():
+        if span.get("parentSpanId") in by_id:
+            child_time[span["parentSpanId"]] += durations[span_id]
+
+    paths: Dict[str, Tuple[str, ...]] = {}
+
+    def path_of(span_id: str) -> Tuple[str, ...]:
+        if span_id not in paths:
+            span = by_id[span_id]
+            parent = span.get("parentSpanId")
+            # A parent missing from the files (e.g. still open when they were read) makes this span a root.
+            paths[span_id] = (path_of(parent) if parent in by_id else ()) + (span["name"],)
+        return paths[span_id]
+
+    for span_id in by_id:
+        # Children of a streaming request can outlive their parent, so self time is clamped at zero.
+        yield path_of(span_id), durations[span_id], max(durations[span_id] - child_time[span_id], 0.0)
+
+
+def summarize(spans: List[dict], root: Optional[str] = None) -> Dict[Tuple[str, ...], Dict[str, float]]:
+    stages: Dict[Tuple[str, ...], Dict[str, float]] = defaultdict(lambda: {"count": 0, "total": 0.0, "self": 0.0})
+    for path, duration, self_time in span_paths(spans):
+        if root is not None and path[0] != root:
+            continue
+        stage = stages[path]
+        stage["count"] += 1
+        stage["total"] += duration
+        stage["self"] += self_time
+    return dict(stages)
+
+
+def print_breakdown(stages: Dict[Tuple[str, ...], Dict[str, float]], min_share: float = 0.0) -> None:
+    root_totals = {path[0]: stage["total"] for path, stage in stages.items() if len(path) == 1}
+    print(f"{'stage':<48} {'count':>7} {'total ms':>11} {'self ms':>11} {'mean ms':>9} {'share':>7}")
+    children: Dict[Tuple[str, ...], List[Tuple[str, ...]]] = defaultdict(list)
+    for path in stages:
+        children[path[:-1]].append(path)
+
+    def walk(parent: Tuple[str, ...]) -> Iterator[Tuple[str, ...]]:
+        # Children under their parent, the slowest first.
+        for path in sorted(children[parent], key=lambda path: -stages[path]["total"]):
+            yield path
+            yield from walk(path)
+
+    for path in walk(()):
+        stage = stages[path]
+        root_total = root_totals.get(path[0])
+        share = 100 * stage["total"] / root_total if root_total else None
+        if share is not None and share < min_share:
+            continue
+        label = "  " * (len(path) - 1) + path[-1]
+        print(f"{label:<48} {stage['count']:>7} {stage['total'] * 1000:>11.1f} {stage['self'] * 1000:>11.1f} "
+              f"{stage['total'] * 1000 / stage['count']:>9.2f} {f'{share:.1f}%' if share is not None else '-':>7}")
+
+
+def print_folded(stages: Dict[Tuple[str, ...], Dict[str, float]]) -> None:
+    for path, stage in sorted(stages.items()):
+        micros = round(stage["self"] * 1e6)
+        if micros > 0:
+            print(f"{';'.join(name.replace(';', ':') for name in path)} {micros}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Summarize Adaptive LLaMA Proxy trace files.")
+    parser.add_argument("paths", nargs="+", help="Trace files, directories or glob patterns")
+    parser.add_argument("--folded", action="store_true", help="Print folded stacks for flame graph tools")
+    parser.add_argument("--root", help="Only include traces whose root span has this name")
+    parser.add_argument("--min-share", type=float, default=0.0, help="Hide stages below this share (percent)")
+    args = parser.parse_args(argv)
+
+    spans = list(read_spans(args.paths))
+    if not spans:
+        print("No spans found.", file=sys.stderr)
+        return 1
+    stages = summarize(spans, root=args.root)
+    if args.folded:
+        print_folded(stages)
+    else:
+        print_breakdown(stages, min_share=args.min_share)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
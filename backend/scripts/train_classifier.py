@@ -2,7 +2,7 @@
 This script trains the task complexity classifier for the Adaptive LLaMA Proxy.
 
 To run this script, use the following command from the project root directory:
-python3 backend/scripts/train_classifier.py
+python3 backend/scripts/train_classifier.py --n-process 8
 
 This script will:
 1. Load the MMLU dataset
@@ -10,11 +10,17 @@ This script will:
 3. Save the trained classifier
 4. Test the classifier on sample queries
 
-The trained classifier will be saved to 'backend/data/task_classifier.joblib'.
+The trained classifier will be saved to 'backend/data/task_classifier.joblib', and in the memory-mapped
+artifact format (src/artifact.py), which the proxy prefers, to 'backend/data/task_classifier.alp'.
+
+spaCy features are extracted with --n-process processes (default: all CPUs) and cached on disk in
+--feature-cache, so retraining on a grown dataset only parses the new questions. Pass --no-feature-cache
+to skip the cache, and --cv 5 to add 5-fold cross-validation, which refits the model five more times.
 """
 
 import sys
 import os
+import argparse
 from datasets import load_dataset, concatenate_datasets
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report
@@ -25,6 +31,8 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from src.task_classifier import TaskClassifier
 
 CLASSIFIER_PATH = os.path.join('data', 'task_classifier.joblib')
+ARTIFACT_PATH = os.path.join('data', 'task_classifier.alp')
+FEATURE_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "adaptive_llama_proxy", "features")
 
 def load_mmlu_data():
     ds = load_dataset("cais/mmlu", "all")
@@ -62,23 +70,34 @@ def load_mmlu_data():
     
     return df['question'].tolist(), df['complexity'].tolist()
 
-def train_classifier():
+def train_classifier(n_process=1, feature_cache_dir=FEATURE_CACHE_DIR, cv_folds=0):
     print("Loading MMLU data...")
     queries, labels = load_mmlu_data()
 
     print(f"\nTotal samples: {len(queries)}")
 
     classifier = TaskClassifier()
-    classifier.train(queries, labels)
+    classifier.train(queries, labels, n_process=n_process, feature_cache_dir=feature_cache_dir, cv_folds=cv_folds)
 
     print("Saving classifier...")
     classifier.save_model(CLASSIFIER_PATH)
-    print(f"Classifier saved to {CLASSIFIER_PATH}")
+    classifier.save_artifact(ARTIFACT_PATH)
+    print(f"Classifier saved to {CLASSIFIER_PATH} and {ARTIFACT_PATH}")
 
     return classifier
 
 def main():
-    classifier = train_classifier()
+    parser = argparse.ArgumentParser(description="Train the task complexity classifier on MMLU.")
+    parser.add_argument("--n-process", type=int, default=os.cpu_count() or 1,
+                        help="spaCy processes for feature extraction")
+    parser.add_argument("--feature-cache", default=FEATURE_CACHE_DIR, help="Directory of the feature cache")
+    parser.add_argument("--no-feature-cache", action="store_true", help="Extract every feature from scratch")
+    parser.add_argument("--cv", type=int, default=0, help="Cross-validation folds (default 0, no cross-validation)")
+    args = parser.parse_args()
+
+    classifier = train_classifier(n_process=args.n_process,
+                                  feature_cache_dir=None if args.no_feature_cache else args.feature_cache,
+                                  cv_folds=args.cv)
 
     print("\nClassifying sample queries...")
     sample_queries = [
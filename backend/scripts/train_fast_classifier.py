@@ -0,0 +1,126 @@
+"""
+This script trains the fast-path classifier (src/fast_classifier.py) and benchmarks it against the full classifier.
+
+To run this script, use the following command from the backend directory:
+python scripts/train_fast_classifier.py --prompts recorded_requests.jsonl
+
+This script will:
+1. Load the prompts in data/task_classification_data.json, plus any --prompts files (saved benchmark
+   workloads or request logs recorded with ALP_RECORD_REQUESTS)
+2. Label them with the full spaCy + XGBoost classifier (data/task_classifier.joblib), so the fast path
+   learns to agree with it, or with their dataset labels with --labels dataset
+3. Train on 80% of the prompts and report, on the other 20%, the agreement with the full classifier and
+   the per-prompt latency of both, overall and for a range of confidence thresholds
+4. Retrain on all the prompts and save the model to data/fast_classifier.npz
+
+Serve it with ALP_FAST_CLASSIFIER=1, and ALP_FAST_CLASSIFIER_THRESHOLD set to a threshold whose
+agreement is acceptable.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.benchmark import DEFAULT_DATA_PATH, LABEL_TIERS, load_workload, percentiles
+from src.fast_classifier import FastClassifier
+from src.task_classifier import TaskClassifier
+
+CLASSIFIER_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data',
+                               'task_classifier.joblib')
+FAST_CLASSIFIER_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data',
+                                    'fast_classifier.npz')
+THRESHOLDS = (0.5, 0.6, 0.7, 0.8, 0.9, 0.95)
+
+
+def load_prompts(paths):
+    with open(DEFAULT_DATA_PATH, 'r') as f:
+        data = json.load(f)
+    prompts = [(prompt, LABEL_TIERS[label]) for label, label_prompts in data.items() for prompt in label_prompts]
+    for path in paths:
+        prompts.extend((request['prompt'], LABEL_TIERS.get(request.get('label'))) for request in load_workload(path))
+    # Drop duplicates, keeping the first label seen.
+    unique = {}
+    for prompt, label in prompts:
+        unique.setdefault(prompt, label)
+    return list(unique.items())
+
+
+def timed(function, prompts):
+    latencies, outputs = [], []
+    for prompt in prompts:
+        start = time.perf_counter()
+        outputs.append(function(prompt))
+        latencies.append(time.perf_counter() - start)
+    return outputs, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train and benchmark the fast-path classifier.")
+    parser.add_argument("--prompts", action="append", default=[], help="Extra prompts as JSON lines, may be repeated")
+    parser.add_argument("--labels", choices=("teacher", "dataset"), default="teacher",
+                        help="Learn the full classifier's predictions (default) or the dataset labels")
+    parser.add_argument("--buckets", type=int, default=2 ** 15, help="Hashed n-gram buckets (a power of two)")
+    parser.add_argument("--regularization", type=float, default=4.0, help="Inverse regularization strength C")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=FAST_CLASSIFIER_PATH)
+    args = parser.parse_args()
+
+    from sklearn.model_selection import train_test_split
+
+    full = TaskClassifier()
+    full.load_model(CLASSIFIER_PATH)
+    prompts, dataset_labels = zip(*load_prompts(args.prompts))
+    teacher = [max(probabilities, key=probabilities.get) for probabilities in full.classify_many(list(prompts))]
+    if args.labels == "dataset":
+        if None in dataset_labels:
+            parser.error("--labels dataset needs a label for every prompt")
+        labels = list(dataset_labels)
+    else:
+        labels = teacher
+    print(f"Prompts: {len(prompts)}, labels: " + ", ".join(f"{label} {labels.count(label)}" for label in sorted(set(labels))))
+
+    train_prompts, test_prompts, train_labels, _, _, test_teacher = train_test_split(
+        prompts, labels, teacher, test_size=0.2, random_state=args.seed)
+    fast = FastClassifier(n_buckets=args.buckets, regularization=args.regularization)
+    fast.train(train_prompts, train_labels)
+
+    # Warm both paths up so one-off costs (lazy imports, first spaCy call) do not skew the latencies.
+    fast.predict_proba(test_prompts[0])
+    full.classify(test_prompts[0])
+    fast_predictions, fast_latencies = timed(fast.predict_with_confidence, test_prompts)
+    _, full_latencies = timed(full.classify, test_prompts)
+
+    print(f"\nHeld-out prompts: {len(test_prompts)}")
+    fast_ms, full_ms = percentiles(fast_latencies), percentiles(full_latencies)
+    print(f"{'path':<6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, stats in (("fast", fast_ms), ("full", full_ms)):
+        print(f"{name:<6} {stats['p50']:>9.3f} {stats['p95']:>9.3f} {stats['p99']:>9.3f}")
+    print(f"Speedup at p50: {full_ms['p50'] / fast_ms['p50']:.0f}x")
+
+    agreement = sum(label == expected for (label, _), expected in zip(fast_predictions, test_teacher)) / len(test_teacher)
+    print(f"\nFast path agreement with the full classifier: {agreement:.1%}")
+    print(f"{'threshold':>9} {'fast share':>11} {'fast agreement':>15} {'overall agreement':>18} {'mean ms':>9}")
+    for threshold in THRESHOLDS:
+        accepted = [(label, expected) for (label, confidence), expected in zip(fast_predictions, test_teacher)
+                    if confidence >= threshold]
+        agreed = sum(label == expected for label, expected in accepted)
+        # Prompts below the threshold fall back to the full classifier, which agrees with itself.
+        overall = (agreed + len(test_teacher) - len(accepted)) / len(test_teacher)
+        mean_ms = fast_ms['mean'] + (1 - len(accepted) / len(test_teacher)) * full_ms['mean']
+        fast_agreement = f"{agreed / len(accepted):.1%}" if accepted else "-"
+        print(f"{threshold:>9.2f} {len(accepted) / len(test_teacher):>11.1%} {fast_agreement:>15} "
+              f"{overall:>18.1%} {mean_ms:>9.3f}")
+
+    fast = FastClassifier(n_buckets=args.buckets, regularization=args.regularization)
+    fast.train(prompts, labels)
+    fast.save(args.output)
+    print(f"\nFast classifier trained on all {len(prompts)} prompts and saved to {args.output} "
+          f"({os.path.getsize(args.output) / 1024:.0f} KB)")
+
+
+if __name__ == "__main__":
+    main()
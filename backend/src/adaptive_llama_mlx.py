@@ -8,15 +8,30 @@ To use this class:
 2. Use the adaptive_generate() method to generate responses
 
 The class handles:
-- Dynamic model loading and unloading
-- Task complexity classification
-- Memory management
-- Performance metrics tracking
+- Dynamic model loading and unloading through a pluggable generation backend (see backends.py)
+- Task complexity classification and latency/cost-aware routing to a tier (see router.py)
+- Optional response caching with exact and similarity lookup (see response_cache.py)
+- Optional cascade mode that escalates low-confidence drafts from the smallest tier upwards (see cascade.py)
+- Background prefetch and warm-up of the tiers recent traffic is routed to (see prefetch.py)
+- Optional dynamic batching of concurrent requests per model tier (see scheduler.py)
+- Optional per-tier prefix KV cache that skips re-encoding shared prompt prefixes (see prefix_cache.py)
+- Optional speculative decoding of the larger tiers with the resident 8B tier as draft model (see speculative.py)
+- Memory management under a global memory budget with cost-aware eviction (see residency.py)
+- Thread-safe model registry with single-flight loading and atomic usage counters (see registry.py)
+- Per-request accounting: resident bytes per tier, token counts and queue/classify/load/prefill/decode latencies
+- Hot reload of the classifier and tier definitions from a config file, on demand or when it changes (see config.py)
 
 Example usage:
     alp = AdaptiveLlamaProxy()
     response = alp.adaptive_generate("What is the capital of France?")
 
+The generation backend defaults to MLX. Pass backend="stub" (or set ALP_BACKEND=stub) to run the
+proxy against the deterministic CPU stand-in, e.g. for load tests and benchmarks on Linux.
+
+The classifier and model tiers come from the JSON config file in ALP_CONFIG, or from the built-in
+defaults. reload_config() swaps in an edited config while serving; with ALP_CONFIG_WATCH=1 it runs
+whenever the config file or classifier artifact changes.
+
 Note: Ensure that the task classifier is trained and the model files are available before using this class.
 """
 
@@ -24,42 +39,228 @@ import os
 import time
 import psutil
 import logging
-from typing import Dict, Any, Tuple
-from mlx_lm import load, generate
+import threading
+from typing import Dict, Any, Iterator, List, Tuple, Optional, Union
 from src.task_classifier import TaskClassifier
+from src.config import ConfigWatcher, ServingConfig, env_flag
+from src.fast_classifier import FastClassifier
+from src.backends import GenerationBackend, get_backend
+from src.residency import ModelResidencyManager, ResidentModel
+from src.registry import ModelRegistry
+from src.router import Router
+from src.cascade import CascadeGenerator
+from src.speculative import SpeculativeDecoder
+from src.prefix_cache import PrefixCache
+from src import tracing
+from src.metrics import PHASES, THROUGHPUT_BUCKETS, Counter, CounterMap, HistogramMap
+from src.response_cache import ResponseCache
+from src.scheduler import BatchScheduler
+from src.prefetch import ModelPrefetcher
 import concurrent.futures
 
+
+def load_task_classifier(task_classifier: TaskClassifier, classifier_path: str, logger: logging.Logger) -> None:
+    """Load the classifier at `classifier_path`, and attach the fast path if ALP_FAST_CLASSIFIER is set."""
+    if os.path.exists(classifier_path):
+        task_classifier.load_model(classifier_path)
+    else:
+        raise FileNotFoundError(f"Classifier model not found at {classifier_path}. Please train the classifier first.")
+    if env_flag("ALP_FAST_CLASSIFIER"):
+        fast_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'fast_classifier.npz')
+        if os.path.exists(fast_path):
+            task_classifier.set_fast_classifier(
+                FastClassifier.load(fast_path),
+                threshold=float(os.environ.get("ALP_FAST_CLASSIFIER_THRESHOLD", "0.9")))
+        else:
+            logger.warning(f"Fast classifier not found at {fast_path}; run scripts/train_fast_classifier.py. "
+                           "Every prompt takes the full classification path.")
+
+
 class AdaptiveLlamaProxy:
-    def __init__(self):
+    WARMUP_PROMPT = "Hello"
+
+    def __init__(self, backend: Optional[Union[str, GenerationBackend]] = None, memory_budget: Optional[int] = None,
+                 fast_startup: Optional[bool] = None, response_cache: Optional[ResponseCache] = None,
+                 batching: Optional[bool] = None, prefetch: Optional[bool] = None,
+                 serve_while_loading: Optional[bool] = None, cascade: Optional[bool] = None,
+                 speculative: Optional[bool] = None, prefix_cache: Optional[bool] = None,
+                 config: Optional[ServingConfig] = None, config_watch: Optional[bool] = None):
+        init_start = time.perf_counter()
         self.logger = self.setup_logger()
-        self.task_classifier = TaskClassifier()
+        self.backend = backend if isinstance(backend, GenerationBackend) else get_backend(backend)
+        if fast_startup is None:
+            fast_startup = env_flag("ALP_FAST_STARTUP")
+        # The classifier and tier definitions. Replaced as a whole by reload_config, never mutated.
+        self.config = config if config is not None else ServingConfig.load(os.environ.get("ALP_CONFIG"))
+        self._reload_lock = threading.Lock()
+        self.task_classifier = TaskClassifier(lightweight=fast_startup, lazy=fast_startup,
+                                              cache_size=int(os.environ.get("ALP_CLASSIFIER_CACHE_SIZE", "4096")))
         self.load_classifier()
-        self.models: Dict[str, Tuple[Any, Any]] = {}
-        self.model_paths = {
-            'simple': "mlx-community/Meta-Llama-3.1-8B-Instruct-4bit",
-            'medium': "mlx-community/Meta-Llama-3.1-70B-Instruct-4bit",
-            'complex': "mlx-community/Meta-Llama-3.1-405B-2bit"
-        }
-        self.model_sizes = {
-            'simple': 8,
-            'medium': 70,
-            'complex': 405
-        }
+        if memory_budget is None:
+            budget_gb = os.environ.get("ALP_MEMORY_BUDGET_GB")
+            memory_budget = float(budget_gb) * 1024 ** 3 if budget_gb else psutil.virtual_memory().available
+        self.residency = ModelResidencyManager(memory_budget, on_evict=self._release_model, logger=self.logger)
+        if response_cache is None and env_flag("ALP_RESPONSE_CACHE"):
+            similarity = os.environ.get("ALP_RESPONSE_CACHE_SIMILARITY")
+            response_cache = ResponseCache(
+                vectorizer=self.task_classifier.vectorize,
+                max_entries=int(os.environ.get("ALP_RESPONSE_CACHE_SIZE", "1024")),
+                eviction_policy=os.environ.get("ALP_RESPONSE_CACHE_POLICY", "lru"),
+                memory_ttl=float(os.environ.get("ALP_RESPONSE_CACHE_TTL", "3600")),
+                disk_dir=os.environ.get("ALP_RESPONSE_CACHE_DIR"),
+                disk_ttl=float(os.environ.get("ALP_RESPONSE_CACHE_DISK_TTL", str(7 * 24 * 3600))),
+                similarity_threshold=float(similarity) if similarity else None,
+                similarity_max_entries=int(os.environ.get("ALP_RESPONSE_CACHE_SIMILARITY_SIZE", "10000")),
+                logger=self.logger,
+            )
+        self.response_cache = response_cache
+        if self.response_cache is not None:
+            for tier in self.config.tiers:
+                self.response_cache.set_revision(tier, self.config.revision(tier))
+        if batching is None:
+            batching = env_flag("ALP_BATCHING")
+        self.batching = batching
+        self.max_batch_size = int(os.environ.get("ALP_MAX_BATCH_SIZE", "8"))
+        self.max_batch_wait = float(os.environ.get("ALP_MAX_BATCH_WAIT_MS", "10")) / 1000
+        self.schedulers: Dict[str, BatchScheduler] = {}
+        self._scheduler_lock = threading.Lock()
+        # Model loads run on a shared background pool so they can outlive the request that started them.
+        self._load_executor = concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix="alp-loader")
+        self.registry = ModelRegistry(self.residency, self._load_executor, logger=self.logger)
+        if serve_while_loading is None:
+            serve_while_loading = env_flag("ALP_SERVE_WHILE_LOADING")
+        self.serve_while_loading = serve_while_loading
+        self._fallback_requests = Counter()
+        if prefetch is None:
+            prefetch = env_flag("ALP_PREFETCH")
+        self.prefetcher = ModelPrefetcher(self, interval=float(os.environ.get("ALP_PREFETCH_INTERVAL", "1.0")),
+                                          logger=self.logger) if prefetch else None
+        # Measured at load time: residentBytes, rssDelta and loadTime per tier.
+        self.tier_memory: Dict[str, Dict[str, Any]] = {}
+        self._process = psutil.Process()
+        self.router = Router(list(self.model_paths), self.model_sizes,
+                             policy=os.environ.get("ALP_ROUTING_POLICY", "quality-first"),
+                             quality_floor=float(os.environ.get("ALP_QUALITY_FLOOR", "0.8")),
+                             latency_slo=float(os.environ.get("ALP_LATENCY_SLO", "2.0")),
+                             logger=self.logger)
+        if cascade is None:
+            cascade = env_flag("ALP_CASCADE")
+        self.cascade = CascadeGenerator(list(self.model_paths),
+                                        threshold=float(os.environ.get("ALP_CASCADE_THRESHOLD", "0.5")),
+                                        logger=self.logger) if cascade else None
+        if speculative is None:
+            speculative = env_flag("ALP_SPECULATIVE")
+        if speculative and not self.backend.supports_speculative:
+            self.logger.warning(f"The {self.backend.name} backend does not support speculative decoding")
+            speculative = False
+        self.draft_tier = 'simple'
+        self.speculative = SpeculativeDecoder(self.backend, draft_length=int(os.environ.get("ALP_DRAFT_LENGTH", "4")),
+                                              logger=self.logger) if speculative else None
+        if prefix_cache is None:
+            prefix_cache = env_flag("ALP_PREFIX_CACHE")
+        if prefix_cache and not self.backend.supports_prefix_cache:
+            self.logger.warning(f"The {self.backend.name} backend does not support prefix caching")
+            prefix_cache = False
+        self.prefix_caches = {
+            tier: PrefixCache(max_bytes=float(os.environ.get("ALP_PREFIX_CACHE_MB", "512")) * 1024 ** 2,
+                              block_size=int(os.environ.get("ALP_PREFIX_BLOCK_SIZE", "16")))
+            for tier in self.model_paths
+        } if prefix_cache else None
         # Set the cache directory
         self.cache_dir = os.path.join(os.path.expanduser("~"), ".cache", "adaptive_llama_proxy")
         os.environ['TRANSFORMERS_CACHE'] = self.cache_dir
         os.environ['HF_HOME'] = self.cache_dir
 
-        self.model_usage = {"full": 0, "8bit": 0, "4bit": 0}
-        self.total_requests = 0
-        self.total_memory_saved = 0
+        self._model_usage = CounterMap(self.model_paths)
+        self._total_requests = Counter()
+        self._total_memory_saved = Counter()
+        self._tokens = CounterMap(("prompt", "completion"))
+        # Latency histograms keyed by tier. Request latency, TTFT and throughput are observed by the API,
+        # which sees the whole request; model_load_latency only counts actual loads.
+        self.phase_latency = {phase: HistogramMap(keys=self.model_paths) for phase in PHASES}
+        self.request_latency = HistogramMap(keys=self.model_paths)
+        self.ttft = HistogramMap(keys=self.model_paths)
+        self.tokens_per_second = HistogramMap(THROUGHPUT_BUCKETS, keys=self.model_paths)
+        self.model_load_latency = HistogramMap(keys=self.model_paths)
+        if config_watch is None:
+            config_watch = env_flag("ALP_CONFIG_WATCH")
+        self.config_watcher = ConfigWatcher(lambda: [self.config.source, self.config.classifier], self.reload_config,
+                                            interval=float(os.environ.get("ALP_CONFIG_WATCH_INTERVAL", "2.0")),
+                                            logger=self.logger) if config_watch else None
+        self.startup_time = time.perf_counter() - init_start
+        self.logger.info(f"AdaptiveLlamaProxy initialized in {self.startup_time:.2f}s")
 
     def load_classifier(self):
-        classifier_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'task_classifier.joblib')
-        if os.path.exists(classifier_path):
-            self.task_classifier.load_model(classifier_path)
+        # Defaults to the memory-mapped artifact, which worker processes share, over the joblib file.
+        load_task_classifier(self.task_classifier, self.config.classifier, self.logger)
+
+    def reload_config(self, path: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Swap in the serving config at `path` (by default, the current config file re-read) while serving.
+
+        A changed classifier is loaded and tried on a prompt before anything is swapped, so a bad config
+        or artifact raises here and leaves the proxy as it was. The new config and classifier are then
+        swapped in with one assignment each: requests already past routing finish on the old classifier,
+        and requests already holding a model finish on the old weights. Tiers whose weights are unchanged
+        stay resident; a tier whose weights changed is unloaded and, if it was resident, loaded again in
+        the background once the requests still using the old weights have finished (both versions of a
+        tier are never resident at once, so requests for it wait on that load, or are served by a
+        neighbouring tier with serve_while_loading).
+
+        Returns the new config version with the tiers that were reloaded, resized or left unchanged.
+        """
+        with self._reload_lock:
+            old_config, old_classifier = self.config, self.task_classifier
+            config = ServingConfig.load(path or old_config.source)
+            config.version = old_config.version + 1
+            changes = old_config.diff(config)
+            if changes["classifier"]:
+                classifier = old_classifier.reloaded(config.classifier)
+                classifier.classify(self.WARMUP_PROMPT)
+
+            self.config = config
+            if changes["classifier"]:
+                self.task_classifier = classifier
+                if self.response_cache is not None and self.response_cache.vectorizer == old_classifier.vectorize:
+                    self.response_cache.set_vectorizer(classifier.vectorize)
+            for tier in changes["resizedTiers"]:
+                self.router.update_tier(tier, config.tiers[tier]['size'])
+            for tier in changes["reloadedTiers"]:
+                self.router.update_tier(tier, config.tiers[tier]['size'], new_weights=True)
+                if self.response_cache is not None:
+                    self.response_cache.set_revision(tier, config.revision(tier))
+                self._reload_tier(tier)
+        self.logger.info(f"Loaded config version {config.version} from {config.source or 'the defaults'}: "
+                         f"classifier {'reloaded' if changes['classifier'] else 'unchanged'}, "
+                         f"tiers reloaded: {', '.join(changes['reloadedTiers']) or 'none'}")
+        return {"version": config.version, **changes}
+
+    def _reload_tier(self, complexity: str) -> None:
+        """Replace a tier's resident weights with the ones the current config points to."""
+        inflight = self.registry.inflight(complexity)
+        if inflight is not None:
+            # A load that started before the swap may be reading the old weights; let it land, then replace it.
+            concurrent.futures.wait([inflight])
+        resident = complexity in self.registry
+        self.registry.remove(complexity)
+        self.tier_memory.pop(complexity, None)
+        if not resident:
+            return
+        if self.registry.draining(complexity):
+            # The old weights stay in memory until the requests using them finish; load the new ones after.
+            threading.Thread(target=self._reload_when_drained, args=(complexity,), name=f"alp-reload-{complexity}",
+                             daemon=True).start()
         else:
-            raise FileNotFoundError(f"Classifier model not found at {classifier_path}. Please train the classifier first.")
+            self._reload_when_drained(complexity)
+
+    def _reload_when_drained(self, complexity: str) -> None:
+        self._wait_drained(complexity, timeout=300)
+        future = self.load_model_async(complexity, warmup=True)
+        future.add_done_callback(lambda f: self._on_reload_done(complexity, f))
+
+    def _on_reload_done(self, complexity: str, future: concurrent.futures.Future) -> None:
+        if not future.cancelled() and future.exception() is not None:
+            self.logger.warning(f"Reloading {complexity} model failed: {future.exception()}")
 
     def setup_logger(self):
         logger = logging.getLogger(__name__)
@@ -70,34 +271,163 @@ class AdaptiveLlamaProxy:
         logger.addHandler(handler)
         return logger
 
+    @property
+    def model_paths(self) -> Dict[str, str]:
+        return self.config.model_paths
+
+    @property
+    def model_sizes(self) -> Dict[str, float]:
+        return self.config.model_sizes
+
+    @property
+    def model_bits(self) -> Dict[str, int]:
+        """Weight precision of each tier's checkpoint, for size estimates before a tier has been loaded."""
+        return self.config.model_bits
+
+    @property
+    def models(self) -> Dict[str, Tuple[Any, Any]]:
+        return self.registry.models()
+
+    @property
+    def model_usage(self) -> Dict[str, int]:
+        return self._model_usage.snapshot()
+
+    @property
+    def total_requests(self) -> int:
+        return self._total_requests.value
+
+    @property
+    def total_memory_saved(self) -> int:
+        return self._total_memory_saved.value
+
+    @property
+    def fallback_requests(self) -> int:
+        return self._fallback_requests.value
+
     def load_model(self, complexity: str, timeout: int = 300):
-        if complexity not in self.models:
-            self.logger.info(f"Loading {complexity} model...")
-            if not self.check_memory(complexity):
-                raise MemoryError(f"Not enough memory to load {complexity} model")
+        with tracing.span("load_model", tier=complexity) as span:
+            resident = self.registry.get(complexity)
+            span.set_attribute("resident", resident is not None)
+            if resident is not None:
+                return resident
+            # Replaced weights still in use count against the budget until their last request finishes.
+            self._wait_drained(complexity, timeout)
+            future = self.load_model_async(complexity)
             try:
-                with concurrent.futures.ThreadPoolExecutor() as executor:
-                    future = executor.submit(load, self.model_paths[complexity], cache_dir=self.cache_dir)
-                    model, tokenizer = future.result(timeout=timeout)
-                self.models[complexity] = (model, tokenizer)
-                self.logger.info(f"{complexity.capitalize()} model loaded successfully.")
+                return future.result(timeout=timeout)
             except concurrent.futures.TimeoutError:
                 raise TimeoutError(f"Loading {complexity} model timed out after {timeout} seconds")
-            except Exception as e:
-                raise RuntimeError(f"Error loading {complexity} model: {str(e)}")
-        return self.models[complexity]
+
+    def _wait_drained(self, complexity: str, timeout: float) -> None:
+        for entry in self.registry.draining(complexity):
+            entry.released.wait(timeout)
+
+    def acquire_model(self, complexity: str, timeout: int = 300) -> ResidentModel:
+        """
+        Load a tier if needed and pin it for a request, so it is neither evicted nor released while the
+        request generates with it. Unpin with release_model().
+        """
+        while True:
+            self.load_model(complexity, timeout=timeout)
+            entry = self.registry.acquire(complexity)
+            if entry is not None:
+                return entry
+            # Evicted between the load and the pin; load it again.
+
+    def release_model(self, entry: ResidentModel) -> None:
+        self.registry.release(entry)
+
+    def load_model_async(self, complexity: str, warmup: bool = False, evict: bool = True) -> concurrent.futures.Future:
+        """Start loading a tier on the background loader pool, or join the load already in progress."""
+        return self.registry.load_async(complexity, lambda: self._load(complexity, warmup),
+                                        nbytes=self.required_memory(complexity), evict=evict)
+
+    def is_loading(self, complexity: str) -> bool:
+        return self.registry.is_loading(complexity)
+
+    def _load(self, complexity: str, warmup: bool) -> Tuple[Any, Any]:
+        """Load a tier through the backend. Called by the registry, at most once at a time per tier."""
+        self.logger.info(f"Loading {complexity} model...")
+        start_time = time.time()
+        rss_before = self._process.memory_info().rss
+        try:
+            model, tokenizer = self.backend.load(complexity, self.model_paths[complexity], cache_dir=self.cache_dir)
+        except Exception as e:
+            raise RuntimeError(f"Error loading {complexity} model: {str(e)}")
+        load_time = time.time() - start_time
+        # The RSS delta also catches allocations the backend does not report, but concurrent loads blur it.
+        rss_delta = self._process.memory_info().rss - rss_before
+        model_bytes = self.backend.model_nbytes(model)
+        self.tier_memory[complexity] = {
+            "residentBytes": model_bytes if model_bytes is not None else max(rss_delta, 0),
+            "rssDelta": rss_delta,
+            "loadTime": load_time,
+        }
+        self.router.observe_load(complexity, load_time)
+        self.model_load_latency.observe(complexity, load_time)
+        self.logger.info(f"{complexity.capitalize()} model loaded successfully "
+                         f"({self.tier_memory[complexity]['residentBytes'] / 1024 ** 3:.2f} GB in {load_time:.1f}s).")
+        if warmup:
+            self.backend.generate(model, tokenizer, self.WARMUP_PROMPT, max_tokens=1)
+        return model, tokenizer
+
+    def _serving_tier(self, model_type: str) -> Tuple[str, Optional[str]]:
+        """
+        With serve_while_loading, a request for a cold tier is served by the nearest resident tier
+        (preferring the larger one) while the target tier loads in the background.
+        Returns (tier to serve from, original tier if it fell back).
+        """
+        if not self.serve_while_loading or model_type in self.registry:
+            return model_type, None
+        tiers = list(self.model_paths)
+        resident = [tier for tier in tiers if tier in self.registry]
+        if not resident:
+            return model_type, None
+        target = tiers.index(model_type)
+        fallback = min(resident, key=lambda tier: (abs(tiers.index(tier) - target), -tiers.index(tier)))
+        self.load_model_async(model_type, warmup=True)
+        self._fallback_requests.inc()
+        self.logger.info(f"{model_type.capitalize()} model is loading, serving from the resident {fallback} model")
+        return fallback, model_type
+
+    def required_memory(self, complexity: str) -> int:
+        """Bytes reserved in the memory budget for a tier."""
+        backend_estimate = self.backend.estimate_memory(complexity)
+        if backend_estimate is not None:
+            return backend_estimate
+        return int(self.model_sizes[complexity] * 1.5 * 1024 ** 3)  # Estimate 1.5x model size for safety
+
+    def tier_bytes(self, complexity: str) -> int:
+        """Bytes a tier occupies when resident: measured at its last load, else estimated from its checkpoint."""
+        measured = self.tier_memory.get(complexity)
+        if measured is not None and measured["residentBytes"]:
+            return measured["residentBytes"]
+        backend_estimate = self.backend.estimate_memory(complexity)
+        if backend_estimate is not None:
+            return backend_estimate
+        return int(self.model_sizes[complexity] * 1e9 * self.model_bits[complexity] / 8)
 
     def check_memory(self, complexity: str) -> bool:
-        available_memory = psutil.virtual_memory().available / (1024 ** 3)  # Available memory in GB
-        required_memory = self.model_sizes[complexity] * 1.5  # Estimate 1.5x model size for safety
-        return available_memory > required_memory
+        available_memory = psutil.virtual_memory().available  # Available memory in bytes
+        return available_memory > self.required_memory(complexity)
 
     def classify_task(self, prompt: str) -> str:
+        return self.classify_task_with_confidence(prompt)[0]
+
+    def classify_task_with_confidence(self, prompt: str) -> Tuple[str, float]:
         classification, confidence = self.task_classifier.classify_with_confidence(prompt)
         self.logger.info(f"Task classified as {classification} with confidence {confidence:.2f}")
-        return classification if classification != "Uncertain" else "medium"
+        return (classification if classification != "Uncertain" else "medium"), float(confidence)
+
+    def classify_tasks(self, prompts: List[str]) -> List[str]:
+        classifications = []
+        for probabilities in self.task_classifier.classify_many(prompts):
+            classification = max(probabilities, key=probabilities.get)
+            classifications.append(classification if classification != "Uncertain" else "medium")
+        return classifications
 
     def select_model(self, task_complexity: str) -> str:
+        """The tier for an explicitly requested task complexity."""
         complexity_map = {
             'very_simple': 'simple',
             'simple': 'simple',
@@ -106,71 +436,457 @@ class AdaptiveLlamaProxy:
         }
         return complexity_map.get(task_complexity, 'medium')
 
-    def adaptive_generate(self, prompt: str, task_complexity: str = None) -> Dict[str, Any]:
-        self.total_requests += 1
-        if task_complexity is None:
-            task_complexity = self.classify_task(prompt)
-        
-        model_type = self.select_model(task_complexity)
+    def route(self, prompt: str, task_complexity: str = None, policy: Optional[str] = None,
+              cascade: bool = True) -> Tuple[str, str, Optional[float]]:
+        """
+        Classify the prompt if needed and return (task_complexity, model_type, confidence).
+
+        Classified prompts are routed by the Router under `policy` (the configured default if None), or
+        to the first cascade tier when cascade mode is on and `cascade` is True.
+        A forced task complexity always gets its own tier, and the confidence is None.
+        """
+        with tracing.span("route", policy=policy) as span:
+            confidence = None
+            if task_complexity is None:
+                classify_start = time.perf_counter()
+                probabilities = self.task_classifier.classify_cached(prompt)
+                classify_time = time.perf_counter() - classify_start
+                task_complexity = max(probabilities, key=probabilities.get)
+                confidence = probabilities[task_complexity]
+                self.logger.info(f"Task classified as {task_complexity} with confidence {confidence:.2f}")
+                task_complexity = task_complexity if task_complexity != "Uncertain" else "medium"
+                if cascade and self.cascade is not None:
+                    model_type = self.cascade.tiers[0]
+                else:
+                    model_type = self.router.choose(probabilities, resident=self.registry.resident_tiers(), policy=policy)
+                self.phase_latency["classify"].observe(model_type, classify_time)
+            else:
+                model_type = self.select_model(task_complexity)
+            if self.prefetcher is not None:
+                self.prefetcher.record(model_type)
+            span.set_attribute("tier", model_type)
+            return task_complexity, model_type, confidence
+
+    def adaptive_generate(self, prompt: str, task_complexity: str = None, confidence: Optional[float] = None,
+                          model_type: Optional[str] = None, policy: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Generate a response on the routed tier. Callers that already ran route() pass its result as
+        task_complexity, confidence and model_type so the prompt is not routed twice.
+
+        In cascade mode, classified prompts (those with a confidence) go through the cascade instead.
+
+        Besides the response, the result holds the tier's resident bytes (memory_usage), the bytes saved
+        compared with the complex tier (memory_saved), prompt/completion token counts and per-phase
+        latencies in seconds. started_at is the time.perf_counter() value at which the request started here.
+        """
+        with tracing.span("adaptive_generate") as span:
+            result = self._adaptive_generate(prompt, task_complexity, confidence, model_type, policy)
+            span.set_attribute("tier", result.get('model_used'))
+            span.set_attribute("cache_hit", result.get('cache_hit'))
+            return result
+
+    def _adaptive_generate(self, prompt: str, task_complexity: Optional[str], confidence: Optional[float],
+                           model_type: Optional[str], policy: Optional[str]) -> Dict[str, Any]:
+        started_at = time.perf_counter()
+        config = self.config
+        self._total_requests.inc()
+        phases: Dict[str, Optional[float]] = {}
+        if model_type is None:
+            task_complexity, model_type, confidence = self.route(prompt, task_complexity, policy=policy)
+            phases['classify'] = time.perf_counter() - started_at
+
+        if self.response_cache is not None:
+            lookup_start = time.perf_counter()
+            with tracing.span("response_cache_lookup", tier=model_type):
+                cached = self.response_cache.get(prompt, model_type)
+            if cached is not None:
+                response, cache_tier = cached
+                self.logger.info(f"Served {model_type} response from the {cache_tier} response cache")
+                return {
+                    'response': response,
+                    'task_complexity': task_complexity,
+                    'classification_confidence': confidence,
+                    'model_used': model_type,
+                    'generation_time': time.perf_counter() - lookup_start,
+                    'latency': time.perf_counter() - started_at,
+                    'memory_usage': 0,
+                    'memory_saved': self.tier_bytes('complex'),
+                    'prompt_tokens': None,
+                    'completion_tokens': None,
+                    'phases': phases,
+                    'started_at': started_at,
+                    'cache_hit': True,
+                    'cache_tier': cache_tier
+                }
+
+        if self.cascade is not None and confidence is not None:
+            return self._cascade_generate(prompt, task_complexity, confidence, model_type, phases, started_at, config)
+
+        model_type, fallback_from = self._serving_tier(model_type)
+        self.router.started(model_type)
+        generation_time = None
         try:
-            model, tokenizer = self.load_model(model_type)
-        except Exception as e:
-            self.logger.error(f"Error loading model: {str(e)}")
-            return {'error': str(e)}
-        
-        start_time = time.time()
-        response = self.generate_response(prompt, model, tokenizer)
-        generation_time = time.time() - start_time
-        
-        memory_usage = psutil.virtual_memory().percent
-        
-        # Update model usage
-        if model_type == 'simple':
-            self.model_usage['4bit'] += 1
-        elif model_type == 'medium':
-            self.model_usage['8bit'] += 1
-        else:
-            self.model_usage['full'] += 1
-        
-        # Calculate memory savings
-        full_model_size = self.model_sizes['complex']
-        used_model_size = self.model_sizes[model_type]
-        memory_saved = full_model_size - used_model_size
-        self.total_memory_saved += memory_saved
-        
-        self.logger.info(f"Generated response using {model_type} model. Time: {generation_time:.2f}s, Memory: {memory_usage}%")
-        
+            load_start = time.perf_counter()
+            try:
+                entry = self.acquire_model(model_type)
+            except Exception as e:
+                self.logger.error(f"Error loading model: {str(e)}")
+                return {'error': str(e)}
+            model, tokenizer = entry.model, entry.tokenizer
+            phases['load'] = time.perf_counter() - load_start
+            try:
+                generation = self._generate(prompt, model, tokenizer, model_type=model_type)
+            finally:
+                self.release_model(entry)
+            generation_time = generation['time']
+        finally:
+            self.router.finished(model_type, generation_time)
+        response = generation['text']
+        phases.update(prefill=generation['prefill'], decode=generation['decode'])
+        if self.response_cache is not None:
+            self.response_cache.put(prompt, model_type, response, revision=config.revision(model_type))
+
+        prompt_tokens = self.backend.count_tokens(tokenizer, prompt)
+        completion_tokens = self.backend.count_tokens(tokenizer, response)
+        memory_usage = self.tier_bytes(model_type)
+        memory_saved = self._record_usage(model_type, prompt_tokens, completion_tokens, phases)
+
+        self.logger.info(f"Generated response using {model_type} model. Time: {generation_time:.2f}s, "
+                         f"Tokens: {prompt_tokens}+{completion_tokens}, Memory: {memory_usage / 1024 ** 3:.2f} GB")
+
         return {
             'response': response,
             'task_complexity': task_complexity,
+            'classification_confidence': confidence,
             'model_used': model_type,
             'generation_time': generation_time,
+            'latency': time.perf_counter() - started_at,
+            'memory_usage': memory_usage,
+            'memory_saved': memory_saved,
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'phases': phases,
+            'started_at': started_at,
+            'cache_hit': False,
+            'fallback_from': fallback_from
+        }
+
+    def _cascade_generate(self, prompt: str, task_complexity: str, confidence: float, entry_tier: str,
+                          phases: Dict[str, Optional[float]], started_at: float,
+                          config: ServingConfig) -> Dict[str, Any]:
+        tokenizers = {}
+        phases['load'] = 0.0
+
+        def draft(tier: str) -> Tuple[str, Optional[List[float]]]:
+            self.router.started(tier)
+            generation_time = None
+            try:
+                with tracing.span("draft", tier=tier):
+                    load_start = time.perf_counter()
+                    entry = self.acquire_model(tier)
+                    tokenizers[tier] = entry.tokenizer
+                    phases['load'] += time.perf_counter() - load_start
+                    start_time = time.perf_counter()
+                    try:
+                        with tracing.span("generate", tier=tier, path="logprobs"):
+                            result = self.backend.generate_with_logprobs(entry.model, entry.tokenizer, prompt)
+                    finally:
+                        self.release_model(entry)
+                    generation_time = time.perf_counter() - start_time
+            finally:
+                self.router.finished(tier, generation_time)
+            return result
+
+        # What routing straight to the classified tier would be expected to cost right now.
+        direct_tier = self.select_model(task_complexity)
+        direct_latency = self.router.expected_latency(direct_tier, resident=self.registry.resident_tiers())
+        try:
+            with tracing.span("cascade"):
+                result = self.cascade.run(draft)
+        except Exception as e:
+            self.logger.error(f"Error in cascade generation: {str(e)}")
+            return {'error': str(e)}
+        self.cascade.record_saving(direct_latency - result['time'])
+        # Drafts are generated in one call, so prefill and decode are not separated.
+        phases.update(prefill=None, decode=result['time'] - phases['load'])
+
+        model_type = result['tier']
+        if self.response_cache is not None:
+            self.response_cache.put(prompt, entry_tier, result['response'], revision=config.revision(entry_tier))
+        prompt_tokens = self.backend.count_tokens(tokenizers[model_type], prompt)
+        completion_tokens = self.backend.count_tokens(tokenizers[model_type], result['response'])
+        memory_usage = self.tier_bytes(model_type)
+        memory_saved = self._record_usage(model_type, prompt_tokens, completion_tokens, phases)
+        self.logger.info(f"Generated response using {model_type} model after trying {', '.join(result['tiers'])}. "
+                         f"Time: {result['time']:.2f}s, Memory: {memory_usage / 1024 ** 3:.2f} GB")
+        return {
+            'response': result['response'],
+            'task_complexity': task_complexity,
+            'classification_confidence': confidence,
+            'model_used': model_type,
+            'generation_time': result['time'],
+            'latency': time.perf_counter() - started_at,
             'memory_usage': memory_usage,
-            'memory_saved': memory_saved
+            'memory_saved': memory_saved,
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'phases': phases,
+            'started_at': started_at,
+            'cache_hit': False,
+            'fallback_from': None,
+            'cascade': {'tiers': result['tiers'], 'scores': result['scores'], 'escalated': result['escalated']},
         }
 
+    def adaptive_generate_stream(self, prompt: str, task_complexity: str = None, confidence: Optional[float] = None,
+                                 model_type: Optional[str] = None,
+                                 policy: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Streaming variant of adaptive_generate.
+
+        Yields {'token': text} events as the model produces them, followed by one final
+        {'metrics': {...}} event holding the same fields as adaptive_generate's result (without the
+        response) plus time-to-first-token (ttft) and decode tokens/sec. Yields a single
+        {'error': message} event if the model cannot be loaded.
+        """
+        with tracing.span("adaptive_generate_stream") as span:
+            for event in self._adaptive_generate_stream(prompt, task_complexity, confidence, model_type, policy):
+                if 'metrics' in event:
+                    span.set_attribute("tier", event['metrics']['model_used'])
+                    span.set_attribute("cache_hit", event['metrics']['cache_hit'])
+                yield event
+
+    def _adaptive_generate_stream(self, prompt: str, task_complexity: Optional[str], confidence: Optional[float],
+                                  model_type: Optional[str], policy: Optional[str]) -> Iterator[Dict[str, Any]]:
+        started_at = time.perf_counter()
+        config = self.config
+        self._total_requests.inc()
+        phases: Dict[str, Optional[float]] = {}
+        if model_type is None:
+            task_complexity, model_type, confidence = self.route(prompt, task_complexity, policy=policy)
+            phases['classify'] = time.perf_counter() - started_at
+        metrics = {
+            'task_complexity': task_complexity,
+            'classification_confidence': confidence,
+            'model_used': model_type,
+            'fallback_from': None,
+            'phases': phases,
+            'started_at': started_at,
+            'cache_hit': False,
+        }
+
+        if self.response_cache is not None:
+            cached = self.response_cache.get(prompt, model_type)
+            if cached is not None:
+                response, cache_tier = cached
+                yield {'token': response}
+                elapsed = time.perf_counter() - started_at
+                metrics.update(cache_hit=True, cache_tier=cache_tier, ttft=elapsed, latency=elapsed,
+                               generation_time=0.0, tokens_per_second=None, prompt_tokens=None,
+                               completion_tokens=None, memory_usage=0, memory_saved=self.tier_bytes('complex'))
+                yield {'metrics': metrics}
+                return
+
+        model_type, fallback_from = self._serving_tier(model_type)
+        metrics.update(model_used=model_type, fallback_from=fallback_from)
+        self.router.started(model_type)
+        generation_time = None
+        try:
+            load_start = time.perf_counter()
+            try:
+                entry = self.acquire_model(model_type)
+            except Exception as e:
+                self.logger.error(f"Error loading model: {str(e)}")
+                yield {'error': str(e)}
+                return
+            model, tokenizer = entry.model, entry.tokenizer
+            phases['load'] = time.perf_counter() - load_start
+
+            generation_start = time.perf_counter()
+            first_token_time = None
+            segments = []
+            try:
+                with tracing.span("generate", tier=model_type, path="stream"):
+                    for segment in self.backend.stream(model, tokenizer, prompt):
+                        if first_token_time is None:
+                            first_token_time = time.perf_counter()
+                        segments.append(segment)
+                        yield {'token': segment}
+            finally:
+                # Also runs when the client disconnects and the generator is closed.
+                self.release_model(entry)
+            end_time = time.perf_counter()
+            generation_time = end_time - generation_start
+        finally:
+            self.router.finished(model_type, generation_time)
+
+        response = "".join(segments)
+        if self.response_cache is not None:
+            self.response_cache.put(prompt, model_type, response, revision=config.revision(model_type))
+        first_token_time = first_token_time or end_time
+        # The first token marks the end of prefill.
+        phases.update(prefill=first_token_time - generation_start, decode=end_time - first_token_time)
+        prompt_tokens = self.backend.count_tokens(tokenizer, prompt)
+        completion_tokens = self.backend.count_tokens(tokenizer, response)
+        memory_saved = self._record_usage(model_type, prompt_tokens, completion_tokens, phases)
+
+        decode_time = phases['decode']
+        metrics.update(
+            ttft=first_token_time - started_at,
+            latency=end_time - started_at,
+            generation_time=generation_time,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            tokens_per_second=(len(segments) - 1) / decode_time if decode_time > 0 else None,
+            memory_usage=self.tier_bytes(model_type),
+            memory_saved=memory_saved,
+        )
+        self.logger.info(f"Streamed {len(segments)} tokens using {model_type} model. TTFT: {metrics['ttft']:.2f}s")
+        yield {'metrics': metrics}
+
+    def _record_usage(self, model_type: str, prompt_tokens: int = 0, completion_tokens: int = 0,
+                      phases: Optional[Dict[str, Optional[float]]] = None) -> int:
+        """Update the usage counters for a generation on `model_type` and return the bytes saved."""
+        self._model_usage.inc(model_type)
+        self._tokens.inc("prompt", prompt_tokens)
+        self._tokens.inc("completion", completion_tokens)
+        for phase, seconds in (phases or {}).items():
+            # Classification is observed by route() itself.
+            if seconds is not None and phase != "classify":
+                self.phase_latency[phase].observe(model_type, seconds)
+
+        # Memory saved compared with serving every request from the complex tier
+        memory_saved = max(self.tier_bytes('complex') - self.tier_bytes(model_type), 0)
+        self._total_memory_saved.inc(memory_saved)
+        return memory_saved
+
+    def observe_phase(self, phase: str, tier: str, seconds: float) -> None:
+        """Record a phase measured outside the proxy, e.g. the time a request spent queued in the API."""
+        self.phase_latency[phase].observe(tier, seconds)
+
+    def observe_request(self, tier: str, latency: float, ttft: Optional[float] = None,
+                        tokens_per_second: Optional[float] = None) -> None:
+        """Record a finished request as seen by the client: end-to-end latency, TTFT and decode throughput."""
+        self.request_latency.observe(tier, latency)
+        if ttft is not None:
+            self.ttft.observe(tier, ttft)
+        if tokens_per_second is not None:
+            self.tokens_per_second.observe(tier, tokens_per_second)
+
     def get_metrics(self):
         return {
             "modelUsage": self.model_usage,
             "totalRequests": self.total_requests,
-            "totalMemorySaved": self.total_memory_saved
+            "totalMemorySaved": self.total_memory_saved,
+            "tokens": self._tokens.snapshot(),
+            "phases": {phase: histogram.get_stats() for phase, histogram in self.phase_latency.items()},
+            "processMemory": self.get_memory_usage(),
+            "tierMemory": {tier: {**measured, "resident": tier in self.registry}
+                           for tier, measured in self.tier_memory.items()},
+            "residency": self.registry.get_stats(),
+            "classificationCache": self.task_classifier.get_cache_stats(),
+            "classifierPaths": self.task_classifier.get_path_stats(),
+            "responseCache": self.response_cache.get_stats() if self.response_cache is not None else None,
+            "prefetch": self.prefetcher.get_stats() if self.prefetcher is not None else None,
+            "fallbackRequests": self.fallback_requests,
+            "routing": self.router.get_stats(),
+            "cascade": self.cascade.get_stats() if self.cascade is not None else None,
+            "speculative": self.speculative.get_stats() if self.speculative is not None else None,
+            "prefixCache": ({tier: cache.get_stats() for tier, cache in self.prefix_caches.items()}
+                            if self.prefix_caches is not None else None),
+            "batching": {tier: scheduler.get_stats() for tier, scheduler in self.schedulers.items()},
+            "config": self.config.to_dict(),
+            "startup": {"proxyInit": self.startup_time, **self.task_classifier.get_startup_metrics()}
         }
 
-    def generate_response(self, prompt: str, model: Any, tokenizer: Any) -> str:
-        response = generate(model, tokenizer, prompt=prompt, verbose=True)
-        return response
+    def generate_response(self, prompt: str, model: Any, tokenizer: Any, model_type: Optional[str] = None) -> str:
+        return self._generate(prompt, model, tokenizer, model_type=model_type)['text']
 
-    def get_memory_usage(self) -> float:
-        return psutil.virtual_memory().percent
+    def _generate(self, prompt: str, model: Any, tokenizer: Any, model_type: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Generate a response and time it. Returns the text with the prefill, decode and total seconds;
+        prefill is None on paths that cannot separate it from decoding (speculative and batched).
+        """
+        with tracing.span("generate", tier=model_type) as span:
+            start_time = time.perf_counter()
+            text, prefill, path = None, None, "plain"
+            if self.speculative is not None and model_type not in (None, self.draft_tier):
+                # Only draft with the 8B tier when it is already resident; it is never loaded just for this.
+                draft = self.registry.acquire(self.draft_tier)
+                if draft is not None:
+                    try:
+                        text = self.speculative.generate(model, tokenizer, draft.model, draft.tokenizer, prompt,
+                                                         tier=model_type)
+                    finally:
+                        self.registry.release(draft)
+                    path = "speculative"
+            if text is None:
+                if self.prefix_caches is not None and model_type is not None:
+                    text, prefill = self._generate_with_prefix_cache(prompt, model, tokenizer, model_type)
+                    path = "prefix_cache"
+                elif self.batching and model_type is not None:
+                    text = self.get_scheduler(model_type).submit(prompt, model, tokenizer).result()
+                    path = "batched"
+                else:
+                    text, prefill, _ = self.backend.generate_timed(model, tokenizer, prompt)
+            elapsed = time.perf_counter() - start_time
+            span.set_attribute("path", path)
+            span.set_attribute("prefill_seconds", prefill)
+            span.set_attribute("decode_seconds", elapsed - (prefill or 0.0))
+        return {'text': text, 'prefill': prefill, 'decode': elapsed - (prefill or 0.0), 'time': elapsed}
+
+    def _generate_with_prefix_cache(self, prompt: str, model: Any, tokenizer: Any, model_type: str) -> Tuple[str, float]:
+        """
+        Reuse the longest cached prefix of the prompt, and cache the newly prefilled one for later requests.
+        Returns the response and the seconds spent prefilling the uncached part of the prefix.
+        """
+        cache = self.prefix_caches[model_type]
+        ids = tokenizer.encode(prompt)
+        cached_tokens, state = cache.lookup(ids)
+        if state is not None:
+            state = self.backend.truncate_state(state, cached_tokens)
+        boundary = cache.boundary(ids)
+        prefill_start = time.perf_counter()
+        if boundary > cached_tokens:
+            state = self.backend.prefill(model, tokenizer, ids[cached_tokens:boundary], state)
+            cache.put(ids[:boundary], state, self.backend.state_nbytes(state))
+        prefill_time = time.perf_counter() - prefill_start
+        cache.record_prefill(len(ids) - cached_tokens)
+        return self.backend.decode(model, tokenizer, prompt, state, ids[boundary:]), prefill_time
+
+    def get_scheduler(self, model_type: str) -> BatchScheduler:
+        with self._scheduler_lock:
+            if model_type not in self.schedulers:
+                self.schedulers[model_type] = BatchScheduler(self.backend, model_type, max_batch_size=self.max_batch_size,
+                                                             max_wait=self.max_batch_wait, logger=self.logger)
+            return self.schedulers[model_type]
+
+    def get_memory_usage(self) -> int:
+        """Resident set size of the proxy process, in bytes."""
+        return self._process.memory_info().rss
 
     def get_loaded_models(self) -> list:
-        return list(self.models.keys())
+        return self.registry.resident_tiers()
+
+    def _release_model(self, complexity: str, model: Any, tokenizer: Any):
+        if self.prefix_caches is not None:
+            # Cached KV states are only valid for the weights that produced them.
+            self.prefix_caches[complexity].clear()
+        self.backend.unload(model, tokenizer)
+        self.logger.info(f"{complexity.capitalize()} model unloaded.")
 
     def unload_model(self, complexity: str):
-        if complexity in self.models:
-            del self.models[complexity]
-            self.logger.info(f"{complexity.capitalize()} model unloaded.")
+        self.registry.remove(complexity)
+
+    def close(self):
+        """Stop the background prefetcher, config watcher, batch schedulers and loader pool."""
+        if self.prefetcher is not None:
+            self.prefetcher.stop()
+        if self.config_watcher is not None:
+            self.config_watcher.stop()
+        for scheduler in self.schedulers.values():
+            scheduler.stop()
+        self._load_executor.shutdown(wait=False, cancel_futures=True)
 
     def unload_all_models(self):
-        self.models.clear()
+        self.registry.clear()
         self.logger.info("All models unloaded.")
\ No newline at end of file
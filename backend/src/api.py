@@ -1,11 +1,38 @@
 from fastapi import FastAPI, HTTPException, Depends
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.security import APIKeyHeader
 from src.adaptive_llama_mlx import AdaptiveLlamaProxy
+from src.benchmark import RequestRecorder
+from src.config import env_flag
+from src.metrics import PHASES, PrometheusExposition
+from src import tracing
+from src.serving import TierAdmissionController, QueueFullError, RequestTimeoutError
+from src.supervisor import Supervisor, WorkerUnavailableError
 from pydantic import BaseModel
+from typing import Optional
 import os
+import json
+import time
+import logging
 
 app = FastAPI()
-alp = AdaptiveLlamaProxy()
+logger = logging.getLogger(__name__)
+admission = TierAdmissionController()
+
+def create_proxy(supervisor: Optional[bool] = None):
+    """
+    The proxy the API serves: an in-process AdaptiveLlamaProxy or, in supervisor mode (ALP_SUPERVISOR),
+    a Supervisor running classification and generation in worker processes (see supervisor.py).
+    """
+    if supervisor is None:
+        supervisor = env_flag("ALP_SUPERVISOR")
+    if supervisor:
+        return Supervisor(tier_concurrency=admission.tier_concurrency, request_timeout=admission.request_timeout)
+    return AdaptiveLlamaProxy()
+
+alp = create_proxy()
+# Appends every request to a log that scripts/benchmark.py can replay (--replay)
+recorder = RequestRecorder(os.environ["ALP_RECORD_REQUESTS"]) if os.environ.get("ALP_RECORD_REQUESTS") else None
 
 API_KEY = os.environ.get("API_KEY")
 api_key_header = APIKeyHeader(name="X-API-Key")
@@ -13,36 +40,217 @@ api_key_header = APIKeyHeader(name="X-API-Key")
 class PromptRequest(BaseModel):
     prompt: str
     model: str = "full"
+    policy: Optional[str] = None  # Routing policy: quality-first, latency-slo or memory-saver
+
+class ReloadRequest(BaseModel):
+    config: Optional[str] = None  # Path of the config file to load, on the server; default: re-read the current one
 
 async def get_api_key(api_key: str = Depends(api_key_header)):
     if API_KEY and api_key != API_KEY:
         raise HTTPException(status_code=403, detail="Could not validate credentials")
     return api_key
 
+@app.on_event("shutdown")
+def shutdown_workers():
+    admission.shutdown()
+    alp.close()
+    tracing.get_tracer().close()
+
+async def route_request(request: PromptRequest, cascade: bool = True):
+    if recorder is not None:
+        recorder.record(request.prompt, request.model, request.policy)
+    requested_complexity = request.model if request.model != "full" else None
+    try:
+        return await admission.offload(alp.route, request.prompt, requested_complexity, request.policy, cascade)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except WorkerUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except RequestTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+
+def to_ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else seconds * 1000
+
+def request_metrics(result: dict, request_start: float, routed_at: float, ttft: Optional[float] = None) -> dict:
+    """
+    One metrics payload for /generate and the stream: times in ms, memory in GB and bytes.
+    Also records the request in the latency histograms exported on /metrics.
+    """
+    tier = result["model_used"]
+    latency = time.perf_counter() - request_start
+    phases = dict(result["phases"])
+    phases["classify"] = routed_at - request_start
+    # Time between routing and the proxy picking the request up, i.e. waiting in the tier's queue.
+    phases["queue"] = max(result["started_at"] - routed_at, 0.0)
+    alp.observe_phase("queue", tier, phases["queue"])
+    decode, completion_tokens = phases.get("decode"), result["completion_tokens"]
+    if ttft is None and phases.get("prefill") is not None:
+        # Not streamed, so this is when the first token was produced rather than when the client saw it.
+        ttft = latency - decode
+    tokens_per_second = completion_tokens / decode if completion_tokens and decode else None
+    alp.observe_request(tier, latency, ttft=ttft, tokens_per_second=tokens_per_second)
+    baseline = alp.tier_bytes("complex")
+    return {
+        "latency": to_ms(latency),
+        "phases": {phase: to_ms(phases.get(phase)) for phase in PHASES},
+        "tokens": {"prompt": result["prompt_tokens"], "completion": result["completion_tokens"]},
+        "memoryUsage": result["memory_usage"] / 1024 ** 3,
+        "memorySavings": 100 * result["memory_saved"] / baseline if baseline else 0.0,
+        "memorySavedBytes": result["memory_saved"],
+        "taskComplexity": result["task_complexity"],
+        "modelUsage": alp.model_usage,
+        "cacheHit": result.get("cache_hit", False),
+        "cascade": result.get("cascade"),
+    }
+
 @app.post("/generate")
 async def generate(request: PromptRequest, api_key: str = Depends(get_api_key)):
-    result = alp.adaptive_generate(request.prompt, task_complexity=request.model if request.model != "full" else None)
-    metrics = alp.get_metrics()
-    
+    request_start = time.perf_counter()
+    with tracing.span("POST /generate"):
+        task_complexity, model_type, confidence = await route_request(request)
+        routed_at = time.perf_counter()
+        try:
+            result = await admission.run(model_type, alp.adaptive_generate, request.prompt,
+                                         task_complexity=task_complexity, confidence=confidence,
+                                         model_type=model_type)
+        except QueueFullError as e:
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+        except RequestTimeoutError as e:
+            raise HTTPException(status_code=504, detail=str(e))
+    if "error" in result:
+        raise HTTPException(status_code=503, detail=result["error"])
+
     return {
         "response": result["response"],
         "model": result["model_used"],
-        "metrics": {
-            "latency": result["generation_time"],
-            "memoryUsage": result["memory_usage"],
-            "taskComplexity": result["task_complexity"],
-            "modelUsage": metrics["modelUsage"],
-            "memorySavings": result["memory_saved"],
-        }
+        "metrics": request_metrics(result, request_start, routed_at),
     }
 
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/generate/stream")
+async def generate_stream(request: PromptRequest, api_key: str = Depends(get_api_key)):
+    request_start = time.perf_counter()
+    # The span ends when streaming starts; the generation spans are still children of it.
+    with tracing.span("POST /generate/stream"):
+        # Streamed tokens cannot be taken back, so streaming requests skip the cascade.
+        task_complexity, model_type, confidence = await route_request(request, cascade=False)
+        routed_at = time.perf_counter()
+        try:
+            events = await admission.stream(model_type, alp.adaptive_generate_stream, request.prompt,
+                                            task_complexity=task_complexity, confidence=confidence,
+                                            model_type=model_type)
+        except QueueFullError as e:
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+        except RequestTimeoutError as e:
+            raise HTTPException(status_code=504, detail=str(e))
+
+    async def event_stream():
+        try:
+            async for event in events:
+                if "token" in event:
+                    yield sse_event("token", {"token": event["token"]})
+                elif "metrics" in event:
+                    result = event["metrics"]
+                    # The proxy measures time to first token from when it picked the request up.
+                    ttft = result["ttft"] + result["started_at"] - request_start
+                    metrics = request_metrics(result, request_start, routed_at, ttft=ttft)
+                    metrics.update(model=result["model_used"], ttft=to_ms(ttft),
+                                   tokensPerSecond=result["tokens_per_second"])
+                    yield sse_event("metrics", metrics)
+                else:
+                    yield sse_event("error", {"detail": event["error"]})
+        except RequestTimeoutError as e:
+            yield sse_event("error", {"detail": str(e)})
+        except Exception as e:
+            # The response has started, so the client can only learn of the failure from a terminal event.
+            logger.exception(f"Streaming request on the {model_type} model failed")
+            yield sse_event("error", {"detail": str(e)})
+        finally:
+            # Stops the generation (and frees the tier's slot) when the client disconnects mid-stream.
+            await events.aclose()
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.get("/stats")
 async def get_stats(api_key: str = Depends(get_api_key)):
     metrics = alp.get_metrics()
     return {
         "loaded_models": alp.get_loaded_models(),
-        "memory_usage": alp.get_memory_usage(),
+        "memory_usage": metrics["processMemory"] / 1024 ** 3,  # Process RSS in GB
+        "resident_bytes": {tier: measured["residentBytes"] for tier, measured in metrics["tierMemory"].items()
+                           if measured["resident"]},
         "total_requests": metrics["totalRequests"],
         "total_memory_saved": metrics["totalMemorySaved"],
-        "model_usage": metrics["modelUsage"]
-    }
\ No newline at end of file
+        "model_usage": metrics["modelUsage"],
+        "tokens": metrics["tokens"],
+        "phases": {phase: {"count": stats["count"], **{key: to_ms(stats[key]) for key in ("mean", "p50", "p95", "p99")}}
+                   for phase, stats in metrics["phases"].items()},
+        "queues": admission.get_stats()
+    }
+
+@app.post("/admin/reload")
+async def reload_config(request: ReloadRequest, api_key: str = Depends(get_api_key)):
+    """Swap in a new classifier or tier definitions without a restart (see AdaptiveLlamaProxy.reload_config)."""
+    try:
+        return await admission.offload(alp.reload_config, request.config)
+    except (OSError, ValueError) as e:  # Also covers missing files and invalid JSON
+        raise HTTPException(status_code=400, detail=str(e))
+
+def prometheus_metrics() -> str:
+    metrics = alp.get_metrics()
+    registry = metrics["residency"]
+    queues = admission.get_stats()
+    tiers = list(alp.model_paths)
+    exposition = PrometheusExposition(namespace="alp")
+
+    exposition.histogram("request_latency_seconds", "End-to-end request latency, from the API receiving the "
+                         "request to the response being ready.", alp.request_latency.snapshot())
+    exposition.histogram("time_to_first_token_seconds", "Time to the first generated token.", alp.ttft.snapshot())
+    exposition.histogram("tokens_per_second", "Decode throughput per request.", alp.tokens_per_second.snapshot())
+    exposition.histogram("model_load_seconds", "Time to load a model tier.", alp.model_load_latency.snapshot())
+    exposition.histogram("phase_seconds", "Time spent per request phase: queue, classify, load, prefill, decode.",
+                         {(phase, tier): histogram for phase, histograms in alp.phase_latency.items()
+                          for tier, histogram in histograms.snapshot().items()},
+                         labels=("phase", "tier"))
+
+    resident = set(registry["residentModels"])
+    exposition.gauge("model_resident", "Whether the tier is loaded.", {tier: tier in resident for tier in tiers})
+    exposition.gauge("model_loading", "Whether the tier is being loaded.",
+                     {tier: tier in registry["loading"] for tier in tiers})
+    exposition.gauge("model_resident_bytes", "Bytes held by the tier while loaded.",
+                     {tier: metrics["tierMemory"].get(tier, {}).get("residentBytes", 0) if tier in resident else 0
+                      for tier in tiers})
+    exposition.gauge("memory_budget_bytes", "Memory budget for resident tiers.", {(): registry["memoryBudget"]},
+                     labels=())
+    exposition.gauge("memory_used_bytes", "Memory used by resident tiers.", {(): registry["memoryUsed"]}, labels=())
+    exposition.gauge("memory_reserved_bytes", "Memory reserved for tiers being loaded.",
+                     {(): registry["memoryReserved"]}, labels=())
+    exposition.gauge("memory_budget_utilization", "Fraction of the memory budget used or reserved.",
+                     {(): (registry["memoryUsed"] + registry["memoryReserved"]) / registry["memoryBudget"]
+                      if registry["memoryBudget"] else 0.0}, labels=())
+    exposition.gauge("process_resident_memory_bytes", "Resident set size of the API process.",
+                     {(): metrics["processMemory"]}, labels=())
+    exposition.gauge("config_version", "Serving config reloads since startup.",
+                     {(): metrics["config"]["version"]}, labels=())
+    exposition.gauge("queue_depth", "Requests waiting for a slot on the tier.", queues["waiting"])
+    exposition.gauge("requests_in_flight", "Requests running on the tier.", queues["active"])
+    exposition.gauge("queue_limit", "Requests allowed to wait on the tier.", queues["maxQueue"])
+
+    exposition.counter("requests_total", "Requests served per tier.", metrics["modelUsage"])
+    exposition.counter("requests_rejected_total", "Requests rejected because the queue was full.", queues["rejected"])
+    exposition.counter("request_timeouts_total", "Requests that timed out.", queues["timeouts"])
+    exposition.counter("tokens_total", "Prompt and completion tokens processed.", metrics["tokens"], labels=("kind",))
+    exposition.counter("classifications_total", "Uncached classifications by path: the fast path or the full spaCy path.",
+                       {path: metrics["classifierPaths"][path] for path in ("fast", "full")}, labels=("path",))
+    exposition.counter("model_loads_total", "Model loads per tier.", registry["loads"])
+    exposition.counter("model_evictions_total", "Tiers evicted to make room for others.",
+                       {(): registry["evictions"]}, labels=())
+    return exposition.render()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_prometheus_metrics(api_key: str = Depends(get_api_key)):
+    return PlainTextResponse(prometheus_metrics(), media_type=PrometheusExposition.CONTENT_TYPE)
@@ -0,0 +1,361 @@
+"""
+This file defines ClassifierArtifact, a versioned, memory-mapped on-disk format for the task classifier.
+
+A joblib file unpickles into private heap objects, so every worker process holds its own copy of the
+TF-IDF vocabulary and the XGBoost booster, and pays the deserialization cost at boot. An artifact is a
+directory of .npy arrays plus a JSON manifest:
+
+    task_classifier.alp/
+        manifest.json      format version, classes, TF-IDF and scaler parameters, array checksums
+        *.npy              the TF-IDF vocabulary (sorted terms and their columns), idf, scaler mean/scale,
+                           and the booster flattened into node arrays
+
+The arrays are opened with np.load(mmap_mode="r"), so loading reads no array data, and worker processes
+that load the same artifact share the page-cache pages instead of each holding a private copy. That
+includes the vocabulary, which is looked up by binary search over the sorted terms (see MappedVocabulary)
+rather than rebuilt into a dict in every process. The booster is evaluated by walking the flattened trees
+with numpy (see MappedForest), which reproduces XGBoost's predictions, including its handling of missing
+sparse entries, without importing xgboost or scikit-learn.
+
+The artifact path is a symlink to the current version's directory (task_classifier.alp.v<N>). save()
+writes a complete new version next to it and then swaps the symlink with one os.replace, so a
+concurrent load (e.g. a hot reload, see config.py) sees either the old or the new version, never a
+partial one or no artifact at all. The previous version is kept for loads that resolved it just
+before the swap; older ones are deleted.
+
+Only what the classifier uses is supported: a word-analyzer TfidfVectorizer, a StandardScaler and a
+multi:softprob XGBClassifier with numerical splits. from_sklearn raises ValueError for anything else.
+
+Example:
+    ClassifierArtifact.from_sklearn(pipeline, tfidf, label_encoder).save("data/task_classifier.alp")
+    artifact = ClassifierArtifact.load("data/task_classifier.alp")
+    probabilities = artifact.pipeline.predict_proba(X)
+"""
+
+import os
+import re
+import json
+import shutil
+import hashlib
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+FORMAT = "alp-classifier"
+FORMAT_VERSION = 2
+MANIFEST = "manifest.json"
+
+
+class MappedVocabulary:
+    """
+    A TF-IDF vocabulary as two arrays: the terms' UTF-8 bytes, sorted and padded to the longest term
+    (numpy's fixed-width bytes dtype), and each term's column.
+    """
+
+    def __init__(self, terms: np.ndarray, columns: np.ndarray):
+        self.terms = terms
+        self.columns = columns
+
+    @staticmethod
+    def arrays(vocabulary: Dict[str, int]) -> Dict[str, np.ndarray]:
+        """The arrays for a {term: column} vocabulary, as TfidfVectorizer.vocabulary_ stores it."""
+        encoded = sorted((term.encode("utf-8"), column) for term, column in vocabulary.items())
+        width = max((len(term) for term, _ in encoded), default=1)
+        return {"vocabulary_terms": np.array([term for term, _ in encoded], dtype=f"S{width}"),
+                "vocabulary_columns": np.array([column for _, column in encoded], dtype=np.int32)}
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def lookup(self, terms: List[str]) -> np.ndarray:
+        """The column of each term, or -1 for terms not in the vocabulary."""
+        if not terms or not len(self.terms):
+            return np.full(len(terms), -1, dtype=np.int32)
+        width = self.terms.dtype.itemsize
+        encoded = [term.encode("utf-8") for term in terms]
+        # A term longer than the widest one cannot match, and would be truncated into a false match.
+        fits = np.fromiter((len(term) <= width for term in encoded), dtype=bool, count=len(encoded))
+        keys = np.array([term if len(term) <= width else b"" for term in encoded], dtype=self.terms.dtype)
+        index = np.minimum(np.searchsorted(self.terms, keys), len(self.terms) - 1)
+        return np.where(fits & (self.terms[index] == keys), self.columns[index], -1)
+
+
+class MappedTfidf:
+    """TfidfVectorizer.transform for the word analyzer, over a memory-mapped vocabulary and idf vector."""
+
+    def __init__(self, vocabulary: MappedVocabulary, idf: Optional[np.ndarray], params: Dict[str, Any]):
+        self.vocabulary = vocabulary
+        self.idf_ = idf
+        self.params = params
+        self._token_pattern = re.compile(params["token_pattern"])
+        self._ngram_range = tuple(params["ngram_range"])
+
+    def _terms(self, text: str) -> List[str]:
+        if self.params["lowercase"]:
+            text = text.lower()
+        tokens = self._token_pattern.findall(text)
+        low, high = self._ngram_range
+        if high == 1:
+            return tokens
+        terms = list(tokens) if low == 1 else []
+        for n in range(max(low, 2), high + 1):
+            terms.extend(" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+        return terms
+
+    def transform(self, texts: List[str]) -> "sparse.csr_matrix":
+        from scipy import sparse
+        indices, values, indptr = [], [], [0]
+        for text in texts:
+            found = self.vocabulary.lookup(self._terms(text))
+            columns, counts = np.unique(found[found >= 0], return_counts=True)
+            tf = counts.astype(np.float64)
+            if self.params["binary"]:
+                tf[:] = 1.0
+            elif self.params["sublinear_tf"]:
+                tf = np.log(tf) + 1.0
+            if self.idf_ is not None:
+                tf *= self.idf_[columns]
+            if self.params["norm"] == "l2":
+                norm = np.sqrt(np.dot(tf, tf))
+            elif self.params["norm"] == "l1":
+                norm = np.abs(tf).sum()
+            else:
+                norm = 0.0
+            if norm > 0:
+                tf /= norm
+            indices.append(columns)
+            values.append(tf)
+            indptr.append(indptr[-1] + len(columns))
+        return sparse.csr_matrix((np.concatenate(values) if values else np.empty(0),
+                                  np.concatenate(indices) if indices else np.empty(0, dtype=np.int32), indptr),
+                                 shape=(len(texts), len(self.vocabulary)))
+
+
+class MappedScaler:
+    def __init__(self, mean: Optional[np.ndarray], scale: Optional[np.ndarray]):
+        self.mean_ = mean
+        self.scale_ = scale
+        self.with_mean = mean is not None
+
+    def transform(self, X: Any) -> Any:
+        if hasattr(X, "tocsr"):
+            X = X.tocsr(copy=True)
+            if self.scale_ is not None:
+                X.data /= self.scale_[X.indices]
+            return X
+        X = np.asarray(X, dtype=np.float64)
+        if self.mean_ is not None:
+            X = X - self.mean_
+        return X / self.scale_ if self.scale_ is not None else X
+
+
+class MappedForest:
+    """
+    A multi:softprob XGBoost booster flattened into node arrays. All trees are walked together, one
+    level per step: at a split node a row goes left when its feature value is below the threshold, or
+    in the node's default direction when the value is missing (NaN). At a leaf, the threshold array
+    holds the leaf's value instead, as XGBoost's split_conditions do.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], num_class: int, max_depth: int, base_margin: float):
+        self.left = arrays["tree_left"]
+        self.right = arrays["tree_right"]
+        self.feature = arrays["tree_feature"]
+        self.threshold = arrays["tree_threshold"]
+        self.default_left = arrays["tree_default_left"]
+        self.roots = arrays["tree_roots"]
+        self.tree_class = arrays["tree_class"]
+        self.num_class = num_class
+        self.max_depth = max_depth
+        self.base_margin = base_margin
+
+    def margins(self, X: np.ndarray) -> np.ndarray:
+        rows = np.arange(X.shape[0])[:, None]
+        node = np.broadcast_to(self.roots, (X.shape[0], len(self.roots))).copy()
+        for _ in range(self.max_depth):
+            left = self.left[node]
+            split = left >= 0
+            if not split.any():
+                break
+            x = X[rows, self.feature[node]]
+            go_left = np.where(np.isnan(x), self.default_left[node], x < self.threshold[node])
+            node = np.where(split, np.where(go_left, left, self.right[node]), node)
+        margins = np.full((X.shape[0], self.num_class), self.base_margin, dtype=np.float64)
+        leaf_values = self.threshold[node].astype(np.float64)
+        for class_index in range(self.num_class):
+            margins[:, class_index] += leaf_values[:, self.tree_class == class_index].sum(axis=1)
+        return margins
+
+
+class MappedPipeline:
+    """The scaler + booster pipeline, with the predict_proba and named_steps that TaskClassifier uses."""
+
+    def __init__(self, scaler: MappedScaler, forest: MappedForest):
+        self.named_steps = {"scaler": scaler, "clf": forest}
+
+    def predict_proba(self, X: Any) -> np.ndarray:
+        scaled = self.named_steps["scaler"].transform(X)
+        if hasattr(scaled, "tocsr"):
+            # XGBoost treats the entries a sparse matrix does not store as missing, not as zeros.
+            dense = np.full(scaled.shape, np.nan, dtype=np.float32)
+            coo = scaled.tocoo()
+            dense[coo.row, coo.col] = coo.data
+        else:
+            dense = scaled.astype(np.float32)  # XGBoost compares features in single precision
+        margins = self.named_steps["clf"].margins(dense)
+        exp = np.exp(margins - margins.max(axis=1, keepdims=True))
+        return exp / exp.sum(axis=1, keepdims=True)
+
+
+class MappedLabelEncoder:
+    def __init__(self, classes: List[str]):
+        self.classes_ = np.array(classes)
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _versions(path: str) -> List[int]:
+    """The version numbers of the complete artifact directories saved next to `path`."""
+    directory, prefix = os.path.dirname(path), f"{os.path.basename(path)}.v"
+    if not os.path.isdir(directory):
+        return []
+    return [int(name[len(prefix):]) for name in os.listdir(directory)
+            if name.startswith(prefix) and name[len(prefix):].isdigit()]
+
+
+class ClassifierArtifact:
+    TFIDF_PARAMS = ("lowercase", "token_pattern", "ngram_range", "norm", "use_idf", "sublinear_tf", "binary")
+
+    def __init__(self, manifest: Dict[str, Any], arrays: Dict[str, np.ndarray]):
+        self.manifest = manifest
+        self.arrays = arrays
+        self.tfidf = MappedTfidf(MappedVocabulary(arrays["vocabulary_terms"], arrays["vocabulary_columns"]),
+                                 arrays.get("idf"), manifest["tfidf"])
+        forest = MappedForest(arrays, num_class=len(manifest["classes"]), max_depth=manifest["booster"]["maxDepth"],
+                              base_margin=manifest["booster"]["baseMargin"])
+        self.pipeline = MappedPipeline(MappedScaler(arrays.get("scaler_mean"), arrays.get("scaler_scale")), forest)
+        self.label_encoder = MappedLabelEncoder(manifest["classes"])
+
+    @classmethod
+    def from_sklearn(cls, pipeline: Any, tfidf: Any, label_encoder: Any) -> "ClassifierArtifact":
+        """Convert the (pipeline, tfidf, label_encoder) triple stored in the classifier's joblib file."""
+        params = tfidf.get_params()
+        unsupported = [name for name in ("preprocessor", "tokenizer", "stop_words", "strip_accents")
+                       if params.get(name) is not None]
+        if params["analyzer"] != "word" or unsupported:
+            raise ValueError(f"Unsupported TfidfVectorizer settings: analyzer={params['analyzer']}, {unsupported}")
+        scaler, booster = pipeline.named_steps["scaler"], pipeline.named_steps["clf"].get_booster()
+        model = json.loads(booster.save_raw("json"))["learner"]
+        if model["objective"]["name"] != "multi:softprob":
+            raise ValueError(f"Unsupported XGBoost objective: {model['objective']['name']}")
+        trees = model["gradient_booster"]["model"]["trees"]
+        if any(any(tree["split_type"]) for tree in trees):
+            raise ValueError("Categorical splits are not supported")
+
+        arrays = MappedVocabulary.arrays(tfidf.vocabulary_)
+        if params["use_idf"]:
+            arrays["idf"] = np.asarray(tfidf.idf_, dtype=np.float64)
+        if scaler.with_mean:
+            arrays["scaler_mean"] = np.asarray(scaler.mean_, dtype=np.float64)
+        if scaler.with_std:
+            arrays["scaler_scale"] = np.asarray(scaler.scale_, dtype=np.float64)
+        offsets = np.cumsum([0] + [len(tree["left_children"]) for tree in trees[:-1]])
+
+        def children(key: str) -> np.ndarray:
+            return np.concatenate([np.where(np.asarray(tree[key]) >= 0, np.asarray(tree[key]) + offset, -1)
+                                   for tree, offset in zip(trees, offsets)]).astype(np.int32)
+
+        arrays.update(
+            tree_left=children("left_children"),
+            tree_right=children("right_children"),
+            tree_feature=np.concatenate([tree["split_indices"] for tree in trees]).astype(np.int32),
+            # At a leaf, the split condition holds the leaf's value, already scaled by the learning rate.
+            tree_threshold=np.concatenate([tree["split_conditions"] for tree in trees]).astype(np.float32),
+            tree_default_left=np.concatenate([tree["default_left"] for tree in trees]).astype(bool),
+            tree_roots=offsets.astype(np.int32),
+            tree_class=np.asarray(model["gradient_booster"]["model"]["tree_info"], dtype=np.int32),
+        )
+
+        def depth(tree: Dict[str, Any], node: int = 0) -> int:
+            if tree["left_children"][node] < 0:
+                return 0
+            return 1 + max(depth(tree, tree["left_children"][node]), depth(tree, tree["right_children"][node]))
+
+        manifest = {
+            "format": FORMAT,
+            "formatVersion": FORMAT_VERSION,
+            "classes": [str(class_name) for class_name in label_encoder.classes_],
+            "tfidf": {name: params[name] for name in cls.TFIDF_PARAMS},
+            "booster": {"maxDepth": max(depth(tree) for tree in trees), "trees": len(trees),
+                        "baseMargin": float(model["learner_model_param"]["base_score"]),
+                        "numFeature": int(model["learner_model_param"]["num_feature"])},
+        }
+        return cls(manifest, arrays)
+
+    def save(self, path: str) -> None:
+        """Write a new version of the artifact and atomically point `path` at it once it is complete."""
+        path = os.path.abspath(path)
+        versions = _versions(path)
+        version = f"{path}.v{max(versions, default=0) + 1}"
+        staging = f"{version}.tmp"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        files = {}
+        for name, array in self.arrays.items():
+            np.save(os.path.join(staging, f"{name}.npy"), np.ascontiguousarray(array))
+            files[f"{name}.npy"] = _sha256(os.path.join(staging, f"{name}.npy"))
+        manifest = {**self.manifest, "tfidf": {**self.manifest["tfidf"],
+                                               "ngram_range": list(self.manifest["tfidf"]["ngram_range"])},
+                    "files": files}
+        with open(os.path.join(staging, MANIFEST), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.rename(staging, version)
+
+        if os.path.isdir(path) and not os.path.islink(path):
+            # An artifact written before versioning: move it aside as version 0 (the only non-atomic step).
+            os.rename(path, f"{path}.v0")
+            versions.append(0)
+        link = f"{path}.link.tmp"
+        if os.path.lexists(link):
+            os.remove(link)
+        os.symlink(os.path.basename(version), link)
+        os.replace(link, path)
+        for old in sorted(versions)[:-1]:
+            shutil.rmtree(f"{path}.v{old}", ignore_errors=True)
+
+    @classmethod
+    def load(cls, path: str, verify: bool = False) -> "ClassifierArtifact":
+        """Open an artifact with its arrays memory-mapped. `verify` checks every file against its checksum first."""
+        while True:
+            # Resolve the version once, so every file comes from the same one even if save() swaps it meanwhile.
+            version = os.path.realpath(path)
+            try:
+                return cls._load_version(version, verify)
+            except FileNotFoundError:
+                # Deleted by two saves in a row while it was being read: retry with the current version.
+                if os.path.realpath(path) == version:
+                    raise
+
+    @classmethod
+    def _load_version(cls, path: str, verify: bool) -> "ClassifierArtifact":
+        with open(os.path.join(path, MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("format") != FORMAT or manifest.get("formatVersion") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported classifier artifact {manifest.get('format')} "
+                             f"version {manifest.get('formatVersion')} (expected {FORMAT} version {FORMAT_VERSION})")
+        if verify:
+            for name, checksum in manifest["files"].items():
+                if _sha256(os.path.join(path, name)) != checksum:
+                    raise ValueError(f"Checksum mismatch for {name} in {path}")
+        arrays = {name[:-len(".npy")]: np.load(os.path.join(path, name), mmap_mode="r", allow_pickle=False)
+                  for name in manifest["files"] if name.endswith(".npy")}
+        return cls(manifest, arrays)
+
+    def nbytes(self) -> int:
+        return sum(array.nbytes for array in self.arrays.values())
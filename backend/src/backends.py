@@ -0,0 +1,539 @@
+"""
+This file defines the generation backends used by the Adaptive LLaMA Proxy.
+
+A backend knows how to load a model tier, generate (or stream) text with it and release it again.
+The AdaptiveLlamaProxy only talks to models through this interface, so the routing, caching and
+scheduling logic can run on machines that cannot run MLX.
+
+Available backends:
+- MLXBackend ("mlx"): the real Llama 3.1 models served through mlx_lm (Apple silicon only)
+- StubBackend ("stub"): a deterministic CPU stand-in with tunable per-token latency and memory footprint
+
+The backend is selected with get_backend(), either by name or through the ALP_BACKEND environment variable.
+
+Example:
+    backend = get_backend("stub", token_latency={'simple': 0.001, 'medium': 0.004, 'complex': 0.01})
+    model, tokenizer = backend.load('simple', "mlx-community/Meta-Llama-3.1-8B-Instruct-4bit")
+    text = backend.generate(model, tokenizer, "What is the capital of France?")
+"""
+
+import os
+import time
+import hashlib
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+DEFAULT_MAX_TOKENS = 100
+
+
+class SpeculativeState:
+    """
+    What one model keeps between the steps of a speculative request: its KV cache (if the backend has
+    one) and the token ids that cache covers. `fed` counts the tokens the model has been run on.
+    """
+
+    def __init__(self, cache: Any = None):
+        self.cache = cache
+        self.tokens: List[int] = []
+        self.prompt_ids: Optional[List[int]] = None
+        self.fed = 0
+
+    def context(self, tokenizer: Any, prompt: str, generated: List[int]) -> List[int]:
+        if self.prompt_ids is None:
+            self.prompt_ids = list(tokenizer.encode(prompt))
+        return self.prompt_ids + list(generated)
+
+    def sync(self, context: List[int]) -> int:
+        """
+        Drop the cached tokens that are not a prefix of `context` (draft tokens rejected since the last
+        step), keeping at least the last context token to run the model on. Returns the tokens kept.
+        """
+        keep, limit = 0, min(len(self.tokens), len(context) - 1)
+        while keep < limit and self.tokens[keep] == context[keep]:
+            keep += 1
+        del self.tokens[keep:]
+        return keep
+
+    def record(self, ids: List[int]) -> None:
+        self.tokens.extend(ids)
+        self.fed += len(ids)
+
+
+class GenerationBackend:
+    """Interface every generation backend implements."""
+
+    name = "base"
+
+    def load(self, tier: str, model_path: str, cache_dir: Optional[str] = None) -> Tuple[Any, Any]:
+        """Load a tier from a local path or Hugging Face repo, downloading into `cache_dir` if given."""
+        raise NotImplementedError
+
+    def generate(self, model: Any, tokenizer: Any, prompt: str, max_tokens: int = DEFAULT_MAX_TOKENS) -> str:
+        return "".join(self.stream(model, tokenizer, prompt, max_tokens=max_tokens))
+
+    def stream(self, model: Any, tokenizer: Any, prompt: str, max_tokens: int = DEFAULT_MAX_TOKENS) -> Iterator[str]:
+        raise NotImplementedError
+
+    def generate_timed(self, model: Any, tokenizer: Any, prompt: str,
+                       max_tokens: int = DEFAULT_MAX_TOKENS) -> Tuple[str, float, float]:
+        """Generate a completion and return (text, prefill_seconds, decode_seconds), split at the first token."""
+        start_time = time.perf_counter()
+        first_token_time = None
+        segments = []
+        for segment in self.stream(model, tokenizer, prompt, max_tokens=max_tokens):
+            if first_token_time is None:
+                first_token_time = time.perf_counter()
+            segments.append(segment)
+        end_time = time.perf_counter()
+        first_token_time = first_token_time or end_time
+        return "".join(segments), first_token_time - start_time, end_time - first_token_time
+
+    def generate_batch(self, model: Any, tokenizer: Any, prompts: List[str], max_tokens: int = DEFAULT_MAX_TOKENS) -> List[str]:
+        """Generate completions for several prompts. Backends without batched decoding run them one by one."""
+        return [self.generate(model, tokenizer, prompt, max_tokens=max_tokens) for prompt in prompts]
+
+    def count_tokens(self, tokenizer: Any, text: str) -> int:
+        return len(tokenizer.encode(text))
+
+    def generate_with_logprobs(self, model: Any, tokenizer: Any, prompt: str,
+                               max_tokens: int = DEFAULT_MAX_TOKENS) -> Tuple[str, Optional[List[float]]]:
+        """Generate a completion along with the log-probability of each generated token, if the backend exposes them."""
+        return self.generate(model, tokenizer, prompt, max_tokens=max_tokens), None
+
+    # Speculative decoding primitives (see speculative.py). Both continue `prompt` followed by the
+    # already generated token ids, decoding greedily. A request passes each model's SpeculativeState to
+    # every step, so only the tokens that are new since the previous step are run through the model.
+    supports_speculative = False
+
+    def speculative_state(self, model: Any, tokenizer: Any) -> SpeculativeState:
+        return SpeculativeState()
+
+    def draft_tokens(self, model: Any, tokenizer: Any, prompt: str, generated: List[int], n: int,
+                     state: Optional[SpeculativeState] = None) -> List[int]:
+        """Greedily propose the next `n` token ids."""
+        raise NotImplementedError
+
+    def verify_tokens(self, model: Any, tokenizer: Any, prompt: str, generated: List[int], draft: List[int],
+                      state: Optional[SpeculativeState] = None) -> List[int]:
+        """
+        In one forward pass, return the model's greedy token at every draft position plus the one after
+        the draft (len(draft) + 1 ids).
+        """
+        raise NotImplementedError
+
+    # Prefix KV-cache primitives (see prefix_cache.py). A state holds the KV cache for a token prefix;
+    # none of these methods mutate the state they are given.
+    supports_prefix_cache = False
+
+    def prefill(self, model: Any, tokenizer: Any, ids: List[int], state: Any = None) -> Any:
+        """Return a new state that extends `state` (or an empty one) with `ids`."""
+        raise NotImplementedError
+
+    def truncate_state(self, state: Any, ntokens: int) -> Any:
+        """Return a copy of `state` covering only its first `ntokens` tokens."""
+        raise NotImplementedError
+
+    def state_nbytes(self, state: Any) -> int:
+        raise NotImplementedError
+
+    def decode(self, model: Any, tokenizer: Any, prompt: str, state: Any, ids: List[int],
+               max_tokens: int = DEFAULT_MAX_TOKENS) -> str:
+        """Generate the completion of `prompt`, whose tokens are `state` followed by `ids` (at least one)."""
+        raise NotImplementedError
+
+    def unload(self, model: Any, tokenizer: Any) -> None:
+        pass
+
+    def estimate_memory(self, tier: str) -> Optional[int]:
+        """Bytes needed to hold the tier in memory, or None if the backend cannot tell."""
+        return None
+
+    def model_nbytes(self, model: Any) -> Optional[int]:
+        """Bytes actually held by a loaded model's weights, or None if the backend cannot tell."""
+        return None
+
+
+class MLXBackend(GenerationBackend):
+    """Serves the pre-compressed Llama 3.1 models through mlx_lm."""
+
+    name = "mlx"
+
+    def __init__(self, verbose: bool = True):
+        self.verbose = verbose
+
+    def load(self, tier: str, model_path: str, cache_dir: Optional[str] = None) -> Tuple[Any, Any]:
+        from mlx_lm import load
+        if cache_dir is not None and not os.path.isdir(model_path):
+            # mlx_lm.load downloads into the default Hugging Face cache, so fetch the checkpoint into
+            # cache_dir first and load it from the local snapshot.
+            from huggingface_hub import snapshot_download
+            model_path = snapshot_download(repo_id=model_path, cache_dir=cache_dir,
+                                           allow_patterns=["*.json", "*.safetensors", "*.py", "tokenizer.model", "*.tiktoken", "*.txt"])
+        return load(model_path)
+
+    def generate(self, model: Any, tokenizer: Any, prompt: str, max_tokens: int = DEFAULT_MAX_TOKENS) -> str:
+        from mlx_lm import generate
+        return generate(model, tokenizer, prompt=prompt, max_tokens=max_tokens, verbose=self.verbose)
+
+    def stream(self, model: Any, tokenizer: Any, prompt: str, max_tokens: int = DEFAULT_MAX_TOKENS) -> Iterator[str]:
+        from mlx_lm.utils import stream_generate
+        for segment in stream_generate(model, tokenizer, prompt=prompt, max_tokens=max_tokens):
+            yield segment
+
+    def generate_with_logprobs(self, model: Any, tokenizer: Any, prompt: str,
+                               max_tokens: int = DEFAULT_MAX_TOKENS) -> Tuple[str, Optional[List[float]]]:
+        import mlx.core as mx
+        from mlx_lm.utils import generate_step
+        prompt_tokens = mx.array(tokenizer.encode(prompt))
+        tokens, logprobs = [], []
+        for (token, token_logprobs), _ in zip(generate_step(prompt_tokens, model), range(max_tokens)):
+            if token == tokenizer.eos_token_id:
+                break
+            tokens.append(token)
+            logprobs.append(token_logprobs.reshape(-1)[token].item())
+        return tokenizer.decode(tokens), logprobs
+
+    supports_speculative = True
+
+    def speculative_state(self, model: Any, tokenizer: Any) -> SpeculativeState:
+        return SpeculativeState(self._make_cache(model))
+
+    @staticmethod
+    def _trim_cache(cache: List[Any], ntokens: int) -> None:
+        """
+        Trim a request's own KV cache in place: KVCache writes at its offset, so the dropped entries are
+        overwritten by the next tokens. (Shared prefix-cache states are copied with truncate_state instead.)
+        """
+        for layer_cache in cache:
+            layer_cache.offset = min(layer_cache.offset, ntokens)
+
+    def draft_tokens(self, model: Any, tokenizer: Any, prompt: str, generated: List[int], n: int,
+                     state: Optional[SpeculativeState] = None) -> List[int]:
+        import mlx.core as mx
+        state = state or self.speculative_state(model, tokenizer)
+        context = state.context(tokenizer, prompt, generated)
+        keep = state.sync(context)
+        self._trim_cache(state.cache, keep)
+        logits = model(mx.array(context[keep:])[None], cache=state.cache)
+        state.record(context[keep:])
+        draft = []
+        for i in range(n):
+            draft.append(mx.argmax(logits[0, -1]).item())
+            if i < n - 1:
+                logits = model(mx.array([draft[-1:]]), cache=state.cache)
+                state.record(draft[-1:])
+        return draft
+
+    def verify_tokens(self, model: Any, tokenizer: Any, prompt: str, generated: List[int], draft: List[int],
+                      state: Optional[SpeculativeState] = None) -> List[int]:
+        import mlx.core as mx
+        state = state or self.speculative_state(model, tokenizer)
+        context = state.context(tokenizer, prompt, generated)
+        keep = state.sync(context)
+        self._trim_cache(state.cache, keep)
+        ids = context[keep:] + list(draft)
+        logits = model(mx.array(ids)[None], cache=state.cache)
+        state.record(ids)
+        return mx.argmax(logits[0, -(len(draft) + 1):], axis=-1).tolist()
+
+    def count_tokens(self, tokenizer: Any, text: str) -> int:
+        return len(tokenizer.encode(text, add_special_tokens=False))
+
+    def model_nbytes(self, model: Any) -> Optional[int]:
+        from mlx.utils import tree_flatten
+        return sum(parameter.nbytes for _, parameter in tree_flatten(model.parameters()))
+
+    supports_prefix_cache = True
+
+    def _make_cache(self, model: Any) -> List[Any]:
+        from mlx_lm.models.base import KVCache
+        if hasattr(model, "make_cache"):
+            return model.make_cache()
+        kv_heads = [model.n_kv_heads] * len(model.layers) if isinstance(model.n_kv_heads, int) else model.n_kv_heads
+        return [KVCache(model.head_dim, n) for n in kv_heads]
+
+    def prefill(self, model: Any, tokenizer: Any, ids: List[int], state: Any = None) -> Any:
+        import mlx.core as mx
+        cache = self._make_cache(model) if state is None else self.truncate_state(state, state[0].offset)
+        if ids:
+            mx.eval(model(mx.array(ids)[None], cache=cache))
+        return cache
+
+    def truncate_state(self, state: Any, ntokens: int) -> Any:
+        import copy
+        truncated = []
+        for layer_cache in state:
+            layer_copy = copy.copy(layer_cache)
+            if layer_cache.keys is not None:
+                # Slicing copies, so decoding from the truncated state never writes into the original.
+                layer_copy.keys = layer_cache.keys[..., :ntokens, :]
+                layer_copy.values = layer_cache.values[..., :ntokens, :]
+            layer_copy.offset = min(layer_cache.offset, ntokens)
+            truncated.append(layer_copy)
+        return truncated
+
+    def state_nbytes(self, state: Any) -> int:
+        return sum(c.keys.nbytes + c.values.nbytes for c in state if c.keys is not None)
+
+    def decode(self, model: Any, tokenizer: Any, prompt: str, state: Any, ids: List[int],
+               max_tokens: int = DEFAULT_MAX_TOKENS) -> str:
+        import mlx.core as mx
+        cache = self.truncate_state(state, state[0].offset) if state is not None else self._make_cache(model)
+        logits = model(mx.array(ids)[None], cache=cache)
+        tokens = []
+        for _ in range(max_tokens):
+            token = mx.argmax(logits[0, -1]).item()
+            if token == tokenizer.eos_token_id:
+                break
+            tokens.append(token)
+            logits = model(mx.array([[token]]), cache=cache)
+        return tokenizer.decode(tokens)
+
+    def unload(self, model: Any, tokenizer: Any) -> None:
+        import mlx.core as mx
+        mx.metal.clear_cache()
+
+
+class StubTokenizer:
+    """Whitespace tokenizer over a small fixed vocabulary, used by the StubBackend."""
+
+    VOCAB = (
+        "the", "a", "model", "answer", "is", "of", "and", "to", "in", "that",
+        "this", "task", "can", "be", "with", "for", "as", "it", "on", "by",
+        "simple", "complex", "result", "value", "first", "then", "because", "which", "we", "are",
+        "example", "step", "data", "time", "memory", "system", "process", "given", "each", "when",
+        "more", "than", "one", "two", "three", "from", "an", "or", "not", "so",
+        "question", "information", "important", "consider", "therefore", "between", "use", "also", "into", "has",
+        "based", "approach", "different", "number",
+    )
+
+    def __init__(self):
+        self.vocab_size = len(self.VOCAB)
+        self.eos_token_id = self.vocab_size
+        self._ids = {word: i for i, word in enumerate(self.VOCAB)}
+
+    def encode(self, text: str) -> List[int]:
+        ids = []
+        for word in text.split():
+            token_id = self._ids.get(word.lower())
+            if token_id is None:
+                token_id = int(hashlib.md5(word.encode("utf-8")).hexdigest()[:8], 16) % self.vocab_size
+            ids.append(token_id)
+        return ids
+
+    def decode(self, ids: List[int]) -> str:
+        return " ".join(self.VOCAB[i] for i in ids if i != self.eos_token_id)
+
+
+class StubModel:
+    """Stand-in for a loaded model tier. Holds a real buffer so the process RSS reflects the footprint."""
+
+    def __init__(self, tier: str, nbytes: int):
+        self.tier = tier
+        self.nbytes = nbytes
+        self._weights = bytearray(nbytes)
+        # Touch every page so the footprint is actually resident rather than lazily mapped.
+        self._weights[::4096] = b"\x01" * len(range(0, nbytes, 4096))
+
+
+class StubKVState:
+    """Stand-in for a prefilled KV cache: the token ids it covers, sized like the real tier's cache."""
+
+    def __init__(self, tier: str, ids: Tuple[int, ...], bytes_per_token: int):
+        self.tier = tier
+        self.ids = ids
+        self.nbytes = len(ids) * bytes_per_token
+
+
+class StubBackend(GenerationBackend):
+    """
+    Deterministic CPU stand-in for the MLX models.
+
+    The same prompt always produces the same completion on a given tier. Loading, prefill and decoding
+    sleep for the configured latencies (releasing the GIL like a real native backend would), and each
+    loaded tier allocates its configured memory footprint.
+    """
+
+    name = "stub"
+
+    DEFAULT_TOKEN_LATENCY = {'simple': 0.002, 'medium': 0.008, 'complex': 0.03}
+    DEFAULT_PREFILL_LATENCY = {'simple': 0.0001, 'medium': 0.0004, 'complex': 0.0015}
+    DEFAULT_LOAD_LATENCY = {'simple': 0.2, 'medium': 1.0, 'complex': 3.0}
+    DEFAULT_MEMORY_FOOTPRINT = {'simple': 16 * 1024 ** 2, 'medium': 64 * 1024 ** 2, 'complex': 256 * 1024 ** 2}
+    # Extra cost of each additional sequence in a batched decode step, relative to a single sequence.
+    DEFAULT_BATCH_OVERHEAD = 0.1
+    # How strongly prompt difficulty lowers each tier's token log-probabilities.
+    TIER_UNCERTAINTY = {'simple': 1.0, 'medium': 0.5, 'complex': 0.2}
+    # Share of tokens where a tier emits the prompt's shared reference token, so tiers mostly agree
+    # with each other like real models of one family do.
+    TIER_AGREEMENT = {'simple': 0.75, 'medium': 0.9, 'complex': 0.95}
+    # fp16 KV cache size per token of the Llama 3.1 models: 2 * layers * kv_heads * head_dim * 2 bytes.
+    KV_BYTES_PER_TOKEN = {'simple': 2 * 32 * 8 * 128 * 2, 'medium': 2 * 80 * 8 * 128 * 2, 'complex': 2 * 126 * 8 * 128 * 2}
+    supports_speculative = True
+    supports_prefix_cache = True
+
+    def __init__(self,
+                 token_latency: Union[float, Dict[str, float], None] = None,
+                 prefill_latency: Union[float, Dict[str, float], None] = None,
+                 load_latency: Union[float, Dict[str, float], None] = None,
+                 memory_footprint: Union[int, Dict[str, int], None] = None,
+                 batch_overhead: float = DEFAULT_BATCH_OVERHEAD,
+                 latency_scale: Optional[float] = None):
+        self.token_latency = self._per_tier(token_latency, self.DEFAULT_TOKEN_LATENCY)
+        self.prefill_latency = self._per_tier(prefill_latency, self.DEFAULT_PREFILL_LATENCY)
+        self.load_latency = self._per_tier(load_latency, self.DEFAULT_LOAD_LATENCY)
+        self.memory_footprint = self._per_tier(memory_footprint, self.DEFAULT_MEMORY_FOOTPRINT)
+        self.batch_overhead = batch_overhead
+        if latency_scale is None:
+            latency_scale = float(os.environ.get("ALP_STUB_LATENCY_SCALE", "1.0"))
+        self.latency_scale = latency_scale
+
+    @staticmethod
+    def _per_tier(value, defaults: Dict[str, Any]) -> Dict[str, Any]:
+        if value is None:
+            return dict(defaults)
+        if isinstance(value, dict):
+            return {**defaults, **value}
+        return {tier: value for tier in defaults}
+
+    def _sleep(self, seconds: float) -> None:
+        if seconds > 0 and self.latency_scale > 0:
+            time.sleep(seconds * self.latency_scale)
+
+    def load(self, tier: str, model_path: str, cache_dir: Optional[str] = None) -> Tuple[Any, Any]:
+        self._sleep(self.load_latency.get(tier, 0.0))
+        return StubModel(tier, int(self.memory_footprint.get(tier, 0))), StubTokenizer()
+
+    def completion_length(self, model: StubModel, prompt: str) -> int:
+        seed = hashlib.sha256(prompt.encode("utf-8")).digest()
+        return 8 + seed[1] % 56
+
+    def token_at(self, model: StubModel, tokenizer: StubTokenizer, prompt: str, position: int) -> int:
+        """The token id the given tier emits at `position` of its completion (EOS past the end)."""
+        if position >= self.completion_length(model, prompt):
+            return tokenizer.eos_token_id
+        index = position.to_bytes(4, "little")
+        tier_digest = hashlib.blake2b(f"{model.tier}\x00{prompt}".encode("utf-8") + index, digest_size=8).digest()
+        if tier_digest[0] / 256 < self.TIER_AGREEMENT.get(model.tier, 0.0):
+            digest = hashlib.blake2b(prompt.encode("utf-8") + index, digest_size=4).digest()
+        else:
+            digest = tier_digest[4:]
+        return int.from_bytes(digest, "little") % tokenizer.vocab_size
+
+    def completion_ids(self, model: StubModel, tokenizer: StubTokenizer, prompt: str, max_tokens: int) -> List[int]:
+        """The deterministic token ids the given tier produces for a prompt."""
+        length = min(max_tokens, self.completion_length(model, prompt))
+        return [self.token_at(model, tokenizer, prompt, i) for i in range(length)]
+
+    def _feed_context(self, model: StubModel, tokenizer: StubTokenizer, prompt: str, generated: List[int],
+                      state: Optional[SpeculativeState]) -> SpeculativeState:
+        """Account for (and price as prefill) the context tokens the model's cache does not cover yet."""
+        state = state or self.speculative_state(model, tokenizer)
+        context = state.context(tokenizer, prompt, generated)
+        new_ids = context[state.sync(context):]
+        self._sleep(self.prefill_latency.get(model.tier, 0.0) * len(new_ids))
+        state.record(new_ids)
+        return state
+
+    def draft_tokens(self, model: StubModel, tokenizer: StubTokenizer, prompt: str, generated: List[int], n: int,
+                     state: Optional[SpeculativeState] = None) -> List[int]:
+        state = self._feed_context(model, tokenizer, prompt, generated, state)
+        self._sleep(self.token_latency.get(model.tier, 0.0) * n)
+        draft = [self.token_at(model, tokenizer, prompt, len(generated) + i) for i in range(n)]
+        state.record(draft[:-1])
+        return draft
+
+    def verify_tokens(self, model: StubModel, tokenizer: StubTokenizer, prompt: str, generated: List[int],
+                      draft: List[int], state: Optional[SpeculativeState] = None) -> List[int]:
+        """One decode step over all draft positions, priced like a batched step."""
+        state = self._feed_context(model, tokenizer, prompt, generated, state)
+        self._sleep(self.token_latency.get(model.tier, 0.0) * (1 + self.batch_overhead * len(draft)))
+        state.record(list(draft))
+        return [self.token_at(model, tokenizer, prompt, len(generated) + i) for i in range(len(draft) + 1)]
+
+    def stream(self, model: StubModel, tokenizer: StubTokenizer, prompt: str, max_tokens: int = DEFAULT_MAX_TOKENS) -> Iterator[str]:
+        prompt_tokens = len(tokenizer.encode(prompt))
+        self._sleep(self.prefill_latency.get(model.tier, 0.0) * prompt_tokens)
+        for i, token_id in enumerate(self.completion_ids(model, tokenizer, prompt, max_tokens)):
+            self._sleep(self.token_latency.get(model.tier, 0.0))
+            yield tokenizer.decode([token_id]) if i == 0 else " " + tokenizer.decode([token_id])
+
+    def generate_timed(self, model: StubModel, tokenizer: StubTokenizer, prompt: str,
+                       max_tokens: int = DEFAULT_MAX_TOKENS) -> Tuple[str, float, float]:
+        start_time = time.perf_counter()
+        self._sleep(self.prefill_latency.get(model.tier, 0.0) * len(tokenizer.encode(prompt)))
+        prefill_done = time.perf_counter()
+        ids = self.completion_ids(model, tokenizer, prompt, max_tokens)
+        self._sleep(self.token_latency.get(model.tier, 0.0) * len(ids))
+        return tokenizer.decode(ids), prefill_done - start_time, time.perf_counter() - prefill_done
+
+    def generate(self, model: StubModel, tokenizer: StubTokenizer, prompt: str, max_tokens: int = DEFAULT_MAX_TOKENS) -> str:
+        ids = self.completion_ids(model, tokenizer, prompt, max_tokens)
+        prompt_tokens = len(tokenizer.encode(prompt))
+        self._sleep(self.prefill_latency.get(model.tier, 0.0) * prompt_tokens
+                    + self.token_latency.get(model.tier, 0.0) * len(ids))
+        return tokenizer.decode(ids)
+
+    def token_logprobs(self, model: StubModel, prompt: str, length: int) -> List[float]:
+        """
+        Deterministic log-probabilities for a completion. Each prompt gets a difficulty; smaller tiers are
+        less sure of themselves on difficult prompts.
+        """
+        seed = hashlib.sha256(f"{model.tier}\x00{prompt}".encode("utf-8")).digest()
+        difficulty = hashlib.sha256(prompt.encode("utf-8")).digest()[0] / 255
+        uncertainty = self.TIER_UNCERTAINTY.get(model.tier, 1.0) * 1.5 * difficulty ** 2
+        return [-uncertainty * (0.5 + seed[1 + i % 31] / 255) for i in range(length)]
+
+    def generate_with_logprobs(self, model: StubModel, tokenizer: StubTokenizer, prompt: str,
+                               max_tokens: int = DEFAULT_MAX_TOKENS) -> Tuple[str, Optional[List[float]]]:
+        text = self.generate(model, tokenizer, prompt, max_tokens=max_tokens)
+        return text, self.token_logprobs(model, prompt, len(text.split()))
+
+    def generate_batch(self, model: StubModel, tokenizer: StubTokenizer, prompts: List[str], max_tokens: int = DEFAULT_MAX_TOKENS) -> List[str]:
+        """Decode all prompts in lockstep: the batch takes as many steps as its longest completion."""
+        completions = [self.completion_ids(model, tokenizer, prompt, max_tokens) for prompt in prompts]
+        prompt_tokens = sum(len(tokenizer.encode(prompt)) for prompt in prompts)
+        steps = max((len(ids) for ids in completions), default=0)
+        step_latency = self.token_latency.get(model.tier, 0.0) * (1 + self.batch_overhead * (len(prompts) - 1))
+        self._sleep(self.prefill_latency.get(model.tier, 0.0) * prompt_tokens + step_latency * steps)
+        return [tokenizer.decode(ids) for ids in completions]
+
+    def prefill(self, model: StubModel, tokenizer: StubTokenizer, ids: List[int], state: Any = None) -> Any:
+        self._sleep(self.prefill_latency.get(model.tier, 0.0) * len(ids))
+        previous = state.ids if state is not None else ()
+        return StubKVState(model.tier, previous + tuple(ids), self.KV_BYTES_PER_TOKEN.get(model.tier, 0))
+
+    def truncate_state(self, state: StubKVState, ntokens: int) -> StubKVState:
+        return StubKVState(state.tier, state.ids[:ntokens], self.KV_BYTES_PER_TOKEN.get(state.tier, 0))
+
+    def state_nbytes(self, state: StubKVState) -> int:
+        return state.nbytes
+
+    def decode(self, model: StubModel, tokenizer: StubTokenizer, prompt: str, state: Any, ids: List[int],
+               max_tokens: int = DEFAULT_MAX_TOKENS) -> str:
+        completion = self.completion_ids(model, tokenizer, prompt, max_tokens)
+        self._sleep(self.prefill_latency.get(model.tier, 0.0) * len(ids)
+                    + self.token_latency.get(model.tier, 0.0) * len(completion))
+        return tokenizer.decode(completion)
+
+    def unload(self, model: StubModel, tokenizer: StubTokenizer) -> None:
+        model._weights = bytearray()
+
+    def estimate_memory(self, tier: str) -> Optional[int]:
+        return int(self.memory_footprint.get(tier, 0))
+
+    def model_nbytes(self, model: StubModel) -> Optional[int]:
+        return model.nbytes
+
+
+BACKENDS = {
+    MLXBackend.name: MLXBackend,
+    StubBackend.name: StubBackend,
+}
+
+
+def get_backend(name: Optional[str] = None, **kwargs) -> GenerationBackend:
+    """Instantiate a backend by name, defaulting to the ALP_BACKEND environment variable (or "mlx")."""
+    name = name or os.environ.get("ALP_BACKEND", MLXBackend.name)
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown generation backend '{name}'. Available backends: {', '.join(sorted(BACKENDS))}")
+    return BACKENDS[name](**kwargs)
@@ -0,0 +1,361 @@
+"""
+This file defines the offline benchmark harness for the Adaptive LLaMA Proxy.
+
+A benchmark runs a workload of prompts through AdaptiveLlamaProxy.adaptive_generate and reports exact
+p50/p95/p99 latencies, throughput, memory and routing accuracy as JSON, so results can be compared across
+commits (see scripts/benchmark.py).
+
+- Workloads are drawn with a seed from the labeled prompts in data/task_classification_data.json, and
+  can be saved and replayed as JSON lines. Request logs recorded by the API (ALP_RECORD_REQUESTS) replay
+  the same way, with their original timing.
+- Requests with arrival times run open-loop: each is issued at its arrival time whether or not earlier
+  requests have finished, and its latency is measured from that time, so queueing under load counts.
+  Workloads without arrival times run closed-loop with a fixed number of concurrent clients.
+- The cold scenario unloads every tier and clears the caches first. The warm scenario loads the tiers the
+  workload needs and warms up the classifier first.
+
+Example:
+    workload = build_workload(200, seed=0, arrival_rate=4.0)
+    results = run_benchmark(AdaptiveLlamaProxy(backend="stub"), workload, scenarios=("cold", "warm"))
+    json.dump(results, open("bench.json", "w"), indent=2)
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import logging
+import platform
+import threading
+import subprocess
+import concurrent.futures
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+DEFAULT_DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'task_classification_data.json')
+# The tier each dataset label should be routed to.
+LABEL_TIERS = {'very_simple': 'simple', 'simple': 'simple', 'medium': 'medium', 'complex': 'complex'}
+SCENARIOS = ("cold", "warm")
+RESULTS_VERSION = 1
+MEMORY_SAMPLE_INTERVAL = 0.05
+
+
+def build_workload(n: int, seed: int = 0, arrival_rate: Optional[float] = None, arrival: str = "poisson",
+                   mix: Optional[Dict[str, float]] = None, data_path: str = DEFAULT_DATA_PATH) -> List[Dict[str, Any]]:
+    """
+    Draw `n` labeled prompts. `mix` weights the labels (by default, in proportion to the dataset).
+    With an arrival rate (requests/sec), requests get arrival offsets in seconds: exponential
+    inter-arrival times for "poisson", evenly spaced for "uniform". Without one the workload is closed-loop.
+    """
+    if arrival not in ("poisson", "uniform"):
+        raise ValueError(f"Unknown arrival process: {arrival}")
+    with open(data_path, 'r') as f:
+        data = json.load(f)
+    labels = sorted(data)
+    weights = [mix.get(label, 0.0) for label in labels] if mix else [len(data[label]) for label in labels]
+    rng = random.Random(seed)
+    workload, offset = [], 0.0
+    for i in range(n):
+        label = rng.choices(labels, weights)[0]
+        request = {'id': i, 'prompt': rng.choice(data[label]), 'label': label}
+        if arrival_rate:
+            offset += rng.expovariate(arrival_rate) if arrival == "poisson" else 1.0 / arrival_rate
+            request['arrival'] = offset
+        workload.append(request)
+    return workload
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """Parse a label mix like "very_simple=1,simple=2,medium=1,complex=0.5"."""
+    mix = {}
+    for part in value.split(","):
+        label, weight = part.split("=")
+        if label.strip() not in LABEL_TIERS:
+            raise ValueError(f"Unknown label in mix: {label.strip()}")
+        mix[label.strip()] = float(weight)
+    return mix
+
+
+def save_workload(path: str, workload: Iterable[Dict[str, Any]]) -> None:
+    with open(path, 'w', encoding='utf-8') as f:
+        for request in workload:
+            f.write(json.dumps(request) + "\n")
+
+
+def load_workload(path: str) -> List[Dict[str, Any]]:
+    """
+    Read a saved workload or a request log recorded by the API. Logged requests carry absolute
+    timestamps, which become arrival offsets from the first request.
+    """
+    with open(path, encoding='utf-8') as f:
+        workload = [json.loads(line) for line in f if line.strip()]
+    timestamps = [request['timestamp'] for request in workload if 'timestamp' in request]
+    start = min(timestamps) if timestamps else 0.0
+    for i, request in enumerate(workload):
+        request.setdefault('id', i)
+        if 'timestamp' in request:
+            request['arrival'] = request.pop('timestamp') - start
+    return workload
+
+
+def workload_digest(workload: List[Dict[str, Any]]) -> str:
+    return hashlib.sha256(json.dumps(workload, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class RequestRecorder:
+    """Appends incoming requests to a JSON-lines file that load_workload can replay."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def record(self, prompt: str, model: Optional[str] = None, policy: Optional[str] = None) -> None:
+        line = json.dumps({'timestamp': time.time(), 'prompt': prompt, 'model': model, 'policy': policy})
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line + "\n")
+
+
+class MemorySampler:
+    """Samples the process RSS on a background thread while a benchmark runs."""
+
+    def __init__(self, read_rss, interval: float = MEMORY_SAMPLE_INTERVAL):
+        self.read_rss = read_rss
+        self.interval = interval
+        self.samples: List[int] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="alp-memory-sampler", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.samples.append(self.read_rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self) -> "MemorySampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.samples.append(self.read_rss())
+
+
+def percentiles(values: List[float], scale: float = 1000.0) -> Optional[Dict[str, float]]:
+    """Exact p50/p95/p99, mean and max of `values`, scaled (seconds to milliseconds by default)."""
+    if not values:
+        return None
+    array = np.asarray(values, dtype=np.float64) * scale
+    p50, p95, p99 = np.percentile(array, [50, 95, 99])
+    return {"p50": float(p50), "p95": float(p95), "p99": float(p99),
+            "mean": float(array.mean()), "max": float(array.max())}
+
+
+def _request_kwargs(request: Dict[str, Any], mode: str) -> Dict[str, Any]:
+    model = request.get('model')
+    if mode != "adaptive":
+        model = mode
+    return {'task_complexity': model if model not in (None, "full") else None, 'policy': request.get('policy')}
+
+
+def _run_one(proxy: Any, request: Dict[str, Any], mode: str, scheduled: float) -> Dict[str, Any]:
+    record = {'id': request['id'], 'label': request.get('label')}
+    try:
+        result = proxy.adaptive_generate(request['prompt'], **_request_kwargs(request, mode))
+    except Exception as e:
+        result = {'error': f"{type(e).__name__}: {e}"}
+    record['latency'] = time.perf_counter() - scheduled
+    if 'error' in result:
+        record['error'] = result['error']
+        return record
+    record.update(
+        tier=result['model_used'],
+        service_time=result['latency'],
+        phases=result['phases'],
+        prompt_tokens=result['prompt_tokens'],
+        completion_tokens=result['completion_tokens'],
+        memory_saved=result['memory_saved'],
+        cache_hit=result.get('cache_hit', False),
+    )
+    return record
+
+
+def run_workload(proxy: Any, workload: List[Dict[str, Any]], mode: str = "adaptive", concurrency: int = 1,
+                 time_scale: float = 1.0, max_workers: int = 64) -> Dict[str, Any]:
+    """
+    Run the workload once. Open-loop when requests have arrival times (scaled by `time_scale`),
+    otherwise closed-loop with `concurrency` clients. Returns the per-request records, the wall-clock
+    duration and the RSS samples.
+    """
+    open_loop = any(request.get('arrival') is not None for request in workload)
+    records: List[Dict[str, Any]] = []
+    with MemorySampler(proxy.get_memory_usage) as memory:
+        start = time.perf_counter()
+        if open_loop:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers,
+                                                       thread_name_prefix="alp-bench") as pool:
+                futures = []
+                for request in sorted(workload, key=lambda request: request.get('arrival') or 0.0):
+                    scheduled = start + (request.get('arrival') or 0.0) * time_scale
+                    time.sleep(max(scheduled - time.perf_counter(), 0.0))
+                    futures.append(pool.submit(_run_one, proxy, request, mode, scheduled))
+                records = [future.result() for future in futures]
+        else:
+            pending = iter(workload)
+            lock = threading.Lock()
+
+            def client() -> None:
+                while True:
+                    with lock:
+                        request = next(pending, None)
+                    if request is None:
+                        return
+                    record = _run_one(proxy, request, mode, time.perf_counter())
+                    with lock:
+                        records.append(record)
+
+            clients = [threading.Thread(target=client, name=f"alp-bench-{i}") for i in range(max(concurrency, 1))]
+            for thread in clients:
+                thread.start()
+            for thread in clients:
+                thread.join()
+        duration = time.perf_counter() - start
+    return {'records': sorted(records, key=lambda record: record['id']), 'duration': duration,
+            'rss': memory.samples, 'openLoop': open_loop}
+
+
+def summarize(run: Dict[str, Any], proxy: Any = None) -> Dict[str, Any]:
+    records, duration = run['records'], run['duration']
+    ok = [record for record in records if 'error' not in record]
+    completion_tokens = sum(record['completion_tokens'] or 0 for record in ok)
+
+    by_tier: Dict[str, List[Dict[str, Any]]] = {}
+    for record in ok:
+        by_tier.setdefault(record['tier'], []).append(record)
+
+    labeled = [record for record in ok if record.get('label') in LABEL_TIERS]
+    confusion: Dict[str, Dict[str, int]] = {}
+    for record in labeled:
+        row = confusion.setdefault(record['label'], {})
+        row[record['tier']] = row.get(record['tier'], 0) + 1
+
+    phases = sorted({phase for record in ok for phase in record['phases']})
+    summary = {
+        "requests": len(records),
+        "errors": len(records) - len(ok),
+        "openLoop": run['openLoop'],
+        "duration": duration,
+        "throughput": {
+            "requestsPerSecond": len(ok) / duration if duration > 0 else 0.0,
+            "completionTokensPerSecond": completion_tokens / duration if duration > 0 else 0.0,
+        },
+        "latencyMs": percentiles([record['latency'] for record in ok]),
+        "serviceTimeMs": percentiles([record['service_time'] for record in ok]),
+        "phasesMs": {phase: percentiles([record['phases'][phase] for record in ok
+                                         if record['phases'].get(phase) is not None])
+                     for phase in phases},
+        "byTier": {tier: {"requests": len(tier_records),
+                          "latencyMs": percentiles([record['latency'] for record in tier_records])}
+                   for tier, tier_records in sorted(by_tier.items())},
+        "routing": {
+            "accuracy": (sum(record['tier'] == LABEL_TIERS[record['label']] for record in labeled) / len(labeled)
+                         if labeled else None),
+            "confusion": confusion,
+        },
+        "cacheHits": sum(record['cache_hit'] for record in ok),
+        "memory": {
+            "peakRssBytes": max(run['rss']) if run['rss'] else None,
+            "meanRssBytes": float(np.mean(run['rss'])) if run['rss'] else None,
+            "memorySavedBytes": sum(record['memory_saved'] for record in ok),
+        },
+        "errorSamples": sorted({record['error'] for record in records if 'error' in record})[:5],
+    }
+    if proxy is not None:
+        summary["memory"]["residentBytes"] = {tier: proxy.tier_memory.get(tier, {}).get("residentBytes")
+                                              for tier in proxy.get_loaded_models()}
+    return summary
+
+
+def prepare(proxy: Any, scenario: str, workload: List[Dict[str, Any]], mode: str = "adaptive") -> None:
+    """Put the proxy in the scenario's starting state."""
+    if scenario not in SCENARIOS:
+        raise ValueError(f"Unknown scenario: {scenario}")
+    proxy.task_classifier.classification_cache.clear()
+    if proxy.response_cache is not None:
+        proxy.response_cache.clear()
+    if scenario == "cold":
+        proxy.unload_all_models()
+        return
+    # Warm: the classifier is loaded and the tiers the workload should need are resident, largest first
+    # so that, under a tight memory budget, eviction keeps the smaller and more frequently used tiers.
+    proxy.task_classifier.warm_up()
+    proxy.task_classifier.classify("Warm up the classifier.")
+    if mode != "adaptive":
+        tiers = [mode]
+    else:
+        tiers = {LABEL_TIERS.get(request.get('label'), 'medium') for request in workload}
+    for tier in sorted(tiers, key=lambda tier: proxy.model_sizes[tier], reverse=True):
+        proxy.load_model(tier)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(proxy: Any, workload: List[Dict[str, Any]], scenarios: Iterable[str] = SCENARIOS,
+                  mode: str = "adaptive", concurrency: int = 1, time_scale: float = 1.0,
+                  config: Optional[Dict[str, Any]] = None, logger: Optional[logging.Logger] = None) -> Dict[str, Any]:
+    """Run the workload once per scenario and return the JSON-serializable results document."""
+    logger = logger or logging.getLogger(__name__)
+    results = {
+        "version": RESULTS_VERSION,
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "backend": proxy.backend.name,
+            "workloadSha256": workload_digest(workload),
+            "workloadSize": len(workload),
+        },
+        "config": {"mode": mode, "concurrency": concurrency, "timeScale": time_scale, **(config or {})},
+        "scenarios": {},
+    }
+    for scenario in scenarios:
+        logger.info(f"Running the {scenario} scenario ({len(workload)} requests, mode {mode})")
+        prepare(proxy, scenario, workload, mode=mode)
+        run = run_workload(proxy, workload, mode=mode, concurrency=concurrency, time_scale=time_scale)
+        results["scenarios"][scenario] = summarize(run, proxy)
+    return results
+
+
+COMPARED_METRICS = (
+    ("latencyMs", "p50"), ("latencyMs", "p95"), ("latencyMs", "p99"),
+    ("throughput", "requestsPerSecond"), ("throughput", "completionTokensPerSecond"),
+    ("memory", "peakRssBytes"), ("routing", "accuracy"),
+)
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Per-scenario deltas of the headline metrics between two results documents."""
+    if baseline["meta"].get("workloadSha256") != current["meta"].get("workloadSha256"):
+        logging.getLogger(__name__).warning("The results were produced from different workloads")
+    rows = []
+    for scenario, summary in current["scenarios"].items():
+        base_summary = baseline["scenarios"].get(scenario)
+        if base_summary is None:
+            continue
+        for section, key in COMPARED_METRICS:
+            base = (base_summary.get(section) or {}).get(key)
+            value = (summary.get(section) or {}).get(key)
+            change = (value - base) / base * 100 if base and value is not None else None
+            rows.append({"scenario": scenario, "metric": f"{section}.{key}", "baseline": base, "current": value,
+                         "changePercent": change})
+    return rows
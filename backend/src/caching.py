@@ -0,0 +1,191 @@
+"""
+This file defines the caching primitives shared by the Adaptive LLaMA Proxy.
+
+- BoundedCache: a thread-safe, bounded cache with an optional time-to-live and an "lru", "lfu" or "fifo"
+  eviction policy
+- LRUCache: a BoundedCache with the least-recently-used policy
+- FeatureCache: an append-only, on-disk JSON-lines store of per-text feature rows keyed by text hash,
+  so retraining on a grown dataset only extracts features for the new texts
+- normalize_prompt() / prompt_key(): map identical and near-identical prompts (differing only in case,
+  whitespace or trailing punctuation) to the same cache key
+
+Example:
+    cache = LRUCache(maxsize=1024, ttl=600)
+    cache.put(prompt_key(prompt), value)
+    value = cache.get(prompt_key(prompt))
+
+    features = FeatureCache("~/.cache/alp/features-en_core_web_sm.jsonl")
+    features.put_many({features.key(text): row for text, row in zip(new_texts, rows)})
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterator, Mapping, Optional
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s.?!;:,]+$")
+
+_MISSING = object()
+
+
+def normalize_prompt(prompt: str) -> str:
+    prompt = unicodedata.normalize("NFKC", prompt)
+    prompt = _WHITESPACE.sub(" ", prompt).strip().lower()
+    return _TRAILING_PUNCTUATION.sub("", prompt)
+
+
+def prompt_key(prompt: str, *qualifiers: str) -> str:
+    """Stable hash of the normalized prompt, optionally scoped by extra qualifiers (e.g. a model tier)."""
+    payload = "\x00".join((normalize_prompt(prompt),) + qualifiers)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class BoundedCache:
+    POLICIES = ("lru", "lfu", "fifo")
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None, policy: str = "lru"):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown eviction policy '{policy}'. Available policies: {', '.join(self.POLICIES)}")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.policy = policy
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._frequency: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at is not None and time.monotonic() >= expires_at:
+                self._discard(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            if self.policy == "lru":
+                self._entries.move_to_end(key)
+            self._frequency[key] += 1
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        if self.maxsize <= 0:
+            return
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            if key not in self._entries:
+                while len(self._entries) >= self.maxsize:
+                    self._discard(self._victim())
+                    self.evictions += 1
+                self._frequency[key] = 0
+            self._entries[key] = (value, expires_at)
+            if self.policy == "lru":
+                self._entries.move_to_end(key)
+
+    def _victim(self) -> Hashable:
+        if self.policy == "lfu":
+            # Least frequently used, ties broken by insertion order.
+            return min(self._entries, key=self._frequency.__getitem__)
+        return next(iter(self._entries))
+
+    def _discard(self, key: Hashable) -> Any:
+        self._frequency.pop(key, None)
+        return self._entries.pop(key, _MISSING)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._discard(key)
+            return default if entry is _MISSING else entry[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._frequency.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxSize": self.maxsize,
+            "policy": self.policy,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hitRate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class LRUCache(BoundedCache):
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        super().__init__(maxsize=maxsize, ttl=ttl, policy="lru")
+
+
+class FeatureCache:
+    """
+    Feature rows keyed by a hash of the exact text, kept in memory and appended to a JSON-lines file.
+
+    Rows are only ever added, so a file written by an interrupted run is still valid up to its last
+    complete line. Keep one file per feature extractor (e.g. per spaCy pipeline), since the keys do not
+    say which extractor produced a row.
+    """
+
+    def __init__(self, path: str):
+        self.path = os.path.expanduser(path)
+        self._rows: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # A line cut short by an interrupted write
+                    self._rows[entry["key"]] = entry["features"]
+
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._rows
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._rows)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self._rows.get(key)
+
+    def put_many(self, rows: Mapping[str, Dict[str, Any]]) -> None:
+        with self._lock:
+            new = {key: row for key, row in rows.items() if key not in self._rows}
+            if not new:
+                return
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                for key, row in new.items():
+                    f.write(json.dumps({"key": key, "features": {name: float(value) for name, value in row.items()}})
+                            + "\n")
+            self._rows.update(new)
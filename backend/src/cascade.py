@@ -0,0 +1,121 @@
+"""
+This file defines the CascadeGenerator, which answers with the smallest tier that is confident enough.
+
+In cascade mode every routed prompt is first answered by the smallest tier. The draft is scored with a
+cheap confidence signal:
+- the geometric mean of the generated tokens' probabilities, when the backend exposes log-probabilities
+- a heuristic that penalizes refusals, near-empty answers and heavily repeated words
+
+Drafts scoring below the threshold escalate to the next tier, until a tier is confident or the largest
+tier answers. Most traffic then never touches the 70B and 405B models.
+
+Example:
+    cascade = CascadeGenerator(['simple', 'medium', 'complex'], threshold=0.5)
+    result = cascade.run(lambda tier: backend.generate_with_logprobs(models[tier], tokenizers[tier], prompt))
+    result['tier'], result['scores']
+"""
+
+import math
+import time
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.metrics import Counter, CounterMap, Histogram
+
+REFUSAL_PATTERNS = (
+    "i'm sorry", "i am sorry", "i cannot", "i can't", "as an ai", "i don't know", "i do not know", "i'm not able",
+    "unable to",
+)
+SCORE_BUCKETS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+
+
+def heuristic_confidence(response: str, min_words: int = 3) -> float:
+    """Score a draft from 0 to 1 by its shape alone: refusals score 0, short or repetitive answers score low."""
+    text = response.strip().lower()
+    words = text.split()
+    if not words:
+        return 0.0
+    if any(pattern in text[:200] for pattern in REFUSAL_PATTERNS):
+        return 0.0
+    score = 1.0
+    if len(words) < min_words:
+        score *= len(words) / min_words
+    if len(words) >= 8:
+        # Below half distinct words the draft is probably looping.
+        score *= min(1.0, len(set(words)) / len(words) / 0.5)
+    return score
+
+
+def logprob_confidence(logprobs: Optional[List[float]]) -> Optional[float]:
+    """The geometric mean probability of the generated tokens, or None without log-probabilities."""
+    if not logprobs:
+        return None
+    return math.exp(sum(logprobs) / len(logprobs))
+
+
+class CascadeGenerator:
+    def __init__(self, tiers: List[str], threshold: float = 0.5, logger: Optional[logging.Logger] = None):
+        self.tiers = list(tiers)  # Ordered from the smallest to the most capable tier
+        self.threshold = threshold
+        self.logger = logger or logging.getLogger(__name__)
+        self.requests = Counter()
+        self.escalated_requests = Counter()
+        self.accepted = CounterMap(self.tiers)
+        self.escalations = CounterMap(f"{a}->{b}" for a, b in zip(self.tiers, self.tiers[1:]))
+        self.draft_scores = Histogram(SCORE_BUCKETS)
+        self.latency_saved = Counter(0.0)
+
+    def score(self, response: str, logprobs: Optional[List[float]] = None) -> float:
+        heuristic = heuristic_confidence(response)
+        from_logprobs = logprob_confidence(logprobs)
+        return heuristic if from_logprobs is None else min(heuristic, from_logprobs)
+
+    def run(self, draft: Callable[[str], Tuple[str, Optional[List[float]]]]) -> Dict[str, Any]:
+        """
+        Call `draft(tier)` from the smallest tier up until a draft clears the threshold, and return
+        the accepted response with the tiers tried, their scores and the total time.
+        """
+        self.requests.inc()
+        start_time = time.time()
+        tried, scores = [], []
+        for index, tier in enumerate(self.tiers):
+            response, logprobs = draft(tier)
+            score = self.score(response, logprobs)
+            tried.append(tier)
+            scores.append(score)
+            if index == len(self.tiers) - 1:
+                break
+            self.draft_scores.observe(score)
+            if score >= self.threshold:
+                break
+            self.escalations.inc(f"{tier}->{self.tiers[index + 1]}")
+            self.logger.info(f"Escalating from {tier} to {self.tiers[index + 1]} (draft confidence {score:.2f})")
+        if len(tried) > 1:
+            self.escalated_requests.inc()
+        self.accepted.inc(tried[-1])
+        return {
+            'response': response,
+            'tier': tried[-1],
+            'tiers': tried,
+            'scores': scores,
+            'escalated': len(tried) > 1,
+            'time': time.time() - start_time,
+        }
+
+    def record_saving(self, seconds: float) -> None:
+        """Record the latency saved (or lost, if negative) compared with routing straight to the classified tier."""
+        self.latency_saved.inc(seconds)
+
+    def get_stats(self) -> Dict[str, Any]:
+        requests = self.requests.value
+        return {
+            "threshold": self.threshold,
+            "requests": requests,
+            "escalatedRequests": self.escalated_requests.value,
+            "escalationRate": self.escalated_requests.value / requests if requests else 0.0,
+            "escalations": self.escalations.snapshot(),
+            "acceptedByTier": self.accepted.snapshot(),
+            "draftScores": self.draft_scores.get_stats(),
+            "latencySaved": self.latency_saved.value,
+            "meanLatencySaved": self.latency_saved.value / requests if requests else 0.0,
+        }
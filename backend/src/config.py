@@ -0,0 +1,187 @@
+"""
+This file defines the serving configuration of the Adaptive LLaMA Proxy and the watcher that hot-reloads it.
+
+A ServingConfig is an immutable snapshot of what the proxy serves: the classifier to route with, and
+for each model tier the checkpoint path, parameter count (in billions) and weight precision. The proxy
+holds one snapshot at a time and replaces it in a single assignment on reload
+(AdaptiveLlamaProxy.reload_config), so a request sees either the old or the new configuration, never
+a mix. Without a config file the built-in defaults are used.
+
+A config file is JSON, e.g.:
+
+    {
+        "classifier": "../data/task_classifier.alp",
+        "tiers": {
+            "simple": {"path": "mlx-community/Meta-Llama-3.1-8B-Instruct-4bit", "size": 8, "bits": 4},
+            "medium": {"path": "mlx-community/Meta-Llama-3.1-70B-Instruct-4bit", "size": 70, "bits": 4},
+            "complex": {"path": "mlx-community/Meta-Llama-3.1-405B-2bit", "size": 405, "bits": 2}
+        }
+    }
+
+Relative classifier paths are resolved against the config file's directory. The tier names are fixed
+(routing, the classifier's classes and the API refer to them), so a config must define exactly these
+tiers; only their definitions can change at runtime.
+
+The ConfigWatcher polls the config file and the classifier artifact and reloads the proxy when either
+changes, e.g. after an atomic `mv` of a retrained artifact into place.
+
+Example:
+    config = ServingConfig.from_file("config/serving.json")
+    changes = current.diff(config)  # {"classifier": True, "reloadedTiers": ["medium"], ...}
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+TIERS = ('simple', 'medium', 'complex')
+DEFAULT_TIERS = {
+    'simple': {'path': "mlx-community/Meta-Llama-3.1-8B-Instruct-4bit", 'size': 8, 'bits': 4},
+    'medium': {'path': "mlx-community/Meta-Llama-3.1-70B-Instruct-4bit", 'size': 70, 'bits': 4},
+    'complex': {'path': "mlx-community/Meta-Llama-3.1-405B-2bit", 'size': 405, 'bits': 2},
+}
+DATA_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), '..', 'data'))
+
+
+def env_flag(name: str, default: bool = False) -> bool:
+    """Whether a feature flag environment variable (e.g. ALP_BATCHING=1) is switched on."""
+    value = os.environ.get(name)
+    return default if value is None else value.lower() in ('1', 'true', 'yes')
+
+
+def default_classifier_path() -> str:
+    """The memory-mapped artifact if there is one, else the joblib file."""
+    artifact = os.path.join(DATA_DIR, 'task_classifier.alp')
+    return artifact if os.path.isdir(artifact) else os.path.join(DATA_DIR, 'task_classifier.joblib')
+
+
+def file_fingerprint(path: Optional[str]) -> Optional[Tuple[int, int]]:
+    """(mtime, size) of a file, or of an artifact directory's manifest; None if it does not exist."""
+    if path is None:
+        return None
+    if os.path.isdir(path):
+        path = os.path.join(path, 'manifest.json')
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class ServingConfig:
+    def __init__(self, tiers: Dict[str, Dict[str, Any]], classifier: Optional[str] = None,
+                 source: Optional[str] = None, version: int = 0):
+        if set(tiers) != set(TIERS):
+            raise ValueError(f"The config must define exactly the tiers {', '.join(TIERS)}, got {', '.join(tiers)}")
+        self.tiers: Dict[str, Dict[str, Any]] = {}
+        for tier in TIERS:
+            spec = tiers[tier]
+            if not isinstance(spec.get('path'), str) or not spec['path']:
+                raise ValueError(f"Tier {tier} needs a checkpoint path")
+            if not spec.get('size', 0) > 0 or not int(spec.get('bits', 0)) > 0:
+                raise ValueError(f"Tier {tier} needs a positive size (billions of parameters) and bits")
+            self.tiers[tier] = {'path': spec['path'], 'size': spec['size'], 'bits': int(spec['bits'])}
+        self.classifier = classifier or default_classifier_path()
+        self.classifier_fingerprint = file_fingerprint(self.classifier)
+        self.source = source
+        self.version = version
+        self.loaded_at = time.time()
+
+    @classmethod
+    def default(cls) -> "ServingConfig":
+        return cls(DEFAULT_TIERS)
+
+    @classmethod
+    def from_file(cls, path: str) -> "ServingConfig":
+        with open(path, 'r') as f:
+            data = json.load(f)
+        classifier = data.get('classifier')
+        if classifier is not None and not os.path.isabs(classifier):
+            classifier = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(path)), classifier))
+        if classifier is not None and not os.path.exists(classifier):
+            raise FileNotFoundError(f"Classifier not found at {classifier}")
+        return cls(data.get('tiers', DEFAULT_TIERS), classifier=classifier, source=path)
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> "ServingConfig":
+        return cls.from_file(path) if path else cls.default()
+
+    @property
+    def model_paths(self) -> Dict[str, str]:
+        return {tier: spec['path'] for tier, spec in self.tiers.items()}
+
+    @property
+    def model_sizes(self) -> Dict[str, float]:
+        return {tier: spec['size'] for tier, spec in self.tiers.items()}
+
+    @property
+    def model_bits(self) -> Dict[str, int]:
+        return {tier: spec['bits'] for tier, spec in self.tiers.items()}
+
+    def revision(self, tier: str) -> str:
+        """Identifies the weights a tier serves, e.g. to scope cached responses to them."""
+        return f"{self.tiers[tier]['path']}@{self.tiers[tier]['bits']}bit"
+
+    def diff(self, new: "ServingConfig") -> Dict[str, Any]:
+        """
+        What changes going from this config to `new`: whether the classifier must be reloaded (another
+        path, or the same path rewritten), the tiers whose weights changed (path or precision), and the
+        tiers whose size changed with the same weights.
+        """
+        reloaded = [tier for tier in TIERS if (self.tiers[tier]['path'], self.tiers[tier]['bits'])
+                    != (new.tiers[tier]['path'], new.tiers[tier]['bits'])]
+        resized = [tier for tier in TIERS
+                   if tier not in reloaded and self.tiers[tier]['size'] != new.tiers[tier]['size']]
+        return {
+            "classifier": (self.classifier, self.classifier_fingerprint) != (new.classifier, new.classifier_fingerprint),
+            "reloadedTiers": reloaded,
+            "resizedTiers": resized,
+            "unchangedTiers": [tier for tier in TIERS if tier not in reloaded and tier not in resized],
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"version": self.version, "source": self.source, "loadedAt": self.loaded_at,
+                "classifier": self.classifier, "tiers": {tier: dict(spec) for tier, spec in self.tiers.items()}}
+
+
+class ConfigWatcher:
+    """Polls the files a config depends on and calls `reload` when one of them changes."""
+
+    def __init__(self, paths: Callable[[], List[Optional[str]]], reload: Callable[[], Any], interval: float = 2.0,
+                 logger: Optional[logging.Logger] = None):
+        self.paths = paths
+        self.reload = reload
+        self.interval = interval
+        self.logger = logger or logging.getLogger(__name__)
+        self._fingerprints = self._snapshot()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="alp-config-watcher", daemon=True)
+        self._thread.start()
+
+    def _snapshot(self) -> Dict[str, Optional[Tuple[int, int]]]:
+        return {path: file_fingerprint(path) for path in self.paths() if path is not None}
+
+    def check_once(self) -> bool:
+        """Reload if a watched file changed since the last check. Returns whether it reloaded."""
+        fingerprints = self._snapshot()
+        if fingerprints == self._fingerprints:
+            return False
+        try:
+            self.reload()
+        except Exception as e:
+            # The proxy keeps serving the previous config; the change is retried once the files change again.
+            self.logger.warning(f"Config reload failed: {str(e)}")
+            return False
+        finally:
+            self._fingerprints = fingerprints
+        return True
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.check_once()
+
+    def stop(self) -> None:
+        self._stop.set()
@@ -0,0 +1,165 @@
+"""
+This file defines the FastClassifier class, a fast-path task complexity classifier that does not need spaCy.
+
+It scores prompts with a linear (multinomial logistic regression) model over hashed word unigrams and
+bigrams, hashed character trigrams and a few cheap lexical features, so classifying a short prompt costs
+a tokenizing regex, some hashing and one small dot product: tens of microseconds instead of a spaCy parse.
+Inference only needs numpy; scikit-learn is only imported to train.
+
+TaskClassifier consults it first when one is attached (see TaskClassifier.set_fast_classifier) and falls
+back to the full spaCy + XGBoost path only when the fast path's confidence is below a threshold.
+scripts/train_fast_classifier.py trains it to agree with the full classifier and benchmarks the two.
+
+Example:
+    fast = FastClassifier()
+    fast.train(prompts, labels)
+    fast.save("data/fast_classifier.npz")
+    probabilities = FastClassifier.load("data/fast_classifier.npz").predict_proba("What is 2 + 2?")
+"""
+
+import re
+import json
+import math
+import zlib
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9']+")
+SENTENCE_END_PATTERN = re.compile(r"[.!?]+(?:\s|$)")
+ARTIFACT_VERSION = 1
+
+
+class FastClassifier:
+    LEXICAL_FEATURES = (
+        'log_chars', 'log_words', 'avg_word_length', 'sentence_count', 'question_marks',
+        'digit_ratio', 'upper_ratio', 'unique_word_ratio', 'long_word_ratio',
+    )
+
+    def __init__(self, n_buckets: int = 2 ** 15, char_ngram: int = 3, regularization: float = 4.0):
+        if n_buckets & (n_buckets - 1):
+            raise ValueError("n_buckets must be a power of two")
+        self.n_buckets = n_buckets
+        self.char_ngram = char_ngram
+        self.regularization = regularization
+        self.classes: List[str] = []
+        self.weights: Optional[np.ndarray] = None  # (n_buckets + lexical features, classes)
+        self.bias: Optional[np.ndarray] = None
+        self.lexical_mean = np.zeros(len(self.LEXICAL_FEATURES))
+        self.lexical_scale = np.ones(len(self.LEXICAL_FEATURES))
+
+    @property
+    def n_features(self) -> int:
+        return self.n_buckets + len(self.LEXICAL_FEATURES)
+
+    def _ngrams(self, words: List[str]) -> List[str]:
+        grams = list(words)
+        grams.extend(f"{a} {b}" for a, b in zip(words, words[1:]))
+        n = self.char_ngram
+        for word in words:
+            padded = f"<{word}>"
+            grams.extend("#" + padded[i:i + n] for i in range(len(padded) - n + 1))
+        return grams
+
+    def _hashed(self, words: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Signed hashed n-gram counts, L2-normalized, as (indices, values)."""
+        counts: Counter = Counter()
+        mask = self.n_buckets - 1
+        for gram in self._ngrams(words):
+            h = zlib.crc32(gram.encode("utf-8"))
+            # The top bit picks the sign, so collisions tend to cancel out instead of adding up.
+            counts[h & mask] += -1.0 if h & 0x80000000 else 1.0
+        indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        values = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+        norm = np.sqrt(np.dot(values, values))
+        return indices, values / norm if norm > 0 else values
+
+    @staticmethod
+    def _lexical(text: str, words: List[str]) -> np.ndarray:
+        chars = max(len(text), 1)
+        word_count = len(words)
+        return np.array([
+            math.log1p(len(text)),
+            math.log1p(word_count),
+            sum(len(word) for word in words) / word_count if word_count else 0.0,
+            max(len(SENTENCE_END_PATTERN.findall(text)), 1),
+            text.count("?"),
+            sum(c.isdigit() for c in text) / chars,
+            sum(c.isupper() for c in text) / chars,
+            len(set(words)) / word_count if word_count else 0.0,
+            sum(len(word) >= 8 for word in words) / word_count if word_count else 0.0,
+        ])
+
+    def features(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """The sparse feature vector of a prompt as (indices, values), lexical features standardized."""
+        words = TOKEN_PATTERN.findall(text.lower())
+        indices, values = self._hashed(words)
+        lexical = (self._lexical(text, words) - self.lexical_mean) / self.lexical_scale
+        return (np.concatenate((indices, np.arange(self.n_buckets, self.n_features))),
+                np.concatenate((values, lexical)))
+
+    def predict_proba(self, text: str) -> Dict[str, float]:
+        if self.weights is None:
+            raise ValueError("Fast classifier not trained. Call train() or load() first.")
+        indices, values = self.features(text)
+        logits = values @ self.weights[indices] + self.bias
+        exp = np.exp(logits - logits.max())
+        probabilities = exp / exp.sum()
+        return {class_name: float(prob) for class_name, prob in zip(self.classes, probabilities)}
+
+    def predict_with_confidence(self, text: str) -> Tuple[str, float]:
+        probabilities = self.predict_proba(text)
+        best = max(probabilities, key=probabilities.get)
+        return best, probabilities[best]
+
+    def _matrix(self, texts: Sequence[str]) -> "sparse.csr_matrix":
+        from scipy import sparse
+        rows = [self.features(text) for text in texts]
+        indptr = np.cumsum([0] + [len(indices) for indices, _ in rows])
+        return sparse.csr_matrix((np.concatenate([values for _, values in rows]),
+                                  np.concatenate([indices for indices, _ in rows]), indptr),
+                                 shape=(len(texts), self.n_features))
+
+    def train(self, texts: Sequence[str], labels: Sequence[str]) -> None:
+        from sklearn.linear_model import LogisticRegression
+
+        lexical = np.array([self._lexical(text, TOKEN_PATTERN.findall(text.lower())) for text in texts])
+        self.lexical_mean = lexical.mean(axis=0)
+        scale = lexical.std(axis=0)
+        self.lexical_scale = np.where(scale > 0, scale, 1.0)
+
+        model = LogisticRegression(C=self.regularization, max_iter=2000)
+        model.fit(self._matrix(texts), list(labels))
+        self.classes = [str(class_name) for class_name in model.classes_]
+        coef, intercept = model.coef_, model.intercept_
+        if len(self.classes) == 2:
+            # Binary logistic regression keeps one row; expand it into per-class logits for the softmax.
+            coef = np.vstack((-coef[0] / 2, coef[0] / 2))
+            intercept = np.array([-intercept[0] / 2, intercept[0] / 2])
+        self.weights = np.ascontiguousarray(coef.T, dtype=np.float32)
+        self.bias = intercept.astype(np.float32)
+
+    def save(self, path: str) -> None:
+        if self.weights is None:
+            raise ValueError("Fast classifier not trained. Call train() first.")
+        config = {"version": ARTIFACT_VERSION, "n_buckets": self.n_buckets, "char_ngram": self.char_ngram,
+                  "regularization": self.regularization, "classes": self.classes}
+        with open(path, "wb") as f:
+            np.savez(f, weights=self.weights, bias=self.bias, lexical_mean=self.lexical_mean,
+                     lexical_scale=self.lexical_scale, config=np.array(json.dumps(config)))
+
+    @classmethod
+    def load(cls, path: str) -> "FastClassifier":
+        with np.load(path, allow_pickle=False) as artifact:
+            config = json.loads(str(artifact["config"]))
+            if config["version"] != ARTIFACT_VERSION:
+                raise ValueError(f"Unsupported fast classifier artifact version {config['version']}")
+            classifier = cls(n_buckets=config["n_buckets"], char_ngram=config["char_ngram"],
+                             regularization=config["regularization"])
+            classifier.classes = config["classes"]
+            classifier.weights = artifact["weights"]
+            classifier.bias = artifact["bias"]
+            classifier.lexical_mean = artifact["lexical_mean"]
+            classifier.lexical_scale = artifact["lexical_scale"]
+        return classifier
@@ -0,0 +1,224 @@
+"""
+This file defines the metric primitives used to instrument the Adaptive LLaMA Proxy.
+
+- Counter: a thread-safe counter
+- CounterMap: a thread-safe set of counters keyed by label (e.g. per model tier)
+- Histogram: a thread-safe histogram with fixed bucket upper bounds, plus count and sum
+- HistogramMap: a set of histograms with shared buckets keyed by label (e.g. per model tier)
+- PrometheusExposition: renders metrics in the Prometheus text exposition format
+
+Example:
+    queue_wait = Histogram(LATENCY_BUCKETS)
+    queue_wait.observe(0.012)
+    queue_wait.get_stats()
+
+    exposition = PrometheusExposition(namespace="alp")
+    exposition.histogram("queue_wait_seconds", "Time spent queued.", {"simple": queue_wait})
+    exposition.render()
+"""
+
+import bisect
+import math
+import threading
+from typing import Any, Dict, Hashable, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+THROUGHPUT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000)  # Tokens per second
+PHASES = ("queue", "classify", "load", "prefill", "decode")  # Per-request latency phases, in request order
+
+
+class Counter:
+    def __init__(self, initial: Union[int, float] = 0):
+        self._value = initial
+        self._lock = threading.Lock()
+
+    def inc(self, amount: Union[int, float] = 1) -> Union[int, float]:
+        with self._lock:
+            self._value += amount
+            return self._value
+
+    @property
+    def value(self) -> Union[int, float]:
+        return self._value
+
+
+class CounterMap:
+    def __init__(self, keys: Iterable[Hashable] = ()):
+        self._values: Dict[Hashable, Union[int, float]] = {key: 0 for key in keys}
+        self._lock = threading.Lock()
+
+    def inc(self, key: Hashable, amount: Union[int, float] = 1) -> Union[int, float]:
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+            return self._values[key]
+
+    def get(self, key: Hashable) -> Union[int, float]:
+        return self._values.get(key, 0)
+
+    def snapshot(self) -> Dict[Hashable, Union[int, float]]:
+        with self._lock:
+            return dict(self._values)
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # The last bucket is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by linear interpolation inside the bucket that contains it."""
+        with self._lock:
+            counts = list(self.counts)
+            total = self.count
+        if total == 0:
+            return 0.0
+        rank = q * total
+        cumulative = 0
+        for index, bucket_count in enumerate(counts):
+            if cumulative + bucket_count >= rank and bucket_count > 0:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                if index == len(self.buckets):
+                    return lower
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-1]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = list(self.counts)
+            count, total = self.count, self.sum
+        return {
+            "count": count,
+            "sum": total,
+            "mean": total / count if count else 0.0,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": {str(bound): bucket_count for bound, bucket_count in zip(self.buckets + ("+Inf",), counts)},
+        }
+
+    def snapshot(self) -> Tuple[List[int], int, float]:
+        """Consistent (bucket counts, count, sum), for exporters."""
+        with self._lock:
+            return list(self.counts), self.count, self.sum
+
+
+class HistogramMap:
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS, keys: Iterable[Hashable] = ()):
+        self.buckets = tuple(sorted(buckets))
+        self._histograms: Dict[Hashable, Histogram] = {key: Histogram(self.buckets) for key in keys}
+        self._lock = threading.Lock()
+
+    def observe(self, key: Hashable, value: float) -> None:
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+        histogram.observe(value)
+
+    def get(self, key: Hashable) -> Optional[Histogram]:
+        return self._histograms.get(key)
+
+    def snapshot(self) -> Dict[Hashable, Histogram]:
+        with self._lock:
+            return dict(self._histograms)
+
+    def merged(self) -> Histogram:
+        """One histogram over every key."""
+        total = Histogram(self.buckets)
+        for histogram in self.snapshot().values():
+            counts, count, value_sum = histogram.snapshot()
+            total.counts = [a + b for a, b in zip(total.counts, counts)]
+            total.count += count
+            total.sum += value_sum
+        return total
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = self.merged().get_stats()
+        stats["byKey"] = {key: histogram.get_stats() for key, histogram in self.snapshot().items()}
+        return stats
+
+
+def _format_value(value: Union[int, float]) -> str:
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        if math.isnan(value):
+            return "NaN"
+        return repr(value)
+    return str(value)
+
+
+def _escape_label(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], key: Any, extra: Sequence[Tuple[str, str]] = ()) -> str:
+    values = key if isinstance(key, tuple) else (key,)
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label(value)}"' for name, value in pairs) + "}"
+
+
+class PrometheusExposition:
+    """
+    Collects metric families and renders them in the Prometheus text format (version 0.0.4).
+
+    Samples are given as {key: value} with `labels` naming the labels: a key is the label value, or a tuple
+    of values when there are several labels. Unlabeled families use labels=() and any single key.
+    """
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self, namespace: str = ""):
+        self.namespace = namespace
+        self._lines: List[str] = []
+
+    def _header(self, name: str, help_text: str, metric_type: str) -> str:
+        name = f"{self.namespace}_{name}" if self.namespace else name
+        self._lines.append(f"# HELP {name} {help_text}")
+        self._lines.append(f"# TYPE {name} {metric_type}")
+        return name
+
+    def _samples(self, name: str, samples: Mapping[Any, Union[int, float]], labels: Sequence[str]) -> None:
+        for key, value in samples.items():
+            self._lines.append(f"{name}{_format_labels(labels, key)} {_format_value(value)}")
+
+    def gauge(self, name: str, help_text: str, samples: Mapping[Any, Union[int, float]],
+              labels: Sequence[str] = ("tier",)) -> None:
+        self._samples(self._header(name, help_text, "gauge"), samples, labels)
+
+    def counter(self, name: str, help_text: str, samples: Mapping[Any, Union[int, float]],
+                labels: Sequence[str] = ("tier",)) -> None:
+        """`name` should end in _total."""
+        self._samples(self._header(name, help_text, "counter"), samples, labels)
+
+    def histogram(self, name: str, help_text: str, histograms: Mapping[Any, Histogram],
+                  labels: Sequence[str] = ("tier",)) -> None:
+        name = self._header(name, help_text, "histogram")
+        for key, histogram in histograms.items():
+            counts, count, value_sum = histogram.snapshot()
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                le = _format_value(float(bound))
+                self._lines.append(f"{name}_bucket{_format_labels(labels, key, [('le', le)])} {cumulative}")
+            self._lines.append(f"{name}_sum{_format_labels(labels, key)} {_format_value(float(value_sum))}")
+            self._lines.append(f"{name}_count{_format_labels(labels, key)} {count}")
+
+    def render(self) -> str:
+        return "\n".join(self._lines) + "\n"
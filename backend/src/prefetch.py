@@ -0,0 +1,92 @@
+"""
+This file defines the ModelPrefetcher, which loads model tiers in the background before requests need them.
+
+The prefetcher watches the tiers that recent requests were routed to. Every `interval` seconds it picks
+the most requested tier that is not resident, and preloads it (followed by a short warm-up generation)
+if it fits in the memory budget without evicting anything.
+
+Example:
+    prefetcher = ModelPrefetcher(alp, window=100, min_share=0.1)
+    prefetcher.record('medium')  # called by AdaptiveLlamaProxy.route()
+    prefetcher.get_stats()
+"""
+
+import logging
+import threading
+import collections
+from typing import Any, Dict, Optional
+
+from src.metrics import Counter
+
+
+class ModelPrefetcher:
+    def __init__(self, proxy: Any, window: int = 100, min_share: float = 0.1, interval: float = 1.0,
+                 logger: Optional[logging.Logger] = None):
+        self.proxy = proxy
+        self.window = window
+        self.min_share = min_share
+        self.interval = interval
+        self.logger = logger or logging.getLogger(__name__)
+        self._recent: collections.deque = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.prefetches = Counter()
+        self.completed = Counter()
+        self.failed = Counter()
+        self._thread = threading.Thread(target=self._run, name="alp-prefetcher", daemon=True)
+        self._thread.start()
+
+    def record(self, tier: str) -> None:
+        with self._lock:
+            self._recent.append(tier)
+
+    def tier_mix(self) -> Dict[str, float]:
+        with self._lock:
+            counts = collections.Counter(self._recent)
+            total = len(self._recent)
+        return {tier: count / total for tier, count in counts.items()} if total else {}
+
+    def forecast(self) -> Optional[str]:
+        """The most requested tier in the recent window that is neither resident nor loading."""
+        for tier, share in sorted(self.tier_mix().items(), key=lambda item: item[1], reverse=True):
+            if share < self.min_share:
+                break
+            if tier not in self.proxy.registry and not self.proxy.is_loading(tier):
+                return tier
+        return None
+
+    def prefetch_once(self) -> Optional[str]:
+        tier = self.forecast()
+        if tier is None or not self.proxy.registry.fits(self.proxy.required_memory(tier)):
+            return None
+        self.logger.info(f"Prefetching {tier} model")
+        self.prefetches.inc()
+        future = self.proxy.load_model_async(tier, warmup=True, evict=False)
+        future.add_done_callback(self._on_done)
+        return tier
+
+    def _on_done(self, future) -> None:
+        if future.exception() is not None:
+            self.failed.inc()
+            self.logger.warning(f"Prefetch failed: {future.exception()}")
+        else:
+            self.completed.inc()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.prefetch_once()
+            except Exception as e:
+                self.logger.warning(f"Prefetcher error: {str(e)}")
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join(timeout=5)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "tierMix": self.tier_mix(),
+            "prefetches": self.prefetches.value,
+            "completed": self.completed.value,
+            "failed": self.failed.value,
+        }
@@ -0,0 +1,139 @@
+"""
+This file defines the PrefixCache, which lets requests that share a prompt prefix (system prompts,
+few-shot examples) skip re-encoding it.
+
+The cache holds KV states produced by a backend's prefill() for one model tier. Prompts are split into
+fixed-size token blocks, and each block is hashed together with every block before it, so a block hash
+identifies the whole prefix that ends with that block. A stored state is indexed under all of its block
+hashes: any later prompt sharing one of those prefixes reuses the state, truncated to the shared length.
+
+Entries are evicted least recently used first to keep the total state size under `max_bytes`.
+
+Example:
+    cache = PrefixCache(max_bytes=512 * 1024 ** 2, block_size=16)
+    cached_tokens, state = cache.lookup(ids)
+    ...
+    cache.put(ids[:boundary], state, nbytes=backend.state_nbytes(state))
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.metrics import Counter
+
+
+class _PrefixEntry:
+    def __init__(self, key: str, state: Any, ntokens: int, nbytes: int, block_hashes: List[str]):
+        self.key = key
+        self.state = state
+        self.ntokens = ntokens
+        self.nbytes = nbytes
+        self.block_hashes = block_hashes
+
+
+class PrefixCache:
+    def __init__(self, max_bytes: int, block_size: int = 16):
+        self.max_bytes = int(max_bytes)
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _PrefixEntry]" = OrderedDict()
+        # Block hash -> key of the entry that holds that prefix
+        self._index: Dict[str, str] = {}
+        self.used_bytes = 0
+        self.lookups = Counter()
+        self.hits = Counter()
+        self.tokens_saved = Counter()
+        self.tokens_prefilled = Counter()
+        self.evictions = Counter()
+
+    def block_hashes(self, ids: List[int]) -> List[str]:
+        """Chained hashes of the full blocks of `ids`; hash i covers the first (i + 1) * block_size tokens."""
+        hashes, digest = [], b""
+        for start in range(0, len(ids) - self.block_size + 1, self.block_size):
+            block = ",".join(map(str, ids[start:start + self.block_size])).encode("ascii")
+            digest = hashlib.sha1(digest + block).digest()
+            hashes.append(digest.hex())
+        return hashes
+
+    def boundary(self, ids: List[int]) -> int:
+        """The longest block-aligned prefix of `ids` that still leaves at least one token to decode from."""
+        return (len(ids) - 1) // self.block_size * self.block_size if ids else 0
+
+    def lookup(self, ids: List[int]) -> Tuple[int, Optional[Any]]:
+        """
+        Return (cached_tokens, state) for the longest cached block-aligned prefix of `ids` that leaves at
+        least one token uncached. The state may cover more than cached_tokens and must be truncated.
+        """
+        self.lookups.inc()
+        hashes = self.block_hashes(ids[:self.boundary(ids)])
+        with self._lock:
+            for blocks in range(len(hashes), 0, -1):
+                key = self._index.get(hashes[blocks - 1])
+                if key is not None:
+                    entry = self._entries[key]
+                    self._entries.move_to_end(key)
+                    ntokens = blocks * self.block_size
+                    self.hits.inc()
+                    self.tokens_saved.inc(ntokens)
+                    return ntokens, entry.state
+        return 0, None
+
+    def put(self, ids: List[int], state: Any, nbytes: int) -> bool:
+        """Store the state for `ids` (a block-aligned prefix). Returns False if it cannot fit at all."""
+        hashes = self.block_hashes(ids)
+        if not hashes or nbytes > self.max_bytes:
+            return False
+        key = hashes[-1]
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return True
+            entry = _PrefixEntry(key, state, len(hashes) * self.block_size, nbytes, hashes)
+            self._entries[key] = entry
+            self.used_bytes += nbytes
+            for block_hash in hashes:
+                # Point every prefix at the newest (longest-lived) entry that contains it.
+                self._index[block_hash] = key
+            while self.used_bytes > self.max_bytes:
+                self._evict_oldest()
+        return True
+
+    def _evict_oldest(self) -> None:
+        _, entry = self._entries.popitem(last=False)
+        self.used_bytes -= entry.nbytes
+        self.evictions.inc()
+        for block_hash in entry.block_hashes:
+            if self._index.get(block_hash) != entry.key:
+                continue
+            del self._index[block_hash]
+            # Another entry may still cover this prefix.
+            for other in reversed(self._entries.values()):
+                if block_hash in other.block_hashes:
+                    self._index[block_hash] = other.key
+                    break
+
+    def record_prefill(self, ntokens: int) -> None:
+        self.tokens_prefilled.inc(ntokens)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._index.clear()
+            self.used_bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.lookups.value
+        return {
+            "entries": len(self._entries),
+            "bytes": self.used_bytes,
+            "maxBytes": self.max_bytes,
+            "blockSize": self.block_size,
+            "lookups": lookups,
+            "hits": self.hits.value,
+            "hitRate": self.hits.value / lookups if lookups else 0.0,
+            "prefillTokensSaved": self.tokens_saved.value,
+            "prefillTokens": self.tokens_prefilled.value,
+            "evictions": self.evictions.value,
+        }
@@ -0,0 +1,144 @@
+"""
+This file defines the ModelRegistry, the thread-safe front of the ModelResidencyManager.
+
+All access to resident models goes through one lock, and loading is single-flight: when several
+requests (or the prefetcher) ask for the same cold tier at once, exactly one load runs and every
+caller waits on the same future. This keeps peak memory at one copy per tier, even for the 70B and
+405B models.
+
+Example:
+    registry = ModelRegistry(residency, executor)
+    future = registry.load_async('medium', loader=lambda: backend.load('medium', path), nbytes=required_bytes)
+    model, tokenizer = future.result()
+"""
+
+import time
+import logging
+import threading
+import concurrent.futures
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from src.metrics import CounterMap
+from src.residency import ModelResidencyManager, ResidentModel
+
+
+class ModelRegistry:
+    def __init__(self, residency: ModelResidencyManager, executor: concurrent.futures.Executor,
+                 logger: Optional[logging.Logger] = None):
+        self.residency = residency
+        self.executor = executor
+        self.logger = logger or logging.getLogger(__name__)
+        self._lock = threading.RLock()
+        self._inflight: Dict[str, concurrent.futures.Future] = {}
+        self.loads = CounterMap()
+        self.joined_loads = CounterMap()
+
+    def __contains__(self, tier: str) -> bool:
+        with self._lock:
+            return tier in self.residency
+
+    def get(self, tier: str) -> Optional[Tuple[Any, Any]]:
+        with self._lock:
+            return self.residency.get(tier)
+
+    def peek(self, tier: str) -> Optional[Tuple[Any, Any]]:
+        with self._lock:
+            return self.residency.peek(tier)
+
+    def acquire(self, tier: str) -> Optional[ResidentModel]:
+        """Pin a resident tier so it is not evicted while a request generates with it."""
+        with self._lock:
+            return self.residency.acquire(tier)
+
+    def release(self, entry: ResidentModel) -> None:
+        with self._lock:
+            self.residency.release(entry)
+
+    def draining(self, tier: str) -> list:
+        """Removed models of a tier that requests are still generating with."""
+        with self._lock:
+            return [entry for entry in self.residency.draining if entry.tier == tier]
+
+    def resident_tiers(self) -> list:
+        with self._lock:
+            return list(self.residency.resident)
+
+    def models(self) -> Dict[str, Tuple[Any, Any]]:
+        with self._lock:
+            return {tier: (entry.model, entry.tokenizer) for tier, entry in self.residency.resident.items()}
+
+    def fits(self, nbytes: int) -> bool:
+        with self._lock:
+            return self.residency.fits(nbytes)
+
+    def is_loading(self, tier: str) -> bool:
+        with self._lock:
+            return tier in self._inflight
+
+    def inflight(self, tier: str) -> Optional[concurrent.futures.Future]:
+        """The future of the tier's load in progress, if any."""
+        with self._lock:
+            return self._inflight.get(tier)
+
+    def load_async(self, tier: str, loader: Callable[[], Tuple[Any, Any]], nbytes: int,
+                   evict: bool = True) -> concurrent.futures.Future:
+        """
+        Return a future for the tier's (model, tokenizer), starting `loader` on the executor only if the
+        tier is neither resident nor already loading. Budget problems are reported through the future.
+        """
+        with self._lock:
+            resident = self.residency.peek(tier)
+            if resident is not None:
+                future: concurrent.futures.Future = concurrent.futures.Future()
+                future.set_result(resident)
+                return future
+            inflight = self._inflight.get(tier)
+            if inflight is not None:
+                self.joined_loads.inc(tier)
+                return inflight
+
+            future = concurrent.futures.Future()
+            try:
+                evicted = self.residency.reserve(tier, nbytes, evict=evict)
+            except MemoryError as e:
+                future.set_exception(e)
+                return future
+            if evicted:
+                self.logger.info(f"Made room for {tier} model by evicting: {', '.join(evicted)}")
+            self._inflight[tier] = future
+            self.loads.inc(tier)
+
+        self.executor.submit(self._run_load, tier, loader, nbytes, future)
+        return future
+
+    def _run_load(self, tier: str, loader: Callable[[], Tuple[Any, Any]], nbytes: int,
+                  future: concurrent.futures.Future) -> None:
+        start_time = time.time()
+        try:
+            model, tokenizer = loader()
+        except BaseException as e:
+            with self._lock:
+                self.residency.cancel_reservation(tier)
+                self._inflight.pop(tier, None)
+            future.set_exception(e)
+            return
+        with self._lock:
+            self.residency.add(tier, model, tokenizer, nbytes=nbytes, load_time=time.time() - start_time)
+            self._inflight.pop(tier, None)
+        future.set_result((model, tokenizer))
+
+    def remove(self, tier: str) -> None:
+        with self._lock:
+            self.residency.remove(tier)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.residency.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = self.residency.get_stats()
+            stats["loading"] = list(self._inflight)
+        stats["loads"] = self.loads.snapshot()
+        stats["joinedLoads"] = self.joined_loads.snapshot()
+        return stats
@@ -0,0 +1,183 @@
+"""
+This file defines the ModelResidencyManager, which decides which model tiers stay loaded.
+
+The manager holds the loaded (model, tokenizer) pairs under a global memory budget. When a new tier
+needs room, resident tiers are evicted in order of a cost-aware score that combines:
+- recency: tiers that have not been used for a while are cheaper to drop
+- reload cost: tiers that took long to load are expensive to drop
+- frequency: tiers that serve many requests are expensive to drop
+
+Requests pin the tier they generate with (acquire/release). Pinned tiers are never evicted, and a pinned
+tier that is removed explicitly (unloaded, or replaced on a config reload) keeps counting against the
+budget, and is only released, once its last request has finished.
+
+Example:
+    residency = ModelResidencyManager(memory_budget=64 * 1024 ** 3)
+    evicted = residency.reserve('medium', required_bytes)
+    residency.add('medium', model, tokenizer, nbytes=required_bytes, load_time=42.0)
+    entry = residency.acquire('medium')
+    ...  # generate with entry.model and entry.tokenizer
+    residency.release(entry)
+"""
+
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class ResidentModel:
+    def __init__(self, tier: str, model: Any, tokenizer: Any, nbytes: int, load_time: float):
+        self.tier = tier
+        self.model = model
+        self.tokenizer = tokenizer
+        self.nbytes = nbytes
+        self.load_time = load_time
+        self.loaded_at = time.monotonic()
+        self.last_used = self.loaded_at
+        self.uses = 0
+        # Requests currently generating with this model.
+        self.users = 0
+        # Set once the model has been released after being removed.
+        self.released = threading.Event()
+
+
+class ModelResidencyManager:
+    def __init__(self, memory_budget: int,
+                 on_evict: Optional[Callable[[str, Any, Any], None]] = None,
+                 logger: Optional[logging.Logger] = None):
+        self.memory_budget = int(memory_budget)
+        self.on_evict = on_evict
+        self.logger = logger or logging.getLogger(__name__)
+        self.resident: Dict[str, ResidentModel] = {}
+        # Bytes reserved for tiers that are currently being loaded.
+        self.reserved: Dict[str, int] = {}
+        # Removed models that requests are still generating with; released when the last one finishes.
+        self.draining: List[ResidentModel] = []
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def used_memory(self) -> int:
+        return (sum(entry.nbytes for entry in self.resident.values()) + sum(self.reserved.values())
+                + sum(entry.nbytes for entry in self.draining))
+
+    def __contains__(self, tier: str) -> bool:
+        return tier in self.resident
+
+    def get(self, tier: str) -> Optional[Tuple[Any, Any]]:
+        """Return the resident (model, tokenizer) for a tier and record the access, or None on a miss."""
+        entry = self.resident.get(tier)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        entry.uses += 1
+        entry.last_used = time.monotonic()
+        return entry.model, entry.tokenizer
+
+    def peek(self, tier: str) -> Optional[Tuple[Any, Any]]:
+        """Return the resident (model, tokenizer) for a tier without recording an access."""
+        entry = self.resident.get(tier)
+        return (entry.model, entry.tokenizer) if entry is not None else None
+
+    def acquire(self, tier: str) -> Optional[ResidentModel]:
+        """Pin a resident tier for a request, or return None if it is not resident. Pair with release()."""
+        entry = self.resident.get(tier)
+        if entry is not None:
+            entry.users += 1
+        return entry
+
+    def release(self, entry: ResidentModel) -> None:
+        """Unpin a model taken with acquire(), releasing it if it was removed while in use."""
+        entry.users -= 1
+        if entry.users == 0 and entry in self.draining:
+            self.draining.remove(entry)
+            self._release(entry)
+
+    def eviction_score(self, entry: ResidentModel, now: Optional[float] = None) -> float:
+        """Lower scores are evicted first: rarely used, long idle, cheap to reload."""
+        now = time.monotonic() if now is None else now
+        idle = max(now - entry.last_used, 0.0)
+        return (entry.uses + 1) * (entry.load_time + 1.0) / (idle + 1.0)
+
+    def fits(self, nbytes: int) -> bool:
+        return self.used_memory + nbytes <= self.memory_budget
+
+    def reserve(self, tier: str, nbytes: int, evict: bool = True) -> List[str]:
+        """
+        Reserve `nbytes` for a tier that is about to be loaded, evicting resident tiers until it fits
+        (unless `evict` is False). Returns the evicted tiers. The reservation is released by add() or
+        cancel_reservation().
+        """
+        if nbytes > self.memory_budget:
+            raise MemoryError(f"{tier.capitalize()} model needs {nbytes / 1024 ** 3:.1f} GB, "
+                              f"which exceeds the memory budget of {self.memory_budget / 1024 ** 3:.1f} GB")
+        evicted = []
+        if evict:
+            now = time.monotonic()
+            # Tiers that requests are generating with stay resident.
+            candidates = sorted((entry for entry in self.resident.values() if entry.tier != tier and not entry.users),
+                                key=lambda entry: self.eviction_score(entry, now))
+            for entry in candidates:
+                if self.fits(nbytes):
+                    break
+                self.evict(entry.tier)
+                evicted.append(entry.tier)
+        if not self.fits(nbytes):
+            in_use = [entry.tier for entry in self.resident.values() if entry.users] + [entry.tier for entry in self.draining]
+            raise MemoryError(f"Not enough memory budget to load {tier} model"
+                              + (f" (in use: {', '.join(in_use)})" if in_use else ""))
+        self.reserved[tier] = nbytes
+        return evicted
+
+    def cancel_reservation(self, tier: str) -> None:
+        self.reserved.pop(tier, None)
+
+    def add(self, tier: str, model: Any, tokenizer: Any, nbytes: int, load_time: float) -> None:
+        self.reserved.pop(tier, None)
+        self.resident[tier] = ResidentModel(tier, model, tokenizer, nbytes, load_time)
+
+    def evict(self, tier: str) -> None:
+        entry = self.remove(tier)
+        if entry is None:
+            return
+        self.evictions += 1
+        self.logger.info(f"Evicted {tier} model to free {entry.nbytes / 1024 ** 3:.2f} GB "
+                         f"(uses: {entry.uses}, load time: {entry.load_time:.1f}s)")
+
+    def remove(self, tier: str) -> Optional[ResidentModel]:
+        """Stop serving a tier. Its model is released now, or after its last request if it is in use."""
+        entry = self.resident.pop(tier, None)
+        if entry is None:
+            return None
+        if entry.users:
+            self.draining.append(entry)
+        else:
+            self._release(entry)
+        return entry
+
+    def _release(self, entry: ResidentModel) -> None:
+        if self.on_evict is not None:
+            self.on_evict(entry.tier, entry.model, entry.tokenizer)
+        entry.released.set()
+
+    def clear(self) -> None:
+        for tier in list(self.resident):
+            self.remove(tier)
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hitRate": self.hits / lookups if lookups else 0.0,
+            "residentModels": list(self.resident),
+            "inUse": {tier: entry.users for tier, entry in self.resident.items() if entry.users},
+            "draining": [entry.tier for entry in self.draining],
+            "memoryBudget": self.memory_budget,
+            "memoryUsed": self.used_memory,
+            "memoryReserved": sum(self.reserved.values()),
+        }
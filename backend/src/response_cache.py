@@ -0,0 +1,352 @@
+"""
+This file defines the ResponseCache, an optional cache of generated responses in front of adaptive_generate.
+
+Lookups go through three steps:
+1. memory: exact match on the normalized prompt and model tier, held in a bounded in-process cache
+2. disk: exact match in an on-disk JSON store that survives restarts
+3. semantic: the most similar cached prompt for the same model tier, compared by cosine similarity of
+   TF-IDF vectors, if it is above the configured similarity threshold. The vectors are kept in a
+   bounded index (similarity_max_entries per tier) of fixed-size chunks, so caching a prompt appends a
+   row instead of rebuilding the tier's matrix, and lookups score the chunks outside the cache's lock.
+
+Each storage tier has its own TTL, and the memory tier's size and eviction policy are configurable.
+The disk tier is best-effort: a failed disk read or write is logged and counted, never raised to the
+request that generated the response.
+
+Entries can be scoped to a revision of a model tier's weights with set_revision: after a tier is
+reloaded with other weights, responses cached for the old weights are no longer served, and writes
+from requests that started on the old weights are dropped.
+
+Example:
+    cache = ResponseCache(vectorizer=classifier.vectorize, disk_dir="~/.cache/alp/responses", similarity_threshold=0.95)
+    cache.put(prompt, 'simple', response)
+    hit = cache.get(prompt, 'simple')  # (response, "memory" | "disk" | "semantic") or None
+"""
+
+import os
+import json
+import time
+import bisect
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.caching import BoundedCache, normalize_prompt, prompt_key
+
+
+class _Chunk:
+    """Consecutive rows of a SimilarityIndex: a list of rows while it fills, then one sparse matrix."""
+
+    def __init__(self, start: int):
+        self.start = start
+        self.size = 0
+        self.rows: List[Any] = []
+        self.matrix: Any = None
+        self.live = 0
+
+
+class SimilarityIndex:
+    """
+    The TF-IDF rows of one model tier's cached prompts, for nearest-neighbor lookups. Rows are appended
+    to fixed-size chunks; a full chunk is stacked into one matrix once and then never rebuilt. Removed
+    entries leave dead rows behind, and a chunk is dropped once none of its rows is live. The oldest
+    entry is removed when the index is full. Not thread-safe: ResponseCache calls it under its lock,
+    except for the matrix products in `candidates`, which only read immutable chunks.
+    """
+    CHUNK_ROWS = 256
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.chunks: List[_Chunk] = []
+        self.rows: Dict[str, int] = {}  # Live key -> row number, oldest first
+        self.keys: Dict[int, str] = {}  # Row number -> live key
+        self._next_row = 0
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def add(self, key: str, vector: Any) -> Optional[_Chunk]:
+        """Add a row for `key`, replacing its previous one. Returns the chunk to seal if this filled it."""
+        self.remove(key)
+        if not self.chunks or self.chunks[-1].size == self.CHUNK_ROWS:
+            self.chunks.append(_Chunk(self._next_row))
+        chunk = self.chunks[-1]
+        chunk.rows.append(vector)
+        chunk.size += 1
+        chunk.live += 1
+        self.rows[key], self.keys[self._next_row] = self._next_row, key
+        self._next_row += 1
+        while len(self.rows) > self.max_entries:
+            self.remove(next(iter(self.rows)))
+        return chunk if chunk.size == self.CHUNK_ROWS else None
+
+    def remove(self, key: str) -> None:
+        row = self.rows.pop(key, None)
+        if row is None:
+            return
+        del self.keys[row]
+        index = bisect.bisect_right([chunk.start for chunk in self.chunks], row) - 1
+        chunk = self.chunks[index]
+        chunk.live -= 1
+        if chunk.live == 0 and chunk is not self.chunks[-1]:
+            del self.chunks[index]
+
+    @staticmethod
+    def seal(chunk: _Chunk) -> None:
+        """
+        Stack a full chunk's rows into one matrix. Called outside the lock: a full chunk's rows no longer
+        change, and the matrix is set before the rows are dropped, which is the order snapshot() reads them in.
+        """
+        from scipy import sparse
+        matrix = sparse.vstack(chunk.rows, format='csr')
+        chunk.matrix, chunk.rows = matrix, []
+
+    def snapshot(self) -> List[Tuple[int, Any]]:
+        """The live chunks, each as (first row, matrix or copied list of rows), to score outside the lock."""
+        return [(chunk.start, chunk.matrix if chunk.matrix is not None else list(chunk.rows))
+                for chunk in self.chunks if chunk.live]
+
+    @staticmethod
+    def candidates(snapshot: List[Tuple[int, Any]], query: Any, threshold: float) -> List[Tuple[float, int]]:
+        """(similarity, row) of the rows at least `threshold` similar to the query, most similar first."""
+        from scipy import sparse
+        found = []
+        for start, rows in snapshot:
+            matrix = sparse.vstack(rows, format='csr') if isinstance(rows, list) else rows
+            # TF-IDF rows are L2-normalized, so the dot product is the cosine similarity.
+            similarities = (matrix @ query.T).toarray().ravel()
+            found.extend((float(similarities[i]), start + int(i)) for i in np.flatnonzero(similarities >= threshold))
+        return sorted(found, reverse=True)
+
+
+class ResponseCache:
+    DISK_PRUNE_INTERVAL = 64  # Enforce disk_max_entries every N disk writes
+
+    def __init__(self,
+                 vectorizer: Optional[Callable[[List[str]], Any]] = None,
+                 max_entries: int = 1024,
+                 eviction_policy: str = "lru",
+                 memory_ttl: Optional[float] = 3600,
+                 disk_dir: Optional[str] = None,
+                 disk_ttl: Optional[float] = 7 * 24 * 3600,
+                 disk_max_entries: int = 100000,
+                 similarity_threshold: Optional[float] = None,
+                 similarity_max_entries: int = 10000,
+                 logger: Optional[logging.Logger] = None):
+        self.vectorizer = vectorizer
+        self.memory = BoundedCache(maxsize=max_entries, ttl=memory_ttl, policy=eviction_policy)
+        self.disk_dir = os.path.expanduser(disk_dir) if disk_dir else None
+        self.disk_ttl = disk_ttl
+        self.disk_max_entries = disk_max_entries
+        self.similarity_threshold = similarity_threshold
+        self.similarity_max_entries = similarity_max_entries
+        self._disk_writes = 0
+        self.disk_errors = 0
+        self.logger = logger or logging.getLogger(__name__)
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+        # Similarity index: per model tier, the TF-IDF rows of the cached prompts.
+        self._index: Dict[str, SimilarityIndex] = {}
+        self._revisions: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.hits = {"memory": 0, "disk": 0, "semantic": 0}
+        self.misses = 0
+
+    def get(self, prompt: str, model_type: str) -> Optional[Tuple[str, str]]:
+        """Return (response, cache tier) for a prompt, or None on a miss."""
+        key = self._key(prompt, model_type, self.revision(model_type))
+        response = self._lookup(key)
+        if response is not None:
+            self._count_hit(response[1])
+            return response
+
+        if self.similarity_threshold is not None and self.vectorizer is not None:
+            similar_key = self._most_similar(prompt, model_type)
+            if similar_key is not None:
+                response = self._lookup(similar_key)
+                if response is not None:
+                    self._count_hit("semantic")
+                    return response[0], "semantic"
+                self._drop_from_index(model_type, similar_key)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, prompt: str, model_type: str, response: str, revision: Optional[str] = None) -> None:
+        """
+        Cache a response. Pass the revision of the weights that generated it (as seen when the request
+        started) to drop the write if the tier has been reloaded since.
+        """
+        current = self.revision(model_type)
+        if revision is not None and revision != current:
+            return
+        key = self._key(prompt, model_type, current)
+        self.memory.put(key, response)
+        if self.disk_dir:
+            self._disk_put(key, prompt, model_type, response)
+        vectorizer = self.vectorizer
+        if self.similarity_threshold is not None and vectorizer is not None:
+            vector = vectorizer([normalize_prompt(prompt)])
+            with self._lock:
+                if vectorizer is not self.vectorizer or self._revisions.get(model_type) != current:
+                    return  # The index was reset while this prompt was vectorized
+                if model_type not in self._index:
+                    self._index[model_type] = SimilarityIndex(self.similarity_max_entries)
+                full = self._index[model_type].add(key, vector)
+            if full is not None:
+                SimilarityIndex.seal(full)
+
+    def revision(self, model_type: str) -> Optional[str]:
+        with self._lock:
+            return self._revisions.get(model_type)
+
+    def set_revision(self, model_type: str, revision: str) -> None:
+        """Scope the tier's entries to a revision of its weights; entries cached for other revisions are no longer served."""
+        with self._lock:
+            if self._revisions.get(model_type) == revision:
+                return
+            self._revisions[model_type] = revision
+            self._index.pop(model_type, None)
+
+    def set_vectorizer(self, vectorizer: Optional[Callable[[List[str]], Any]]) -> None:
+        """Switch to another vectorizer, e.g. a reloaded classifier's. The similarity index is rebuilt from new entries."""
+        with self._lock:
+            self.vectorizer = vectorizer
+            self._index.clear()
+
+    @staticmethod
+    def _key(prompt: str, model_type: str, revision: Optional[str]) -> str:
+        return prompt_key(prompt, model_type) if revision is None else prompt_key(prompt, model_type, revision)
+
+    def clear(self) -> None:
+        self.memory.clear()
+        with self._lock:
+            self._index.clear()
+        if self.disk_dir:
+            for name in os.listdir(self.disk_dir):
+                if name.endswith(".json"):
+                    os.remove(os.path.join(self.disk_dir, name))
+
+    def _count_hit(self, tier: str) -> None:
+        with self._lock:
+            self.hits[tier] += 1
+
+    def _lookup(self, key: str) -> Optional[Tuple[str, str]]:
+        response = self.memory.get(key)
+        if response is not None:
+            return response, "memory"
+        if self.disk_dir:
+            response = self._disk_get(key)
+            if response is not None:
+                # Promote to the memory tier so the next lookup is served from memory.
+                self.memory.put(key, response)
+                return response, "disk"
+        return None
+
+    def _most_similar(self, prompt: str, model_type: str) -> Optional[str]:
+        with self._lock:
+            index = self._index.get(model_type)
+            if not index:
+                return None
+            snapshot = index.snapshot()
+            vectorizer = self.vectorizer
+
+        query = vectorizer([normalize_prompt(prompt)])
+        candidates = SimilarityIndex.candidates(snapshot, query, self.similarity_threshold)
+        with self._lock:
+            # The most similar row whose entry was not removed or replaced while the chunks were scored.
+            for _, row in candidates:
+                key = index.keys.get(row)
+                if key is not None:
+                    return key
+        return None
+
+    def _drop_from_index(self, model_type: str, key: str) -> None:
+        with self._lock:
+            if model_type in self._index:
+                self._index[model_type].remove(key)
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _disk_get(self, key: str) -> Optional[str]:
+        path = self._disk_path(key)
+        try:
+            with open(path, 'r') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if self.disk_ttl is not None and time.time() - entry.get("created", 0) > self.disk_ttl:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return entry.get("response")
+
+    def _disk_put(self, key: str, prompt: str, model_type: str, response: str) -> None:
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump({"prompt": prompt, "model": model_type, "response": response, "created": time.time()}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            self._disk_error("write", e)
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            self._disk_writes += 1
+            prune = self._disk_writes % self.DISK_PRUNE_INTERVAL == 0
+        if prune:
+            self._prune_disk()
+
+    def _prune_disk(self) -> None:
+        try:
+            names = [name for name in os.listdir(self.disk_dir) if name.endswith(".json")]
+        except OSError as e:
+            self._disk_error("prune", e)
+            return
+        if len(names) <= self.disk_max_entries:
+            return
+        entries = []
+        for name in names:
+            path = os.path.join(self.disk_dir, name)
+            try:
+                entries.append((os.path.getmtime(path), path))
+            except OSError:
+                pass  # Removed by another writer pruning the same directory
+        entries.sort()
+        for _, path in entries[:len(entries) - self.disk_max_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _disk_error(self, operation: str, error: OSError) -> None:
+        with self._lock:
+            self.disk_errors += 1
+        self.logger.warning(f"Response cache disk {operation} failed in {self.disk_dir}: {error}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            similarity_entries = {tier: len(index) for tier, index in self._index.items()}
+        total_hits = sum(self.hits.values())
+        lookups = total_hits + self.misses
+        return {
+            "hits": dict(self.hits),
+            "misses": self.misses,
+            "hitRate": total_hits / lookups if lookups else 0.0,
+            "memory": self.memory.get_stats(),
+            "diskEnabled": self.disk_dir is not None,
+            "diskErrors": self.disk_errors,
+            "similarityThreshold": self.similarity_threshold,
+            "similarityEntries": similarity_entries,
+        }
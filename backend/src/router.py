@@ -0,0 +1,163 @@
+"""
+This file defines the Router, which picks the model tier that serves a request.
+
+The router replaces the static complexity-to-tier map. For every request it combines:
+- the classifier's class probabilities, turned into the probability that each tier is good enough
+  (a tier is adequate for its own class and every class below it)
+- tier residency: a tier that is not resident has to be loaded first
+- queue depth: the number of requests currently running or waiting on each tier
+- observed latency: an exponentially weighted moving average of recent generation (and load) times per tier
+
+Each tier's expected latency is (queue depth + 1) * average latency, plus the expected load time if the
+tier is not resident. The routing policy decides which tiers are acceptable and how to pick among them:
+- quality-first: never go below the classifier's top tier; take the fastest tier at or above it
+- latency-slo: any tier meeting the quality floor; prefer the best one expected to finish within
+  the latency SLO, else the fastest
+- memory-saver: the smallest tier meeting the quality floor
+
+Example:
+    router = Router(['simple', 'medium', 'complex'], {'simple': 8, 'medium': 70, 'complex': 405})
+    tier = router.choose({'simple': 0.7, 'medium': 0.2, 'complex': 0.1}, resident=['medium'], policy='latency-slo')
+    router.started(tier)
+    ...
+    router.finished(tier, latency=0.8)
+"""
+
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+from src.metrics import CounterMap
+
+POLICIES = ("quality-first", "latency-slo", "memory-saver")
+
+# Classifier labels that do not name a tier, mapped to the tier that serves them.
+CLASS_TIERS = {'very_simple': 'simple', 'Uncertain': 'medium'}
+
+# Priors used until a tier has been observed, in seconds per billion parameters.
+LATENCY_PRIOR_PER_BILLION = 0.02
+LOAD_PRIOR_PER_BILLION = 0.25
+
+
+class Router:
+    def __init__(self, tiers: List[str], model_sizes: Dict[str, float], policy: str = "quality-first",
+                 quality_floor: float = 0.8, latency_slo: float = 2.0, alpha: float = 0.2,
+                 logger: Optional[logging.Logger] = None):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown routing policy '{policy}'. Available: {', '.join(POLICIES)}")
+        self.tiers = list(tiers)  # Ordered from the smallest to the most capable tier
+        self.model_sizes = dict(model_sizes)
+        self.policy = policy
+        self.quality_floor = quality_floor
+        self.latency_slo = latency_slo
+        self.alpha = alpha
+        self.logger = logger or logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self.latency = {tier: self.model_sizes[tier] * LATENCY_PRIOR_PER_BILLION for tier in self.tiers}
+        self.load_latency = {tier: self.model_sizes[tier] * LOAD_PRIOR_PER_BILLION for tier in self.tiers}
+        self.in_flight = {tier: 0 for tier in self.tiers}
+        self.decisions = CounterMap((policy_name, tier) for policy_name in POLICIES for tier in self.tiers)
+        self.overrides = CounterMap(self.tiers)  # Decisions that differ from the classifier's top tier
+
+    def tier_for_class(self, class_name: str) -> str:
+        tier = CLASS_TIERS.get(class_name, class_name)
+        return tier if tier in self.tiers else self.tiers[len(self.tiers) // 2]
+
+    def adequacy(self, probabilities: Dict[str, float]) -> Dict[str, float]:
+        """For each tier, the probability that the request needs that tier or a smaller one."""
+        needed = {tier: 0.0 for tier in self.tiers}
+        for class_name, probability in probabilities.items():
+            needed[self.tier_for_class(class_name)] += float(probability)
+        total = sum(needed.values()) or 1.0
+        adequacy, cumulative = {}, 0.0
+        for tier in self.tiers:
+            cumulative += needed[tier] / total
+            adequacy[tier] = min(cumulative, 1.0)
+        adequacy[self.tiers[-1]] = 1.0
+        return adequacy
+
+    def top_tier(self, probabilities: Dict[str, float]) -> str:
+        return self.tier_for_class(max(probabilities, key=probabilities.get))
+
+    def expected_latency(self, tier: str, resident: Iterable[str] = ()) -> float:
+        with self._lock:
+            latency = (self.in_flight[tier] + 1) * self.latency[tier]
+            if tier not in resident:
+                latency += self.load_latency[tier]
+        return latency
+
+    def choose(self, probabilities: Dict[str, float], resident: Iterable[str] = (), policy: Optional[str] = None,
+               quality_floor: Optional[float] = None, latency_slo: Optional[float] = None) -> str:
+        policy = policy or self.policy
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown routing policy '{policy}'. Available: {', '.join(POLICIES)}")
+        quality_floor = self.quality_floor if quality_floor is None else quality_floor
+        latency_slo = self.latency_slo if latency_slo is None else latency_slo
+        resident = set(resident)
+
+        top_tier = self.top_tier(probabilities)
+        adequacy = self.adequacy(probabilities)
+        latency = {tier: self.expected_latency(tier, resident) for tier in self.tiers}
+
+        if policy == "quality-first":
+            candidates = self.tiers[self.tiers.index(top_tier):]
+            tier = min(candidates, key=lambda t: (latency[t], self.tiers.index(t)))
+        else:
+            candidates = [t for t in self.tiers if adequacy[t] >= quality_floor]
+            if policy == "memory-saver":
+                tier = min(candidates, key=lambda t: (self.model_sizes[t], latency[t]))
+            else:
+                within_slo = [t for t in candidates if latency[t] <= latency_slo]
+                if within_slo:
+                    tier = max(within_slo, key=lambda t: (adequacy[t], -latency[t]))
+                else:
+                    tier = min(candidates, key=lambda t: latency[t])
+
+        self.decisions.inc((policy, tier))
+        if tier != top_tier:
+            self.overrides.inc(tier)
+            self.logger.info(f"Routed to {tier} instead of {top_tier} ({policy}, expected latency "
+                             f"{latency[tier]:.2f}s vs {latency[top_tier]:.2f}s)")
+        return tier
+
+    def started(self, tier: str) -> None:
+        with self._lock:
+            self.in_flight[tier] += 1
+
+    def finished(self, tier: str, latency: Optional[float] = None) -> None:
+        with self._lock:
+            self.in_flight[tier] = max(self.in_flight[tier] - 1, 0)
+            if latency is not None:
+                self.latency[tier] += self.alpha * (latency - self.latency[tier])
+
+    def observe_load(self, tier: str, seconds: float) -> None:
+        with self._lock:
+            self.load_latency[tier] += self.alpha * (seconds - self.load_latency[tier])
+
+    def update_tier(self, tier: str, size: float, new_weights: bool = False) -> None:
+        """
+        Apply a tier's new size. With new_weights, the latencies learned on the old weights no longer
+        apply, so they restart from the size-based priors.
+        """
+        with self._lock:
+            self.model_sizes[tier] = size
+            if new_weights:
+                self.latency[tier] = size * LATENCY_PRIOR_PER_BILLION
+                self.load_latency[tier] = size * LOAD_PRIOR_PER_BILLION
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            latency, load_latency, in_flight = dict(self.latency), dict(self.load_latency), dict(self.in_flight)
+        decisions: Dict[str, Dict[str, int]] = {policy: {} for policy in POLICIES}
+        for (policy, tier), count in self.decisions.snapshot().items():
+            decisions[policy][tier] = count
+        return {
+            "policy": self.policy,
+            "qualityFloor": self.quality_floor,
+            "latencySlo": self.latency_slo,
+            "latency": latency,
+            "loadLatency": load_latency,
+            "inFlight": in_flight,
+            "decisions": decisions,
+            "overrides": self.overrides.snapshot(),
+        }
@@ -0,0 +1,144 @@
+"""
+This file defines the BatchScheduler, which groups concurrent generation requests for one model tier
+into dynamic batches.
+
+Requests are queued with submit(). A worker thread takes the oldest request, then keeps collecting
+requests for the same model until the batch reaches max_batch_size or the oldest request has waited
+max_wait seconds, and runs the whole batch through the backend's generate_batch() path.
+
+The scheduler records how full each batch was (occupancy) and how long requests waited in the queue.
+
+Example:
+    scheduler = BatchScheduler(backend, 'simple', max_batch_size=8, max_wait=0.01)
+    future = scheduler.submit(prompt, model, tokenizer)
+    response = future.result()
+"""
+
+import time
+import queue
+import logging
+import threading
+import concurrent.futures
+from typing import Any, Dict, List, Optional
+
+from src.backends import DEFAULT_MAX_TOKENS, GenerationBackend
+from src.metrics import Histogram, LATENCY_BUCKETS
+
+OCCUPANCY_BUCKETS = (0.125, 0.25, 0.375, 0.5, 0.625, 0.75, 0.875, 1.0)
+
+
+class _PendingRequest:
+    def __init__(self, prompt: str, model: Any, tokenizer: Any, max_tokens: int):
+        self.prompt = prompt
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.enqueued_at = time.monotonic()
+        self.future: concurrent.futures.Future = concurrent.futures.Future()
+
+
+class BatchScheduler:
+    def __init__(self, backend: GenerationBackend, tier: str, max_batch_size: int = 8, max_wait: float = 0.01,
+                 logger: Optional[logging.Logger] = None):
+        self.backend = backend
+        self.tier = tier
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.logger = logger or logging.getLogger(__name__)
+        self._queue: "queue.Queue[Optional[_PendingRequest]]" = queue.Queue()
+        # A request taken off the queue that did not fit the previous batch (different model or max_tokens).
+        self._carry: Optional[_PendingRequest] = None
+        self.batch_occupancy = Histogram(OCCUPANCY_BUCKETS)
+        self.queue_wait = Histogram(LATENCY_BUCKETS)
+        self.batches = 0
+        self.requests = 0
+        self._running = True
+        self._worker = threading.Thread(target=self._run, name=f"alp-batcher-{tier}", daemon=True)
+        self._worker.start()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() + (1 if self._carry is not None else 0)
+
+    def submit(self, prompt: str, model: Any, tokenizer: Any, max_tokens: int = DEFAULT_MAX_TOKENS) -> concurrent.futures.Future:
+        if not self._running:
+            raise RuntimeError(f"Batch scheduler for the {self.tier} model is stopped")
+        request = _PendingRequest(prompt, model, tokenizer, max_tokens)
+        self._queue.put(request)
+        return request.future
+
+    def stop(self) -> None:
+        self._running = False
+        self._queue.put(None)
+        self._worker.join(timeout=5)
+
+    def _next_request(self, timeout: Optional[float]) -> Optional[_PendingRequest]:
+        if self._carry is not None:
+            request, self._carry = self._carry, None
+            return request
+        return self._queue.get(timeout=timeout) if timeout is None or timeout > 0 else self._queue.get_nowait()
+
+    def _collect_batch(self) -> List[_PendingRequest]:
+        first = self._next_request(timeout=None)
+        if first is None:
+            return []
+        batch = [first]
+        deadline = first.enqueued_at + self.max_wait
+        while len(batch) < self.max_batch_size:
+            try:
+                request = self._next_request(timeout=deadline - time.monotonic())
+            except queue.Empty:
+                break
+            if request is None:
+                self._queue.put(None)
+                break
+            if request.model is not first.model or request.max_tokens != first.max_tokens:
+                self._carry = request
+                break
+            batch.append(request)
+        return batch
+
+    def _run(self) -> None:
+        while self._running:
+            batch = self._collect_batch()
+            if not batch:
+                continue
+            started = time.monotonic()
+            for request in batch:
+                self.queue_wait.observe(started - request.enqueued_at)
+            self.batch_occupancy.observe(len(batch) / self.max_batch_size)
+            self.batches += 1
+            self.requests += len(batch)
+
+            first = batch[0]
+            try:
+                responses = self.backend.generate_batch(first.model, first.tokenizer, [r.prompt for r in batch],
+                                                        max_tokens=first.max_tokens)
+            except Exception as e:
+                self.logger.error(f"Batched generation on the {self.tier} model failed: {str(e)}")
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+            for request, response in zip(batch, responses):
+                request.future.set_result(response)
+
+        # Fail whatever is still queued once the scheduler is stopped.
+        while True:
+            try:
+                request = self._next_request(timeout=0)
+            except queue.Empty:
+                break
+            if request is not None:
+                request.future.set_exception(RuntimeError(f"Batch scheduler for the {self.tier} model stopped"))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "maxBatchSize": self.max_batch_size,
+            "maxWait": self.max_wait,
+            "batches": self.batches,
+            "requests": self.requests,
+            "meanBatchSize": self.requests / self.batches if self.batches else 0.0,
+            "queueDepth": self.queue_depth,
+            "batchOccupancy": self.batch_occupancy.get_stats(),
+            "queueWait": self.queue_wait.get_stats(),
+        }
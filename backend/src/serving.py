@@ -0,0 +1,208 @@
+"""
+This file defines the request admission layer used by the FastAPI service.
+
+Blocking work (classification, model loading and generation) never runs on the event loop. It is
+offloaded to a bounded thread pool, and each model tier has:
+- a concurrency limit: how many requests may run on the tier at once
+- a queue limit: how many requests may wait for the tier before new ones are rejected (backpressure)
+- a request timeout
+
+Blocking calls run in a copy of the caller's context, so tracing spans opened by the API stay the
+parents of the spans opened on the worker threads.
+
+Example:
+    admission = TierAdmissionController(max_workers=8, tier_concurrency={'simple': 4, 'medium': 2, 'complex': 1})
+    result = await admission.run('simple', alp.adaptive_generate, prompt, timeout=60)
+    events = await admission.stream('simple', alp.adaptive_generate_stream, prompt)
+    async for event in events:
+        ...
+"""
+
+import os
+import asyncio
+import functools
+import contextvars
+import threading
+import concurrent.futures
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Union
+
+from src.config import TIERS
+
+
+class QueueFullError(Exception):
+    """Raised when a tier's wait queue is full and the request should be rejected."""
+
+
+class RequestTimeoutError(Exception):
+    """Raised when a request does not finish within its timeout."""
+
+
+_STREAM_END = object()
+
+
+def _in_context(fn: Callable, *args, **kwargs) -> Callable[[], Any]:
+    """Bind a call to a copy of the current context, as asyncio.to_thread does."""
+    return functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def parse_tier_setting(value: Union[str, int, Dict[str, int], None], default: int) -> Dict[str, int]:
+    """Parse a per-tier setting given as an int, a dict or a string like "simple=4,medium=2,complex=1"."""
+    if value is None or value == "":
+        return {tier: default for tier in TIERS}
+    if isinstance(value, dict):
+        return {tier: int(value.get(tier, default)) for tier in TIERS}
+    if isinstance(value, int) or "=" not in value:
+        return {tier: int(value) for tier in TIERS}
+    settings = {tier: default for tier in TIERS}
+    for item in value.split(","):
+        tier, _, limit = item.partition("=")
+        settings[tier.strip()] = int(limit)
+    return settings
+
+
+class TierAdmissionController:
+    def __init__(self,
+                 max_workers: Optional[int] = None,
+                 tier_concurrency: Union[str, int, Dict[str, int], None] = None,
+                 max_queue: Union[str, int, Dict[str, int], None] = None,
+                 request_timeout: Optional[float] = None):
+        if max_workers is None:
+            max_workers = int(os.environ.get("ALP_MAX_WORKERS", "8"))
+        if tier_concurrency is None:
+            tier_concurrency = os.environ.get("ALP_TIER_CONCURRENCY")
+        if max_queue is None:
+            max_queue = os.environ.get("ALP_MAX_QUEUE")
+        if request_timeout is None:
+            request_timeout = float(os.environ.get("ALP_REQUEST_TIMEOUT", "300"))
+
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="alp-worker")
+        self.max_workers = max_workers
+        self.tier_concurrency = parse_tier_setting(tier_concurrency, default=max(1, max_workers // 2))
+        self.max_queue = parse_tier_setting(max_queue, default=32)
+        self.request_timeout = request_timeout
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.waiting = {tier: 0 for tier in TIERS}
+        self.active = {tier: 0 for tier in TIERS}
+        self.rejected = {tier: 0 for tier in TIERS}
+        self.timeouts = {tier: 0 for tier in TIERS}
+
+    def _semaphore(self, tier: str) -> asyncio.Semaphore:
+        if tier not in self._semaphores:
+            self._semaphores[tier] = asyncio.Semaphore(self.tier_concurrency.get(tier, 1))
+        return self._semaphores[tier]
+
+    async def offload(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run a blocking call on the worker pool without tier admission (e.g. classification)."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, _in_context(fn, *args, **kwargs))
+
+    async def _admit(self, tier: str, deadline: float, timeout: float) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphore(tier)
+
+        queued = self.waiting[tier] + self.active[tier] - self.tier_concurrency.get(tier, 1)
+        if queued >= self.max_queue.get(tier, 0):
+            self.rejected[tier] += 1
+            raise QueueFullError(f"Queue for the {tier} model is full ({max(queued, 0)} requests waiting)")
+
+        self.waiting[tier] += 1
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=max(deadline - loop.time(), 0))
+        except asyncio.TimeoutError:
+            self.timeouts[tier] += 1
+            raise RequestTimeoutError(f"Timed out after {timeout:.0f}s waiting for the {tier} model")
+        finally:
+            self.waiting[tier] -= 1
+        self.active[tier] += 1
+        return semaphore
+
+    def _release_when_done(self, tier: str, semaphore: asyncio.Semaphore, future: asyncio.Future) -> None:
+        def release(_):
+            self.active[tier] -= 1
+            semaphore.release()
+
+        future.add_done_callback(release)
+
+    async def run(self, tier: str, fn: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """
+        Run a blocking call on the worker pool once the tier admits it.
+
+        Raises QueueFullError when too many requests are already waiting for the tier, and
+        RequestTimeoutError when queueing plus execution exceed the timeout. A timed-out call keeps its
+        concurrency slot until the worker thread actually finishes, so limits hold under overload.
+        """
+        timeout = self.request_timeout if timeout is None else timeout
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        semaphore = await self._admit(tier, deadline, timeout)
+
+        future = loop.run_in_executor(self.executor, _in_context(fn, *args, **kwargs))
+        self._release_when_done(tier, semaphore, future)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout=max(deadline - loop.time(), 0))
+        except asyncio.TimeoutError:
+            self.timeouts[tier] += 1
+            raise RequestTimeoutError(f"Request on the {tier} model timed out after {timeout:.0f}s")
+
+    async def stream(self, tier: str, fn: Callable, *args, timeout: Optional[float] = None, **kwargs) -> AsyncIterator[Any]:
+        """
+        Admit a blocking generator function and return an async iterator over the items it yields.
+
+        Admission happens before this coroutine returns, so QueueFullError can still be turned into an
+        HTTP error before a streaming response starts. The generator runs on a worker thread and stops
+        early if the consumer goes away.
+        """
+        timeout = self.request_timeout if timeout is None else timeout
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        semaphore = await self._admit(tier, deadline, timeout)
+
+        items: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+
+        def produce():
+            error = None
+            try:
+                for item in fn(*args, **kwargs):
+                    if stop.is_set():
+                        break
+                    loop.call_soon_threadsafe(items.put_nowait, (item, None))
+            except Exception as e:
+                error = e
+            loop.call_soon_threadsafe(items.put_nowait, (_STREAM_END, error))
+
+        future = loop.run_in_executor(self.executor, _in_context(produce))
+        self._release_when_done(tier, semaphore, future)
+        return self._drain(tier, items, stop, deadline, timeout)
+
+    async def _drain(self, tier: str, items: asyncio.Queue, stop: threading.Event,
+                     deadline: float, timeout: float) -> AsyncIterator[Any]:
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    item, error = await asyncio.wait_for(items.get(), timeout=max(deadline - loop.time(), 0))
+                except asyncio.TimeoutError:
+                    self.timeouts[tier] += 1
+                    raise RequestTimeoutError(f"Request on the {tier} model timed out after {timeout:.0f}s")
+                if item is _STREAM_END:
+                    if error is not None:
+                        raise error
+                    return
+                yield item
+        finally:
+            stop.set()
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "maxWorkers": self.max_workers,
+            "tierConcurrency": self.tier_concurrency,
+            "maxQueue": self.max_queue,
+            "waiting": dict(self.waiting),
+            "active": dict(self.active),
+            "rejected": dict(self.rejected),
+            "timeouts": dict(self.timeouts),
+        }
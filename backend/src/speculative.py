@@ -0,0 +1,91 @@
+"""
+This file defines the SpeculativeDecoder, which speeds up the large tiers by letting the 8B tier draft tokens.
+
+Each step, the draft model greedily proposes `draft_length` tokens and the target model scores all of
+them in a single forward pass. The longest prefix of the draft that matches the target's own greedy
+choices is accepted, followed by the target's token at the first mismatch, so every step produces at
+least one token and the output is exactly what greedy decoding on the target alone would produce.
+
+Both models keep their KV cache for the whole request (see SpeculativeState in backends.py): each
+step trims the caches back to the tokens accepted so far and only runs the tokens that are new since
+the previous step, so the prompt is encoded once per model rather than once per step.
+
+The draft and target tiers must share a tokenizer, as the Llama 3.1 8B, 70B and 405B models do.
+
+Example:
+    decoder = SpeculativeDecoder(backend, draft_length=4)
+    text = decoder.generate(target_model, target_tokenizer, draft_model, draft_tokenizer, prompt, tier='complex')
+    decoder.get_stats()['acceptanceRate']
+"""
+
+import time
+import logging
+from typing import Any, Dict, Optional
+
+from src.backends import DEFAULT_MAX_TOKENS, GenerationBackend
+from src.metrics import THROUGHPUT_BUCKETS, Counter, CounterMap, Histogram
+
+
+class SpeculativeDecoder:
+    def __init__(self, backend: GenerationBackend, draft_length: int = 4, logger: Optional[logging.Logger] = None):
+        if draft_length < 1:
+            raise ValueError("draft_length must be at least 1")
+        self.backend = backend
+        self.draft_length = draft_length
+        self.logger = logger or logging.getLogger(__name__)
+        self.requests = CounterMap()
+        self.steps = CounterMap()
+        self.drafted = CounterMap()
+        self.accepted = CounterMap()
+        self.tokens = Counter()
+        self.tokens_per_second = Histogram(THROUGHPUT_BUCKETS)
+
+    def generate(self, model: Any, tokenizer: Any, draft_model: Any, draft_tokenizer: Any, prompt: str,
+                 max_tokens: int = DEFAULT_MAX_TOKENS, tier: str = "target") -> str:
+        start_time = time.time()
+        eos = getattr(tokenizer, "eos_token_id", None)
+        generated = []
+        finished = False
+        self.requests.inc(tier)
+        draft_state = self.backend.speculative_state(draft_model, draft_tokenizer)
+        target_state = self.backend.speculative_state(model, tokenizer)
+        while not finished and len(generated) < max_tokens:
+            n = min(self.draft_length, max_tokens - len(generated))
+            draft = self.backend.draft_tokens(draft_model, draft_tokenizer, prompt, generated, n, state=draft_state)
+            verified = self.backend.verify_tokens(model, tokenizer, prompt, generated, draft, state=target_state)
+
+            accepted = 0
+            while accepted < len(draft) and draft[accepted] == verified[accepted] and draft[accepted] != eos:
+                accepted += 1
+            self.steps.inc(tier)
+            self.drafted.inc(tier, len(draft))
+            self.accepted.inc(tier, accepted)
+
+            for token in draft[:accepted] + [verified[accepted]]:
+                if token == eos:
+                    finished = True
+                    break
+                if len(generated) == max_tokens:
+                    break
+                generated.append(token)
+
+        elapsed = time.time() - start_time
+        self.tokens.inc(len(generated))
+        if elapsed > 0:
+            self.tokens_per_second.observe(len(generated) / elapsed)
+        return tokenizer.decode(generated)
+
+    def get_stats(self) -> Dict[str, Any]:
+        requests, steps = self.requests.snapshot(), self.steps.snapshot()
+        drafted, accepted = self.drafted.snapshot(), self.accepted.snapshot()
+        total_drafted = sum(drafted.values())
+        total_steps = sum(steps.values())
+        return {
+            "draftLength": self.draft_length,
+            "requests": requests,
+            "steps": steps,
+            "acceptanceRate": sum(accepted.values()) / total_drafted if total_drafted else 0.0,
+            "acceptanceRateByTier": {tier: accepted.get(tier, 0) / count for tier, count in drafted.items() if count},
+            "tokensPerStep": self.tokens.value / total_steps if total_steps else 0.0,
+            "tokensPerSecond": self.tokens_per_second.get_stats(),
+        }
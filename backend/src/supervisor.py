@@ -0,0 +1,843 @@
+"""
+This file defines the Supervisor, which serves the Adaptive LLaMA Proxy from several processes.
+
+In supervisor mode (ALP_SUPERVISOR=1) the API process keeps only the HTTP front, routing and admission
+control. The work that holds the GIL runs in worker processes:
+- classifier workers (ALP_CLASSIFIER_WORKERS, default 2), each with its own TaskClassifier over the
+  shared memory-mapped artifact. Prompts are sharded by their normalized hash, so each worker's
+  classification cache sees every repeat of the prompts it owns.
+- one tier worker per model tier (ALP_TIER_WORKERS, default all tiers), each an AdaptiveLlamaProxy
+  that loads its tier at startup and only ever serves that tier. Batching, the prefix cache and the
+  response cache work as in a single process; cascade mode and speculative decoding, which need two
+  tiers in one process, are off.
+
+The front talks to each worker over a pipe. Prompts, generated responses and streamed tokens are
+passed through shared-memory slots (SharedSlots); the pipe only carries small control messages, plus
+payloads larger than a slot (ALP_SHM_SLOT_KB, default 64).
+
+Every request has a deadline (ALP_REQUEST_TIMEOUT, the API's request timeout). Past it, or when a
+stream is closed early, the request fails and the worker is told to cancel it; a worker that has not
+stopped a cancelled request within ALP_CANCEL_GRACE seconds (default 30) is alive but wedged, and is
+restarted like a crashed one. So a stuck worker cannot hold the API's admission slots forever.
+
+A dispatcher thread reads every worker's replies and watches the processes. When a worker dies, its
+requests in flight fail (the API answers 503), requests for it fail fast until it is back, and it is
+restarted with exponential backoff while the API and the other workers keep serving. Requests for a
+tier without a worker are served by the nearest tier that has one.
+
+The Supervisor has the interface the API uses on AdaptiveLlamaProxy (route, adaptive_generate,
+adaptive_generate_stream, reload_config, get_metrics, ...), so api.py can serve either one.
+
+Example:
+    supervisor = Supervisor(classifier_workers=4, tier_concurrency={'simple': 4, 'medium': 2, 'complex': 1})
+    result = supervisor.adaptive_generate("What is the capital of France?")
+    supervisor.close()
+"""
+
+import os
+import time
+import queue
+import psutil
+import logging
+import itertools
+import threading
+import multiprocessing
+import concurrent.futures
+from multiprocessing import connection, shared_memory
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from src import tracing
+from src.caching import prompt_key
+from src.config import TIERS, ConfigWatcher, ServingConfig, env_flag
+from src.metrics import PHASES, THROUGHPUT_BUCKETS, Counter, CounterMap, HistogramMap
+from src.router import Router
+from src.serving import RequestTimeoutError, parse_tier_setting
+MAX_RESTART_DELAY = 30.0
+
+
+class WorkerUnavailableError(RuntimeError):
+    """Raised when the worker a request needs has crashed or is restarting."""
+
+
+class SharedSlots:
+    """
+    Fixed-size slots in one shared memory block. The front owns the slots: it writes a request's
+    prompt into a free slot, the worker overwrites it with the output (or, for a stream, appends each
+    token), and the front frees the slot once it has read the output.
+    """
+
+    def __init__(self, slots: int, slot_size: int, name: Optional[str] = None):
+        self.slots = slots
+        self.slot_size = slot_size
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=slots * slot_size if self.owner else 0)
+        self.name = self.shm.name
+        self._free = list(range(slots))
+        self._lock = threading.Lock()
+
+    def acquire(self) -> int:
+        """A free slot, or -1 if all are in use (the payload then goes through the pipe)."""
+        with self._lock:
+            return self._free.pop() if self._free else -1
+
+    def release(self, slot: int) -> None:
+        if slot >= 0:
+            with self._lock:
+                self._free.append(slot)
+
+    def write(self, slot: int, text: str, offset: int = 0) -> int:
+        """
+        Write text at `offset` in a slot and return its length in bytes, or -1 if it does not fit (or
+        slot is -1).
+        """
+        data = text.encode("utf-8")
+        if slot < 0 or offset + len(data) > self.slot_size:
+            return -1
+        start = slot * self.slot_size + offset
+        self.shm.buf[start:start + len(data)] = data
+        return len(data)
+
+    def read(self, slot: int, length: int, offset: int = 0) -> str:
+        start = slot * self.slot_size + offset
+        return bytes(self.shm.buf[start:start + length]).decode("utf-8")
+
+    def close(self) -> None:
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _payload(slots: SharedSlots, slot: int, length: int, inline: Optional[str]) -> Optional[str]:
+    return slots.read(slot, length) if length >= 0 else inline
+
+
+def _reply(slots: SharedSlots, slot: int, rid: int, result: Dict[str, Any], text_key: str) -> Tuple:
+    """A result message, with result[text_key] moved into the request's slot when it fits."""
+    length = slots.write(slot, result[text_key]) if text_key in result else -1
+    if length >= 0:
+        result = {key: value for key, value in result.items() if key != text_key}
+    return ("result", rid, result, length)
+
+
+class _TierWorker:
+    """Runs in a tier worker process: a proxy that serves a single tier."""
+
+    def __init__(self, tier: str, config_path: Optional[str], logger: logging.Logger):
+        from src.adaptive_llama_mlx import AdaptiveLlamaProxy
+
+        self.tier = tier
+        self.proxy = AdaptiveLlamaProxy(config=ServingConfig.load(config_path), fast_startup=True, prefetch=False,
+                                        serve_while_loading=False, cascade=False, speculative=False,
+                                        config_watch=False)
+        self.proxy.load_model_async(tier, warmup=True).result()
+        self.logger = logger
+
+    def ready_info(self) -> Dict[str, Any]:
+        return dict(self.proxy.tier_memory.get(self.tier, {}))
+
+    def handle(self, message: Tuple, slots: SharedSlots, send, cancelled: threading.Event) -> None:
+        kind, rid = message[0], message[1]
+        if kind == "reload":
+            changes = self.proxy.reload_config(message[2])
+            if self.tier in changes["reloadedTiers"]:
+                self.proxy.load_model(self.tier)  # Reply once the new weights are resident
+            send(("result", rid, {**changes, "tierMemory": self.ready_info()}, -1))
+            return
+        _, _, slot, length, inline, kwargs = message
+        prompt = _payload(slots, slot, length, inline)
+        if kind == "generate":
+            send(_reply(slots, slot, rid, self.proxy.adaptive_generate(prompt, **kwargs), "response"))
+        elif kind == "stream":
+            # Tokens are appended to the request's slot, and only their offsets go through the pipe; once
+            # the slot is full, the remaining tokens are sent inline.
+            offset = 0
+            events = self.proxy.adaptive_generate_stream(prompt, **kwargs)
+            try:
+                for event in events:
+                    if cancelled.is_set():
+                        send(("cancelled", rid))  # The client went away: stop generating
+                        return
+                    length = slots.write(slot, event['token'], offset) if 'token' in event else -1
+                    if length >= 0:
+                        send(("event", rid, {key: value for key, value in event.items() if key != 'token'}, offset, length))
+                        offset += length
+                    else:
+                        send(("event", rid, event, -1, -1))
+            finally:
+                events.close()
+
+
+class _ClassifierWorker:
+    """Runs in a classifier worker process."""
+
+    def __init__(self, config_path: Optional[str], logger: logging.Logger):
+        from src.adaptive_llama_mlx import load_task_classifier
+        from src.task_classifier import TaskClassifier
+
+        fast_startup = env_flag("ALP_FAST_STARTUP")
+        self.config = ServingConfig.load(config_path)
+        self.classifier = TaskClassifier(lightweight=fast_startup, lazy=fast_startup,
+                                         cache_size=int(os.environ.get("ALP_CLASSIFIER_CACHE_SIZE", "4096")))
+        load_task_classifier(self.classifier, self.config.classifier, logger)
+        self.classifier.warm_up()
+        self.logger = logger
+
+    def ready_info(self) -> Dict[str, Any]:
+        return {}
+
+    def handle(self, message: Tuple, slots: SharedSlots, send, cancelled: threading.Event) -> None:
+        kind, rid = message[0], message[1]
+        if kind == "reload":
+            config = ServingConfig.load(message[2])
+            changed = self.config.diff(config)["classifier"]
+            if changed:
+                self.classifier = self.classifier.reloaded(config.classifier)
+                self.classifier.classify("Hello")
+            self.config = config
+            send(("result", rid, {"classifier": changed}, -1))
+            return
+        _, _, slot, length, inline, _ = message
+        probabilities = self.classifier.classify_cached(_payload(slots, slot, length, inline))
+        paths = self.classifier.get_path_stats()
+        send(("result", rid, {"probabilities": probabilities, "paths": {"fast": paths["fast"], "full": paths["full"]}}, -1))
+
+
+def _worker_main(kind: str, tier: Optional[str], conn: connection.Connection, slots_name: str, slot_count: int,
+                 slot_size: int, config_path: Optional[str], concurrency: int) -> None:
+    """Entry point of a worker process: build the worker, report ready, then serve requests until stopped."""
+    logger = logging.getLogger(f"{__name__}.{tier or kind}")
+    logger.setLevel(logging.INFO)
+    logger.addHandler(logging.StreamHandler())
+    worker = _TierWorker(tier, config_path, logger) if kind == "tier" else _ClassifierWorker(config_path, logger)
+    slots = SharedSlots(slot_count, slot_size, name=slots_name)
+    send_lock = threading.Lock()
+
+    def send(message: Tuple) -> None:
+        with send_lock:
+            conn.send(message)
+
+    # Requests received and not finished yet, with the event their "cancel" message sets.
+    cancels: Dict[int, threading.Event] = {}
+
+    def handle(message: Tuple, cancelled: threading.Event) -> None:
+        try:
+            if cancelled.is_set():
+                send(("cancelled", message[1]))  # Cancelled while it waited for a thread
+            else:
+                worker.handle(message, slots, send, cancelled)
+        except Exception as e:
+            logger.exception(f"Request {message[1]} failed")
+            send(("error", message[1], str(e)))
+        finally:
+            cancels.pop(message[1], None)
+
+    send(("ready", worker.ready_info()))
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix=f"alp-{tier or kind}")
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break  # The front is gone
+        if message[0] == "stop":
+            break
+        if message[0] == "cancel":
+            cancelled = cancels.get(message[1])
+            if cancelled is not None:
+                cancelled.set()
+            continue
+        cancels[message[1]] = threading.Event()
+        executor.submit(handle, message, cancels[message[1]])
+    executor.shutdown(wait=False, cancel_futures=True)
+    slots.shm.close()
+
+
+class _Pending:
+    """
+    A request in flight on a worker: its slot, its deadline (None for config reloads) and a future (or,
+    for streams, an event queue).
+    """
+
+    def __init__(self, rid: int, slot: int, deadline: Optional[float], stream: bool = False):
+        self.rid = rid
+        self.slot = slot
+        self.deadline = deadline
+        self.future: Optional[concurrent.futures.Future] = None if stream else concurrent.futures.Future()
+        self.events: Optional[queue.Queue] = queue.Queue() if stream else None
+
+    def fail(self, message: str, error: type = WorkerUnavailableError) -> None:
+        if self.future is not None:
+            if not self.future.done():
+                self.future.set_exception(error(message))
+        else:
+            self.events.put({'error': message})
+
+
+class _WorkerHandle:
+    """The front's view of one worker process, across restarts."""
+
+    def __init__(self, kind: str, tier: Optional[str], slots: SharedSlots, concurrency: int):
+        self.kind = kind
+        self.tier = tier
+        self.name = tier or kind
+        self.slots = slots
+        self.concurrency = concurrency
+        self.process: Optional[multiprocessing.Process] = None
+        self.conn: Optional[connection.Connection] = None
+        self.ready = False
+        self.ready_info: Dict[str, Any] = {}
+        self.pending: Dict[int, _Pending] = {}
+        # Requests that timed out or whose stream was closed, with the time by which the worker must have
+        # stopped them. Their slots stay in use until it has, since the worker may still write to them.
+        self.cancelled: Dict[int, Tuple[_Pending, float]] = {}
+        self.lock = threading.Lock()
+        self.starts = 0
+        self.crashes = Counter()
+        self.consecutive_crashes = 0
+        self.restart_at: Optional[float] = None
+        # Classification path counts: from the current process, and carried over from crashed ones.
+        self.paths = {"fast": 0, "full": 0}
+        self.paths_base = {"fast": 0, "full": 0}
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+
+class Supervisor:
+    def __init__(self, classifier_workers: Optional[int] = None, tiers: Optional[List[str]] = None,
+                 tier_concurrency: Optional[Dict[str, int]] = None, slot_size: Optional[int] = None,
+                 config_path: Optional[str] = None, config_watch: Optional[bool] = None,
+                 request_timeout: Optional[float] = None, cancel_grace: Optional[float] = None,
+                 start_timeout: float = 600):
+        init_start = time.perf_counter()
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(logging.INFO)
+        self.config_path = config_path or os.environ.get("ALP_CONFIG")
+        self.config = ServingConfig.load(self.config_path)
+        if classifier_workers is None:
+            classifier_workers = int(os.environ.get("ALP_CLASSIFIER_WORKERS", "2"))
+        if tiers is None:
+            tiers = [tier.strip() for tier in os.environ.get("ALP_TIER_WORKERS", ",".join(TIERS)).split(",") if tier.strip()]
+        unknown = set(tiers) - set(TIERS)
+        if unknown or not tiers:
+            raise ValueError(f"Tier workers must be some of {', '.join(TIERS)}, got {', '.join(tiers)}")
+        if tier_concurrency is None:
+            tier_concurrency = parse_tier_setting(os.environ.get("ALP_TIER_CONCURRENCY"),
+                                                  default=max(1, int(os.environ.get("ALP_MAX_WORKERS", "8")) // 2))
+        if slot_size is None:
+            slot_size = int(os.environ.get("ALP_SHM_SLOT_KB", "64")) * 1024
+        if request_timeout is None:
+            request_timeout = float(os.environ.get("ALP_REQUEST_TIMEOUT", "300"))
+        if cancel_grace is None:
+            cancel_grace = float(os.environ.get("ALP_CANCEL_GRACE", "30"))
+        self.request_timeout = request_timeout
+        self.cancel_grace = cancel_grace
+
+        self._context = multiprocessing.get_context("spawn")
+        self.classifier_workers = [_WorkerHandle("classifier", None, SharedSlots(16, slot_size), 1)
+                                   for _ in range(classifier_workers)]
+        for index, handle in enumerate(self.classifier_workers):
+            handle.name = f"classifier-{index}"
+        self.tier_workers = {tier: _WorkerHandle("tier", tier, SharedSlots(2 * tier_concurrency.get(tier, 1), slot_size),
+                                                 tier_concurrency.get(tier, 1))
+                             for tier in TIERS if tier in tiers}
+        self.workers = self.classifier_workers + list(self.tier_workers.values())
+        self._ids = itertools.count()
+        self._stop = threading.Event()
+        self._reload_lock = threading.Lock()
+        # Without classifier workers, prompts are classified in the front process.
+        self.task_classifier = None
+        if not self.classifier_workers:
+            from src.adaptive_llama_mlx import load_task_classifier
+            from src.task_classifier import TaskClassifier
+            self.task_classifier = TaskClassifier(lightweight=True, lazy=True)
+            load_task_classifier(self.task_classifier, self.config.classifier, self.logger)
+
+        self.tier_memory: Dict[str, Dict[str, Any]] = {}
+        self._process = psutil.Process()
+        self.router = Router(list(TIERS), self.config.model_sizes,
+                             policy=os.environ.get("ALP_ROUTING_POLICY", "quality-first"),
+                             quality_floor=float(os.environ.get("ALP_QUALITY_FLOOR", "0.8")),
+                             latency_slo=float(os.environ.get("ALP_LATENCY_SLO", "2.0")),
+                             logger=self.logger)
+        self._model_usage = CounterMap(TIERS)
+        self._total_requests = Counter()
+        self._total_memory_saved = Counter()
+        self._fallback_requests = Counter()
+        self._tokens = CounterMap(("prompt", "completion"))
+        self._loads = CounterMap(TIERS)
+        self.phase_latency = {phase: HistogramMap(keys=TIERS) for phase in PHASES}
+        self.request_latency = HistogramMap(keys=TIERS)
+        self.ttft = HistogramMap(keys=TIERS)
+        self.tokens_per_second = HistogramMap(THROUGHPUT_BUCKETS, keys=TIERS)
+        self.model_load_latency = HistogramMap(keys=TIERS)
+
+        for handle in self.workers:
+            self._start(handle)
+        self._dispatcher = threading.Thread(target=self._dispatch, name="alp-supervisor", daemon=True)
+        self._dispatcher.start()
+        self._wait_ready(start_timeout)
+        if config_watch is None:
+            config_watch = env_flag("ALP_CONFIG_WATCH")
+        self.config_watcher = ConfigWatcher(lambda: [self.config.source, self.config.classifier], self.reload_config,
+                                            interval=float(os.environ.get("ALP_CONFIG_WATCH_INTERVAL", "2.0")),
+                                            logger=self.logger) if config_watch else None
+        self.startup_time = time.perf_counter() - init_start
+        self.logger.info(f"Supervisor started {len(self.classifier_workers)} classifier and "
+                         f"{len(self.tier_workers)} tier workers in {self.startup_time:.2f}s")
+
+    # Worker processes
+
+    def _start(self, handle: _WorkerHandle) -> None:
+        parent, child = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main, name=f"alp-{handle.name}", daemon=True,
+            args=(handle.kind, handle.tier, child, handle.slots.name, handle.slots.slots, handle.slots.slot_size,
+                  self.config_path, handle.concurrency))
+        process.start()
+        child.close()
+        with handle.lock:
+            handle.process, handle.conn, handle.ready, handle.restart_at = process, parent, False, None
+            handle.starts += 1
+        self.logger.info(f"Started {handle.name} worker (pid {process.pid})")
+
+    def _wait_ready(self, timeout: float) -> None:
+        deadline = time.monotonic() + timeout
+        while not all(handle.ready for handle in self.workers):
+            if time.monotonic() > deadline:
+                waiting = [handle.name for handle in self.workers if not handle.ready]
+                self.logger.warning(f"Workers not ready after {timeout:.0f}s: {', '.join(waiting)}")
+                return
+            time.sleep(0.05)
+
+    def _crashed(self, handle: _WorkerHandle) -> None:
+        """Fail the worker's requests in flight and schedule its restart."""
+        with handle.lock:
+            if handle.conn is None:
+                return
+            handle.conn.close()
+            handle.conn, handle.ready = None, False
+            pending, handle.pending = handle.pending, {}
+            for request, _ in handle.cancelled.values():
+                handle.slots.release(request.slot)
+            handle.cancelled = {}
+            for path, count in handle.paths.items():
+                handle.paths_base[path] += count
+            handle.paths = {"fast": 0, "full": 0}
+            delay = min(0.5 * 2 ** handle.consecutive_crashes, MAX_RESTART_DELAY)
+            handle.consecutive_crashes += 1
+            handle.restart_at = time.monotonic() + delay
+            process = handle.process
+        if not self._stop.is_set():
+            handle.crashes.inc()
+            # Reaped off the dispatcher thread, which keeps serving the healthy workers meanwhile.
+            threading.Thread(target=self._reap, args=(handle, process, delay),
+                             name=f"alp-reap-{handle.name}", daemon=True).start()
+        for request in pending.values():
+            handle.slots.release(request.slot)
+            request.fail(f"The {handle.name} worker crashed")
+
+    def _reap(self, handle: _WorkerHandle, process: multiprocessing.process.BaseProcess, delay: float) -> None:
+        """Wait for a crashed worker's process to exit, terminating (then killing) it if it hung with its pipe closed."""
+        process.join(timeout=1)
+        if process.is_alive():
+            process.terminate()
+            process.join(timeout=5)
+        if process.is_alive():
+            process.kill()
+            process.join()
+        self.logger.error(f"{handle.name.capitalize()} worker (pid {process.pid}) exited with code "
+                          f"{process.exitcode}; restarting in {delay:.1f}s")
+
+    def _dispatch(self) -> None:
+        """Deliver worker replies to the waiting requests, and restart workers that died."""
+        while not self._stop.is_set():
+            waitables = {}
+            for handle in self.workers:
+                self._expire(handle)
+                with handle.lock:
+                    if handle.conn is not None:
+                        waitables[handle.conn] = handle
+                        waitables[handle.process.sentinel] = handle
+                if handle.restart_at is not None and time.monotonic() >= handle.restart_at and not self._stop.is_set():
+                    self._start(handle)
+            for ready in connection.wait(list(waitables), timeout=0.1):
+                handle = waitables[ready]
+                if ready is handle.conn:
+                    try:
+                        message = ready.recv()
+                    except (EOFError, OSError):
+                        self._crashed(handle)
+                        continue
+                    self._deliver(handle, message)
+                elif handle.conn is not None and not handle.conn.poll():
+                    self._crashed(handle)
+
+    def _expire(self, handle: _WorkerHandle) -> None:
+        """
+        Fail the worker's requests past their deadline and cancel them on the worker, and restart the
+        worker if it has not stopped a cancelled request within the grace period: it is alive but wedged.
+        """
+        now = time.monotonic()
+        with handle.lock:
+            expired = [request for request in handle.pending.values()
+                       if request.deadline is not None and now >= request.deadline]
+            wedged = any(now >= stop_by for _, stop_by in handle.cancelled.values())
+        for request in expired:
+            self._cancel(handle, request, f"Request on the {handle.name} worker timed out after "
+                                          f"{self.request_timeout:.0f}s", RequestTimeoutError)
+        if wedged:
+            self.logger.error(f"{handle.name.capitalize()} worker did not stop a cancelled request within "
+                              f"{self.cancel_grace:.0f}s; restarting it")
+            self._crashed(handle)
+
+    def _cancel(self, handle: _WorkerHandle, request: _Pending, message: str,
+                error: type = WorkerUnavailableError) -> None:
+        """Fail a request in flight and ask its worker to stop it. Its slot is released once the worker has."""
+        with handle.lock:
+            if handle.pending.pop(request.rid, None) is None:
+                return  # Already finished
+            handle.cancelled[request.rid] = (request, time.monotonic() + self.cancel_grace)
+            try:
+                handle.conn.send(("cancel", request.rid))
+            except OSError:
+                pass  # The dispatcher notices the broken pipe
+        request.fail(message, error)
+
+    def _deliver(self, handle: _WorkerHandle, message: Tuple) -> None:
+        kind = message[0]
+        if kind == "ready":
+            with handle.lock:
+                handle.ready, handle.ready_info, handle.consecutive_crashes = True, message[1], 0
+            if handle.tier is not None and message[1]:
+                self._loaded(handle.tier, message[1])
+            self.logger.info(f"{handle.name.capitalize()} worker ready")
+            return
+        rid = message[1]
+        final = kind != "event" or 'metrics' in message[2] or 'error' in message[2]
+        with handle.lock:
+            request = handle.pending.get(rid) if kind == "event" else handle.pending.pop(rid, None)
+            if request is None:
+                # A cancelled request: its slot is free once the worker has stopped writing to it.
+                if final and rid in handle.cancelled:
+                    handle.slots.release(handle.cancelled.pop(rid)[0].slot)
+                return
+        if kind == "result":
+            _, _, result, length = message
+            if length >= 0:
+                result["response"] = handle.slots.read(request.slot, length)
+            handle.slots.release(request.slot)
+            request.future.set_result(result)
+        elif kind == "event":
+            _, _, event, offset, length = message
+            if length >= 0:
+                event['token'] = handle.slots.read(request.slot, length, offset)
+            if final:
+                with handle.lock:
+                    handle.pending.pop(rid, None)
+                handle.slots.release(request.slot)
+            request.events.put(event)
+        elif kind == "error":
+            handle.slots.release(request.slot)
+            if request.future is not None:
+                request.future.set_exception(RuntimeError(message[2]))
+            else:
+                request.events.put({'error': message[2]})
+
+    def _submit(self, handle: _WorkerHandle, kind: str, text: Optional[str] = None, *args, stream: bool = False) -> _Pending:
+        """Send a request to a worker, with its text in a shared-memory slot when one is free and large enough."""
+        slot = handle.slots.acquire() if text is not None else -1
+        length = handle.slots.write(slot, text) if text is not None else -1
+        rid = next(self._ids)
+        request = _Pending(rid, slot, None if kind == "reload" else time.monotonic() + self.request_timeout, stream=stream)
+        with handle.lock:
+            if handle.conn is None or not handle.ready:
+                handle.slots.release(slot)
+                raise WorkerUnavailableError(f"The {handle.name} worker is restarting")
+            handle.pending[rid] = request
+            try:
+                if kind == "reload":
+                    handle.conn.send((kind, rid) + args)
+                else:
+                    handle.conn.send((kind, rid, slot, length, text if length < 0 else None) + args)
+            except OSError as e:
+                handle.pending.pop(rid, None)
+                handle.slots.release(slot)
+                raise WorkerUnavailableError(f"The {handle.name} worker is unreachable: {str(e)}")
+        return request
+
+    def _loaded(self, tier: str, measured: Dict[str, Any]) -> None:
+        self.tier_memory[tier] = measured
+        self._loads.inc(tier)
+        self.model_load_latency.observe(tier, measured.get("loadTime", 0.0))
+        self.router.observe_load(tier, measured.get("loadTime", 0.0))
+
+    # The AdaptiveLlamaProxy interface used by the API
+
+    @property
+    def model_paths(self) -> Dict[str, str]:
+        return self.config.model_paths
+
+    @property
+    def model_sizes(self) -> Dict[str, float]:
+        return self.config.model_sizes
+
+    @property
+    def model_usage(self) -> Dict[str, int]:
+        return self._model_usage.snapshot()
+
+    @property
+    def total_requests(self) -> int:
+        return self._total_requests.value
+
+    def get_loaded_models(self) -> list:
+        return [tier for tier, handle in self.tier_workers.items() if handle.ready]
+
+    def tier_bytes(self, complexity: str) -> int:
+        """Bytes a tier occupies when resident: as its worker measured it, else estimated from its checkpoint."""
+        measured = self.tier_memory.get(complexity)
+        if measured is not None and measured.get("residentBytes"):
+            return measured["residentBytes"]
+        return int(self.model_sizes[complexity] * 1e9 * self.config.model_bits[complexity] / 8)
+
+    def select_model(self, task_complexity: str) -> str:
+        """The tier for an explicitly requested task complexity."""
+        return {'very_simple': 'simple'}.get(task_complexity, task_complexity if task_complexity in TIERS else 'medium')
+
+    def classify(self, prompt: str) -> Dict[str, float]:
+        """Class probabilities from the classifier worker that owns the prompt, or the next one up."""
+        if self.task_classifier is not None:
+            return self.task_classifier.classify_cached(prompt)
+        first = int(prompt_key(prompt)[:8], 16) % len(self.classifier_workers)
+        for offset in range(len(self.classifier_workers)):
+            handle = self.classifier_workers[(first + offset) % len(self.classifier_workers)]
+            try:
+                # Raises RequestTimeoutError, rather than trying the next worker, once the request timeout is spent.
+                result = self._submit(handle, "classify", prompt, None).future.result()
+            except WorkerUnavailableError:
+                continue
+            handle.paths = result["paths"]
+            return result["probabilities"]
+        raise WorkerUnavailableError("No classifier worker is available")
+
+    def route(self, prompt: str, task_complexity: str = None, policy: Optional[str] = None,
+              cascade: bool = True) -> Tuple[str, str, Optional[float]]:
+        """
+        Classify the prompt if needed and return (task_complexity, model_type, confidence), as
+        AdaptiveLlamaProxy.route does. Cascade mode is not available across worker processes.
+        """
+        with tracing.span("route", policy=policy) as span:
+            confidence = None
+            if task_complexity is None:
+                classify_start = time.perf_counter()
+                probabilities = self.classify(prompt)
+                classify_time = time.perf_counter() - classify_start
+                task_complexity = max(probabilities, key=probabilities.get)
+                confidence = probabilities[task_complexity]
+                task_complexity = task_complexity if task_complexity != "Uncertain" else "medium"
+                model_type = self.router.choose(probabilities, resident=self.get_loaded_models(), policy=policy)
+                self.phase_latency["classify"].observe(model_type, classify_time)
+            else:
+                model_type = self.select_model(task_complexity)
+            span.set_attribute("tier", model_type)
+            return task_complexity, model_type, confidence
+
+    def _serving_tier(self, model_type: str) -> Tuple[str, Optional[str]]:
+        """The tier with a worker nearest to `model_type` (preferring the larger one), and the original tier if it differs."""
+        if model_type in self.tier_workers:
+            return model_type, None
+        target = TIERS.index(model_type)
+        fallback = min(self.tier_workers, key=lambda tier: (abs(TIERS.index(tier) - target), -TIERS.index(tier)))
+        self._fallback_requests.inc()
+        return fallback, model_type
+
+    def adaptive_generate(self, prompt: str, task_complexity: str = None, confidence: Optional[float] = None,
+                          model_type: Optional[str] = None, policy: Optional[str] = None) -> Dict[str, Any]:
+        """Generate a response on the routed tier's worker. Returns the same result as AdaptiveLlamaProxy.adaptive_generate."""
+        with tracing.span("adaptive_generate") as span:
+            if model_type is None:
+                task_complexity, model_type, confidence = self.route(prompt, task_complexity, policy=policy)
+            model_type, fallback_from = self._serving_tier(model_type)
+            self._total_requests.inc()
+            self.router.started(model_type)
+            result = {}
+            try:
+                request = self._submit(self.tier_workers[model_type], "generate", prompt,
+                                       {"task_complexity": task_complexity, "confidence": confidence,
+                                        "model_type": model_type})
+                result = request.future.result()
+            except (WorkerUnavailableError, RequestTimeoutError, RuntimeError) as e:
+                self.logger.error(f"Error generating on the {model_type} worker: {str(e)}")
+                result = {'error': str(e)}
+            finally:
+                # Cache hits say nothing about the tier's generation latency.
+                self.router.finished(model_type, None if result.get('cache_hit') else result.get('generation_time'))
+            if 'error' not in result:
+                result['fallback_from'] = result.get('fallback_from') or fallback_from
+                self._record_usage(result)
+            span.set_attribute("tier", result.get('model_used'))
+            span.set_attribute("cache_hit", result.get('cache_hit'))
+            return result
+
+    def adaptive_generate_stream(self, prompt: str, task_complexity: str = None, confidence: Optional[float] = None,
+                                 model_type: Optional[str] = None,
+                                 policy: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Stream a response from the routed tier's worker, with the events of AdaptiveLlamaProxy.adaptive_generate_stream."""
+        if model_type is None:
+            task_complexity, model_type, confidence = self.route(prompt, task_complexity, policy=policy, cascade=False)
+        model_type, fallback_from = self._serving_tier(model_type)
+        self._total_requests.inc()
+        self.router.started(model_type)
+        handle = self.tier_workers[model_type]
+        request, generation_time = None, None
+        try:
+            try:
+                request = self._submit(handle, "stream", prompt,
+                                       {"task_complexity": task_complexity, "confidence": confidence,
+                                        "model_type": model_type}, stream=True)
+            except WorkerUnavailableError as e:
+                yield {'error': str(e)}
+                return
+            while True:
+                event = request.events.get()
+                if 'metrics' in event:
+                    metrics = event['metrics']
+                    metrics['fallback_from'] = metrics.get('fallback_from') or fallback_from
+                    generation_time = None if metrics.get('cache_hit') else metrics.get('generation_time')
+                    self._record_usage(metrics)
+                yield event
+                if 'token' not in event:
+                    return
+        finally:
+            if request is not None:
+                # Closed before its last event (the client disconnected): stop the worker generating.
+                self._cancel(handle, request, "The stream was closed")
+            self.router.finished(model_type, generation_time)
+
+    def _record_usage(self, result: Dict[str, Any]) -> None:
+        """Count a generation reported by a tier worker, as AdaptiveLlamaProxy._record_usage does in-process."""
+        if result.get('cache_hit'):
+            return
+        tier = result['model_used']
+        self._model_usage.inc(tier)
+        self._tokens.inc("prompt", result.get('prompt_tokens') or 0)
+        self._tokens.inc("completion", result.get('completion_tokens') or 0)
+        for phase, seconds in result.get('phases', {}).items():
+            if seconds is not None and phase not in ("classify", "queue"):
+                self.phase_latency[phase].observe(tier, seconds)
+        self._total_memory_saved.inc(result.get('memory_saved') or 0)
+
+    def observe_phase(self, phase: str, tier: str, seconds: float) -> None:
+        self.phase_latency[phase].observe(tier, seconds)
+
+    def observe_request(self, tier: str, latency: float, ttft: Optional[float] = None,
+                        tokens_per_second: Optional[float] = None) -> None:
+        self.request_latency.observe(tier, latency)
+        if ttft is not None:
+            self.ttft.observe(tier, ttft)
+        if tokens_per_second is not None:
+            self.tokens_per_second.observe(tier, tokens_per_second)
+
+    def reload_config(self, path: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Load a new serving config (by default, the current config file re-read) and have every worker
+        apply it, as AdaptiveLlamaProxy.reload_config does in-process. Workers started later use it too.
+        Raises RuntimeError, after the other workers have applied it, if a worker fails to.
+        """
+        with self._reload_lock:
+            config = ServingConfig.load(path or self.config.source)
+            config.version = self.config.version + 1
+            changes = self.config.diff(config)
+            if self.task_classifier is not None and changes["classifier"]:
+                self.task_classifier = self.task_classifier.reloaded(config.classifier)
+            requests = {}
+            for handle in self.workers:
+                try:
+                    requests[handle.name] = (handle, self._submit(handle, "reload", None, config.source))
+                except WorkerUnavailableError:
+                    pass  # It loads the new config when it restarts
+            self.config, self.config_path = config, config.source
+            errors = []
+            for name, (handle, request) in requests.items():
+                try:
+                    result = request.future.result()
+                except Exception as e:
+                    errors.append(f"{name}: {str(e)}")
+                    continue
+                if handle.tier in changes["reloadedTiers"]:
+                    self._loaded(handle.tier, result["tierMemory"])
+            for tier in changes["resizedTiers"]:
+                self.router.update_tier(tier, config.tiers[tier]['size'])
+            for tier in changes["reloadedTiers"]:
+                self.router.update_tier(tier, config.tiers[tier]['size'], new_weights=True)
+        if errors:
+            raise RuntimeError(f"Config version {config.version} failed to apply on: {'; '.join(errors)}")
+        self.logger.info(f"Workers loaded config version {config.version} from {config.source or 'the defaults'}")
+        return {"version": config.version, **changes}
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """The metrics of AdaptiveLlamaProxy.get_metrics, gathered over the front and the workers, plus per-worker status."""
+        workers = {}
+        process_memory = self._process.memory_info().rss
+        for handle in self.workers:
+            rss = None
+            if handle.alive:
+                try:
+                    rss = psutil.Process(handle.process.pid).memory_info().rss
+                    process_memory += rss
+                except psutil.Error:
+                    pass
+            workers[handle.name] = {"pid": handle.process.pid if handle.process else None, "alive": handle.alive,
+                                    "ready": handle.ready, "starts": handle.starts, "crashes": handle.crashes.value,
+                                    "inFlight": len(handle.pending), "rss": rss}
+        resident = self.get_loaded_models()
+        paths = {path: sum(handle.paths[path] + handle.paths_base[path] for handle in self.classifier_workers)
+                 for path in ("fast", "full")}
+        if self.task_classifier is not None:
+            paths = self.task_classifier.get_path_stats()
+        return {
+            "modelUsage": self.model_usage,
+            "totalRequests": self.total_requests,
+            "totalMemorySaved": self._total_memory_saved.value,
+            "tokens": self._tokens.snapshot(),
+            "phases": {phase: histogram.get_stats() for phase, histogram in self.phase_latency.items()},
+            "processMemory": process_memory,
+            "tierMemory": {tier: {**measured, "resident": tier in resident} for tier, measured in self.tier_memory.items()},
+            "residency": {
+                "residentModels": resident,
+                "loading": [tier for tier, handle in self.tier_workers.items() if handle.alive and not handle.ready],
+                "memoryBudget": sum(self.tier_bytes(tier) for tier in self.tier_workers),
+                "memoryUsed": sum(self.tier_bytes(tier) for tier in resident),
+                "memoryReserved": 0,
+                "evictions": 0,
+                "loads": self._loads.snapshot(),
+            },
+            "classifierPaths": paths,
+            "fallbackRequests": self._fallback_requests.value,
+            "routing": self.router.get_stats(),
+            "config": self.config.to_dict(),
+            "workers": workers,
+            "startup": {"supervisorInit": self.startup_time},
+        }
+
+    def close(self) -> None:
+        """Stop the workers and the dispatcher, and free the shared memory."""
+        self._stop.set()
+        if self.config_watcher is not None:
+            self.config_watcher.stop()
+        for handle in self.workers:
+            with handle.lock:
+                if handle.conn is not None:
+                    try:
+                        handle.conn.send(("stop",))
+                    except OSError:
+                        pass
+        for handle in self.workers:
+            if handle.process is not None:
+                handle.process.join(timeout=5)
+                if handle.process.is_alive():
+                    handle.process.terminate()
+                    handle.process.join()
+        self._dispatcher.join(timeout=1)
+        for handle in self.workers:
+            handle.slots.close()
@@ -6,37 +6,91 @@ The TaskClassifier uses a combination of feature extraction and machine learning
 To use this classifier:
 1. Instantiate the TaskClassifier class
 2. Train the classifier using the train() method with a list of queries and their corresponding labels
-3. Use the classify() or classify_with_confidence() methods to classify new tasks
+3. Use the classify() or classify_with_confidence() methods to classify new tasks,
+   or classify_many() to classify a batch of prompts in a single model call
 
 Example:
     classifier = TaskClassifier()
     classifier.train(queries, labels)
     complexity, confidence = classifier.classify_with_confidence("What is the capital of France?")
 
+Startup-optimized mode:
+    classifier = TaskClassifier(lightweight=True, lazy=True)
+    classifier.load_model(path)  # returns immediately, the artifact is loaded on first classification
+    classifier.get_startup_metrics()
+
+Training on a large dataset:
+    classifier.train(queries, labels, n_process=8, feature_cache_dir="~/.cache/alp/features", cv_folds=0)
+
+Features are extracted with multiprocess spaCy pipes, and only for texts missing from the on-disk
+feature cache. The feature matrix stays sparse through scaling and fitting, and cross-validation is
+opt-in.
+
+Memory-mapped artifact:
+    classifier.save_artifact("data/task_classifier.alp")
+    classifier.load_model("data/task_classifier.alp")  # a directory: memory-mapped, see src/artifact.py
+
+Fast path:
+    classifier.set_fast_classifier(FastClassifier.load(path), threshold=0.9)
+
+With a fast classifier attached (see src/fast_classifier.py), classify_cached and classify_with_confidence
+use its prediction when its confidence is at least `threshold`, and only run the full spaCy path below
+it. classify and classify_many always use the full path.
+
+Hot reload:
+    classifier = classifier.reloaded("data/task_classifier.alp")  # reuses the loaded spaCy pipeline
+
+In lightweight mode spaCy is loaded without the dependency parser and lemmatizer (sentence boundaries
+come from the statistical sentence recognizer instead), which is all extract_features needs. The tagger
+and entity recognizer do not depend on the parser, so only sentence_count and avg_sentence_length can
+differ from the features the classifier was trained on, where the recognizer splits sentences
+differently from the parser; tests/test_task_classifier.py checks that predictions still agree. In lazy
+mode neither spaCy nor the classifier artifact is loaded until the first classification. The heavy
+scientific imports (spaCy, pandas, scikit-learn, xgboost) are always deferred until they are used.
+
 Note: Make sure to have the 'en_core_web_sm' spaCy model installed before using this classifier.
 """
 
+import os
+import time
+import threading
 import numpy as np
-import pandas as pd
-import joblib
-from typing import List, Dict, Tuple, Union
+from typing import Any, List, Dict, Optional, Tuple, Union
 import logging
-import spacy
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split, cross_val_score
-from sklearn.metrics import classification_report
-from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import StandardScaler, LabelEncoder
-from xgboost import XGBClassifier
+from src.artifact import ClassifierArtifact
+from src.caching import FeatureCache, LRUCache, prompt_key
+from src.fast_classifier import FastClassifier
+from src.metrics import CounterMap
+from src import tracing
 
 class TaskClassifier:
-    def __init__(self):
-        self.nlp = spacy.load("en_core_web_sm")
+    FEATURE_NAMES = (
+        'word_count', 'avg_word_length', 'noun_count', 'verb_count', 'adj_count',
+        'entity_count', 'sentence_count', 'avg_sentence_length', 'unique_word_ratio',
+    )
+
+    LIGHTWEIGHT_EXCLUDE = ("parser", "lemmatizer")
+
+    def __init__(self, lightweight: bool = False, lazy: bool = False,
+                 cache_size: int = 4096, cache_ttl: Optional[float] = 3600):
+        init_start = time.perf_counter()
+        self.lightweight = lightweight
+        self.lazy = lazy
         self.pipeline = None
         self.logger = self._setup_logger()
-        self.tfidf = TfidfVectorizer(max_features=1000)
-        self.label_encoder = LabelEncoder()
+        self.tfidf = None
+        self.label_encoder = None
+        self._nlp = None
+        self._pending_model_path: Optional[str] = None
+        self._load_lock = threading.RLock()
+        self.startup_metrics: Dict[str, float] = {}
+        self.classification_cache = LRUCache(maxsize=cache_size, ttl=cache_ttl)
+        self.fast_classifier: Optional[FastClassifier] = None
+        self.fast_threshold = 1.0
+        self._paths = CounterMap(("fast", "full"))
+        if not lazy:
+            self._load_nlp()
+        self.startup_metrics['init'] = time.perf_counter() - init_start - self.startup_metrics.get('nlpLoad', 0.0)
 
     @staticmethod
     def _setup_logger() -> logging.Logger:
@@ -48,8 +102,74 @@ class TaskClassifier:
         logger.addHandler(handler)
         return logger
 
+    @property
+    def nlp(self):
+        if self._nlp is None:
+            self._load_nlp()
+        return self._nlp
+
+    def _load_nlp(self) -> None:
+        with self._load_lock:
+            if self._nlp is not None:
+                return
+            start = time.perf_counter()
+            import spacy
+            if self.lightweight:
+                nlp = spacy.load("en_core_web_sm", exclude=list(self.LIGHTWEIGHT_EXCLUDE))
+                if "senter" in nlp.disabled:
+                    nlp.enable_pipe("senter")
+            else:
+                nlp = spacy.load("en_core_web_sm")
+            self._nlp = nlp
+            self.startup_metrics['nlpLoad'] = time.perf_counter() - start
+            self.logger.info(f"Loaded spaCy pipeline {nlp.pipe_names} in {self.startup_metrics['nlpLoad']:.2f}s")
+
+    def _ensure_loaded(self) -> None:
+        if self._pending_model_path is not None:
+            with self._load_lock, tracing.span("load_classifier"):
+                if self._pending_model_path is not None:
+                    self._load_artifact(self._pending_model_path)
+                    self._pending_model_path = None
+        if self._nlp is None:
+            with tracing.span("load_spacy"):
+                self._load_nlp()
+
+    def warm_up(self) -> None:
+        """Load everything a lazy classifier defers, e.g. from a background thread after startup."""
+        self._ensure_loaded()
+
+    def get_startup_metrics(self) -> Dict[str, float]:
+        metrics = dict(self.startup_metrics)
+        metrics['coldStart'] = sum(metrics.get(key, 0.0) for key in ('init', 'nlpLoad', 'artifactLoad'))
+        return metrics
+
     def extract_features(self, text: str) -> Dict[str, Union[int, float]]:
-        doc = self.nlp(text)
+        return self._doc_features(self.nlp(text))
+
+    def extract_features_many(self, texts: List[str], batch_size: int = 64,
+                              n_process: int = 1) -> List[Dict[str, Union[int, float]]]:
+        return [self._doc_features(doc) for doc in self.nlp.pipe(texts, batch_size=batch_size, n_process=n_process)]
+
+    def feature_cache_name(self) -> str:
+        """Feature cache file name for the loaded spaCy pipeline; features differ between pipelines."""
+        meta = self.nlp.meta
+        variant = "-lightweight" if self.lightweight else ""
+        return f"features-{meta['lang']}_{meta['name']}-{meta['version']}{variant}.jsonl"
+
+    def extract_features_cached(self, texts: List[str], feature_cache: FeatureCache, batch_size: int = 256,
+                                n_process: int = 1) -> List[Dict[str, Union[int, float]]]:
+        """Features of `texts`, extracting (and caching) only those of texts not already in the cache."""
+        keys = [feature_cache.key(text) for text in texts]
+        missing = {key: text for key, text in zip(keys, texts) if key not in feature_cache}
+        self.logger.info(f"Features cached for {len(set(keys)) - len(missing)} of {len(set(keys))} unique texts; "
+                         f"extracting {len(missing)} with {n_process} process(es)")
+        if missing:
+            rows = self.extract_features_many(list(missing.values()), batch_size=batch_size, n_process=n_process)
+            feature_cache.put_many(dict(zip(missing, rows)))
+        return [feature_cache.get(key) for key in keys]
+
+    @staticmethod
+    def _doc_features(doc) -> Dict[str, Union[int, float]]:
         return {
             'word_count': len(doc),
             'avg_word_length': np.mean([len(token.text) for token in doc]),
@@ -62,15 +182,38 @@ class TaskClassifier:
             'unique_word_ratio': len(set(token.text.lower() for token in doc)) / len(doc) if len(doc) > 0 else 0,
         }
 
-    def features_to_dataframe(self, features: List[Dict[str, Union[int, float]]]) -> pd.DataFrame:
+    def features_to_dataframe(self, features: List[Dict[str, Union[int, float]]]) -> "pd.DataFrame":
+        import pandas as pd
         return pd.DataFrame(features)
 
-    def train(self, queries: List[str], labels: List[str]) -> None:
-        features = [self.extract_features(query) for query in queries]
-        X_features = self.features_to_dataframe(features)
-        X_tfidf = self.tfidf.fit_transform(queries)
-        
-        X = np.hstack((X_features, X_tfidf.toarray()))
+    def train(self, queries: List[str], labels: List[str], n_process: int = 1, batch_size: int = 256,
+              feature_cache_dir: Optional[str] = None, cv_folds: int = 0) -> None:
+        """
+        Fit the TF-IDF vectorizer and the scaler + XGBoost pipeline.
+
+        spaCy features are extracted with `n_process` processes, through an on-disk feature cache when
+        `feature_cache_dir` is given. The feature matrix is never densified: the scaler only scales, so
+        sparse rows stay sparse. `cv_folds` > 1 adds a cross-validation run, which refits that many times.
+        """
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.model_selection import train_test_split, cross_val_score
+        from sklearn.metrics import classification_report
+        from sklearn.pipeline import Pipeline
+        from sklearn.preprocessing import StandardScaler, LabelEncoder
+        from xgboost import XGBClassifier
+
+        self.tfidf = TfidfVectorizer(max_features=1000)
+        self.label_encoder = LabelEncoder()
+        extract_start = time.perf_counter()
+        if feature_cache_dir is not None:
+            feature_cache = FeatureCache(os.path.join(os.path.expanduser(feature_cache_dir), self.feature_cache_name()))
+            features = self.extract_features_cached(queries, feature_cache, batch_size=batch_size, n_process=n_process)
+        else:
+            features = self.extract_features_many(queries, batch_size=batch_size, n_process=n_process)
+        self.logger.info(f"Extracted features of {len(queries)} queries in {time.perf_counter() - extract_start:.1f}s")
+
+        self.tfidf.fit(queries)
+        X = self._feature_matrix(queries, features)
         y = self.label_encoder.fit_transform(labels)
         
         # Print data distribution
@@ -80,7 +223,7 @@ class TaskClassifier:
             self.logger.info(f"{label}: {count}")
         
         self.pipeline = Pipeline([
-            ('scaler', StandardScaler()),
+            ('scaler', StandardScaler(with_mean=False)),
             ('clf', XGBClassifier(n_estimators=100, random_state=42))
         ])
 
@@ -91,33 +234,144 @@ class TaskClassifier:
         accuracy = self.pipeline.score(X_test, y_test)
         self.logger.info(f"Task classifier accuracy: {accuracy:.2f}")
 
-        cv_scores = cross_val_score(self.pipeline, X, y, cv=5)
-        self.logger.info(f"Cross-validation scores: {cv_scores}")
-        self.logger.info(f"Mean CV score: {np.mean(cv_scores):.2f}")
+        if cv_folds > 1:
+            cv_scores = cross_val_score(self.pipeline, X, y, cv=cv_folds)
+            self.logger.info(f"Cross-validation scores: {cv_scores}")
+            self.logger.info(f"Mean CV score: {np.mean(cv_scores):.2f}")
 
         y_pred = self.pipeline.predict(X_test)
         self.logger.info("\nClassification Report:")
         self.logger.info(classification_report(y_test, y_pred, target_names=self.label_encoder.classes_))
 
     def classify(self, prompt: str) -> Dict[str, float]:
-        if self.pipeline is None:
-            raise ValueError("Classifier not trained. Call train() first.")
-
-        features = [self.extract_features(prompt)]
-        X_features = self.features_to_dataframe(features)
-        X_tfidf = self.tfidf.transform([prompt])
-        X = np.hstack((X_features, X_tfidf.toarray()))
-        probabilities = self.pipeline.predict_proba(X)[0]
-        
-        return {class_name: prob for class_name, prob in zip(self.label_encoder.classes_, probabilities)}
+        return self.classify_many([prompt])[0]
+
+    def classify_many(self, prompts: List[str], batch_size: int = 64) -> List[Dict[str, float]]:
+        """
+        Classify a batch of prompts with one spaCy pipe pass and one predict_proba call.
+
+        The feature matrix stays sparse; it is only densified (once per batch) when the trained
+        pipeline centers its inputs, which sparse matrices cannot represent.
+        """
+        with tracing.span("classify", prompts=len(prompts)):
+            self._ensure_loaded()
+            if self.pipeline is None:
+                raise ValueError("Classifier not trained. Call train() first.")
+            if not prompts:
+                return []
+
+            with tracing.span("extract_features"):
+                features = self.extract_features_many(prompts, batch_size=batch_size)
+            with tracing.span("tfidf_transform"):
+                X = self._feature_matrix(prompts, features)
+            with tracing.span("predict_proba"):
+                probabilities = self.pipeline.predict_proba(self._pipeline_input(X))
+
+            classes = self.label_encoder.classes_
+            return [{class_name: prob for class_name, prob in zip(classes, row)} for row in probabilities]
+
+    def vectorize(self, prompts: List[str]) -> "sparse.csr_matrix":
+        """L2-normalized TF-IDF vectors of the prompts, as used by the classifier."""
+        self._ensure_loaded()
+        return self.tfidf.transform(prompts)
+
+    def _feature_matrix(self, prompts: List[str], features: List[Dict[str, Union[int, float]]]) -> "sparse.csr_matrix":
+        from scipy import sparse
+        X_features = np.array([[row[name] for name in self.FEATURE_NAMES] for row in features], dtype=np.float64)
+        X_tfidf = self.tfidf.transform(prompts)
+        return sparse.hstack((sparse.csr_matrix(X_features), X_tfidf), format='csr')
+
+    def _pipeline_input(self, X: "sparse.csr_matrix") -> Any:
+        scaler = self.pipeline.named_steps.get('scaler')
+        if scaler is not None and getattr(scaler, 'with_mean', False):
+            return X.toarray()
+        return X
+
+    def set_fast_classifier(self, fast_classifier: Optional[FastClassifier], threshold: float = 0.9) -> None:
+        """Attach (or, with None, detach) a fast-path classifier trusted at or above `threshold` confidence."""
+        self.fast_classifier = fast_classifier
+        self.fast_threshold = threshold
+        self.classification_cache.clear()
+
+    def _classify_fast(self, prompt: str) -> Optional[Dict[str, float]]:
+        """Fast-path probabilities, or None when there is no fast classifier or it is not confident enough."""
+        if self.fast_classifier is None:
+            return None
+        with tracing.span("fast_classify") as span:
+            probabilities = self.fast_classifier.predict_proba(prompt)
+            accepted = max(probabilities.values()) >= self.fast_threshold
+            span.set_attribute("accepted", accepted)
+        return probabilities if accepted else None
+
+    def classify_cached(self, prompt: str) -> Dict[str, float]:
+        """Class probabilities for a prompt, reusing the result for identical or near-identical (normalized) prompts."""
+        key = prompt_key(prompt)
+        probabilities = self.classification_cache.get(key)
+        if probabilities is None:
+            probabilities = self._classify_fast(prompt)
+            if probabilities is not None:
+                self._paths.inc("fast")
+            else:
+                probabilities = {class_name: float(prob) for class_name, prob in self.classify(prompt).items()}
+                self._paths.inc("full")
+            self.classification_cache.put(key, probabilities)
+        return probabilities
 
     def classify_with_confidence(self, prompt: str) -> Tuple[str, float]:
-        probabilities = self.classify(prompt)
+        probabilities = self.classify_cached(prompt)
         max_class = max(probabilities, key=probabilities.get)
         return max_class, probabilities[max_class]
 
+    def get_cache_stats(self) -> Dict[str, Any]:
+        return self.classification_cache.get_stats()
+
+    def get_path_stats(self) -> Dict[str, Any]:
+        """How many uncached classifications the fast path answered, and how many fell back to the full path."""
+        paths = self._paths.snapshot()
+        total = paths["fast"] + paths["full"]
+        return {**paths, "fastShare": paths["fast"] / total if total else 0.0,
+                "threshold": self.fast_threshold if self.fast_classifier is not None else None}
+
     def save_model(self, path: str) -> None:
+        import joblib
+        self._ensure_loaded()
         joblib.dump((self.pipeline, self.tfidf, self.label_encoder), path)
 
+    def save_artifact(self, path: str) -> None:
+        """Save in the memory-mapped artifact format, which worker processes can share."""
+        self._ensure_loaded()
+        ClassifierArtifact.from_sklearn(self.pipeline, self.tfidf, self.label_encoder).save(path)
+
     def load_model(self, path: str) -> None:
-        self.pipeline, self.tfidf, self.label_encoder = joblib.load(path)
\ No newline at end of file
+        """Load a joblib file, or a memory-mapped artifact directory written by save_artifact."""
+        self.classification_cache.clear()
+        if self.lazy:
+            with self._load_lock:
+                self._pending_model_path = path
+            return
+        self._load_artifact(path)
+
+    def reloaded(self, path: str) -> "TaskClassifier":
+        """
+        A classifier with the model at `path` loaded right away, and this one's settings, spaCy pipeline,
+        fast path and path counters, so it can replace this one without a cold start. Its classification
+        cache starts empty, since cached results came from the old model.
+        """
+        classifier = TaskClassifier(lightweight=self.lightweight, lazy=True,
+                                    cache_size=self.classification_cache.maxsize, cache_ttl=self.classification_cache.ttl)
+        classifier.lazy = self.lazy
+        classifier._nlp = self._nlp
+        classifier._load_artifact(path)
+        classifier.fast_classifier, classifier.fast_threshold = self.fast_classifier, self.fast_threshold
+        classifier._paths = self._paths
+        return classifier
+
+    def _load_artifact(self, path: str) -> None:
+        start = time.perf_counter()
+        if os.path.isdir(path):
+            artifact = ClassifierArtifact.load(path)
+            self.pipeline, self.tfidf, self.label_encoder = artifact.pipeline, artifact.tfidf, artifact.label_encoder
+        else:
+            import joblib
+            self.pipeline, self.tfidf, self.label_encoder = joblib.load(path)
+        self.startup_metrics['artifactLoad'] = time.perf_counter() - start
\ No newline at end of file
@@ -0,0 +1,203 @@
+"""
+This file defines the opt-in tracing layer used to see where time goes on the routing hot path.
+
+Spans are context managers that nest through a context variable: a span opened inside another becomes
+its child, including across the API's worker threads, since the admission controller runs blocking calls
+in a copy of the caller's context. Whether a trace is recorded is decided once, at its root span, with
+probability `sample_rate`. Spans of unsampled traces, and every span while tracing is off, cost one
+context-variable lookup.
+
+Finished spans are appended to a local file as OTLP/JSON ExportTraceServiceRequest lines, the format the
+OpenTelemetry collector's file exporter writes and its otlpjsonfile receiver reads, so trace files can be
+shipped to any OpenTelemetry backend. scripts/summarize_traces.py turns them into a per-stage breakdown.
+
+Example:
+    tracer = configure(sample_rate=0.1, path="traces/alp-traces.jsonl")
+    with tracer.span("adaptive_generate") as root:
+        with tracer.span("generate", tier="simple"):
+            ...
+        root.set_attribute("tier", "simple")
+
+Configured from the environment by default: ALP_TRACE_SAMPLE_RATE (0 disables tracing) and ALP_TRACE_FILE.
+"""
+
+import os
+import json
+import random
+import threading
+import time
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+DEFAULT_TRACE_FILE = os.path.join("traces", "alp-traces.jsonl")
+SERVICE_NAME = "adaptive-llama-proxy"
+SPAN_KIND_INTERNAL = 1
+STATUS_ERROR = 2
+
+
+class Span:
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": SPAN_KIND_INTERNAL,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)}
+                           for key, value in self.attributes.items() if value is not None],
+        }
+        if self.parent_id is not None:
+            span["parentSpanId"] = self.parent_id
+        if self.error is not None:
+            span["status"] = {"code": STATUS_ERROR, "message": self.error}
+        return span
+
+
+class _NoopSpan:
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+# The innermost open span of the current context: a Span, NOOP_SPAN inside an unsampled trace, or None.
+_current_span: contextvars.ContextVar = contextvars.ContextVar("alp_current_span", default=None)
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}  # 64-bit integers are strings in OTLP/JSON
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class FileExporter:
+    """Appends spans to a JSON-lines file, one OTLP ExportTraceServiceRequest per line."""
+
+    def __init__(self, path: str, service_name: str = SERVICE_NAME):
+        self.path = path
+        self.resource = {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]}
+        self._lock = threading.Lock()
+        self._file = None
+
+    def export(self, spans: List[Span]) -> None:
+        line = json.dumps({"resourceSpans": [{
+            "resource": self.resource,
+            "scopeSpans": [{"scope": {"name": __name__}, "spans": [span.to_otlp() for span in spans]}],
+        }]})
+        with self._lock:
+            if self._file is None:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class Tracer:
+    def __init__(self, sample_rate: float = 0.0, exporter: Optional[FileExporter] = None):
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError("sample_rate must be between 0 and 1")
+        self.sample_rate = sample_rate
+        self.exporter = exporter
+
+    @classmethod
+    def from_env(cls) -> "Tracer":
+        sample_rate = float(os.environ.get("ALP_TRACE_SAMPLE_RATE", "0"))
+        if sample_rate <= 0:
+            return cls()
+        return cls(sample_rate, FileExporter(os.environ.get("ALP_TRACE_FILE", DEFAULT_TRACE_FILE)))
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0 and self.exporter is not None
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Any]:
+        """
+        Time the enclosed block as a child of the current span, or as the root of a new trace if there is
+        none. Yields the span, or a no-op stand-in when the trace is not sampled.
+        """
+        parent = _current_span.get()
+        if parent is NOOP_SPAN or (parent is None and not self.enabled):
+            yield NOOP_SPAN
+            return
+        if parent is None and random.random() >= self.sample_rate:
+            token = _current_span.set(NOOP_SPAN)
+            try:
+                yield NOOP_SPAN
+            finally:
+                _current_span.reset(token)
+            return
+
+        trace_id = parent.trace_id if parent is not None else os.urandom(16).hex()
+        span = Span(name, trace_id, parent.span_id if parent is not None else None, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.end_ns = time.time_ns()
+            _current_span.reset(token)
+            if self.exporter is not None:
+                self.exporter.export([span])
+
+    def close(self) -> None:
+        if self.exporter is not None:
+            self.exporter.close()
+
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                _tracer = Tracer.from_env()
+    return _tracer
+
+
+def configure(sample_rate: float, path: str = DEFAULT_TRACE_FILE) -> Tracer:
+    """Replace the process-wide tracer, e.g. from a benchmark or a test."""
+    global _tracer
+    tracer = Tracer(sample_rate, FileExporter(path) if sample_rate > 0 else None)
+    with _tracer_lock:
+        previous, _tracer = _tracer, tracer
+    if previous is not None:
+        previous.close()
+    return tracer
+
+
+def span(name: str, **attributes: Any):
+    """A span on the process-wide tracer; see Tracer.span."""
+    return get_tracer().span(name, **attributes)
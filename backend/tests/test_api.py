@@ -0,0 +1,134 @@
+"""
+Tests for the FastAPI service on the stub backend: how admission control errors map to HTTP responses,
+and the server-sent events of /generate/stream.
+
+To run these tests, use the following command from the backend directory:
+python -m pytest tests/test_api.py
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import threading
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.adaptive_llama_mlx import AdaptiveLlamaProxy
+from src.backends import StubBackend
+from src.serving import TierAdmissionController
+
+HEADERS = {"X-API-Key": "test"}
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """The API module serving from a stub proxy whose simple tier takes at least 80ms per request."""
+    monkeypatch.setenv("ALP_BACKEND", "stub")
+    monkeypatch.setenv("ALP_FAST_STARTUP", "1")
+    monkeypatch.delenv("ALP_SUPERVISOR", raising=False)
+    monkeypatch.delenv("ALP_CONFIG", raising=False)
+    monkeypatch.delenv("API_KEY", raising=False)
+    from src import api
+
+    backend = StubBackend(token_latency=0.01, prefill_latency=0, load_latency=0, memory_footprint=0)
+    proxy = AdaptiveLlamaProxy(backend=backend, fast_startup=True, prefetch=False, config_watch=False)
+    proxy.load_model('simple')
+    monkeypatch.setattr(api, "alp", proxy)
+    monkeypatch.setattr(api, "API_KEY", None)
+    yield api
+    proxy.close()
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def client_for(api, admission, monkeypatch):
+    from fastapi.testclient import TestClient
+    monkeypatch.setattr(api, "admission", admission)
+    return TestClient(api.app)
+
+
+def test_full_queue_is_429_and_timeout_is_504(api, monkeypatch):
+    admission = TierAdmissionController(max_workers=2, tier_concurrency=1, max_queue=0, request_timeout=30)
+    with client_for(api, admission, monkeypatch) as client:
+        first = {}
+        thread = threading.Thread(target=lambda: first.update(response=client.post(
+            "/generate", json={"prompt": "What is two plus two?", "model": "simple"}, headers=HEADERS)))
+        thread.start()
+        wait_until(lambda: admission.active['simple'] == 1)
+        rejected = client.post("/generate", json={"prompt": "Hello", "model": "simple"}, headers=HEADERS)
+        assert rejected.status_code == 429 and rejected.headers["Retry-After"] == "1"
+        thread.join()
+        assert first["response"].status_code == 200
+        assert first["response"].json()["model"] == "simple"
+
+    admission = TierAdmissionController(max_workers=2, tier_concurrency=1, max_queue=4, request_timeout=0.05)
+    with client_for(api, admission, monkeypatch) as client:
+        response = client.post("/generate", json={"prompt": "What is two plus two?", "model": "simple"}, headers=HEADERS)
+        assert response.status_code == 504
+        assert admission.get_stats()["timeouts"]['simple'] == 1
+        # The timed-out generation keeps its slot until it finishes.
+        wait_until(lambda: admission.active['simple'] == 0)
+
+
+def parse_sse(body):
+    """(event, data) pairs of a server-sent event stream."""
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_stream_sends_tokens_then_metrics_or_an_error(api, monkeypatch):
+    admission = TierAdmissionController(max_workers=2, tier_concurrency=1, max_queue=4, request_timeout=30)
+    request = {"prompt": "Name a fruit.", "model": "simple"}
+    with client_for(api, admission, monkeypatch) as client:
+        response = client.post("/generate/stream", json=request, headers=HEADERS)
+        assert response.status_code == 200 and response.headers["content-type"].startswith("text/event-stream")
+        events = parse_sse(response.text)
+        assert [event for event, _ in events[:-1]] == ["token"] * (len(events) - 1)
+        assert "".join(data["token"] for _, data in events[:-1]) == api.alp.backend.generate(
+            *api.alp.registry.peek('simple'), request["prompt"])
+        event, metrics = events[-1]
+        assert event == "metrics" and metrics["model"] == "simple" and metrics["ttft"] > 0
+
+        # A backend failure after the first token still ends the stream with an error event.
+        def failing_stream(model, tokenizer, prompt, max_tokens=100):
+            yield "partial"
+            raise RuntimeError("decode failed")
+
+        monkeypatch.setattr(api.alp.backend, "stream", failing_stream)
+        response = client.post("/generate/stream", json=request, headers=HEADERS)
+        assert response.status_code == 200
+        assert parse_sse(response.text) == [("token", {"token": "partial"}), ("error", {"detail": "decode failed"})]
+    assert admission.get_stats()["active"]['simple'] == 0
+
+
+def test_stream_disconnect_releases_the_slot(api, monkeypatch):
+    admission = TierAdmissionController(max_workers=2, tier_concurrency=1, max_queue=4, request_timeout=30)
+    monkeypatch.setattr(api, "admission", admission)
+
+    async def main():
+        response = await api.generate_stream(api.PromptRequest(prompt="Name a fruit.", model="simple"), api_key="test")
+        body = response.body_iterator
+        assert (await body.__anext__()).startswith("event: token")
+        assert admission.active['simple'] == 1
+        await body.aclose()  # What the server does when the client goes away
+        deadline = time.monotonic() + 5
+        while admission.active['simple']:
+            assert time.monotonic() < deadline
+            await asyncio.sleep(0.005)
+
+    try:
+        asyncio.run(main())
+    finally:
+        admission.shutdown()
@@ -0,0 +1,137 @@
+"""
+Tests for the memory-mapped classifier artifact.
+
+To run these tests, use the following command from the backend directory:
+python -m pytest tests/test_artifact.py
+"""
+
+import os
+import sys
+import json
+import threading
+
+import numpy as np
+import pytest
+from scipy import sparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.artifact import ClassifierArtifact, MappedVocabulary
+
+TEXTS = ["what is two plus two", "hi there friend", "name a fruit please", "what color is the sky",
+         "analyze the macroeconomic implications of quantitative easing",
+         "discuss consciousness and artificial general intelligence",
+         "explain how transformers scale with sequence length",
+         "compare interpretations of quantum mechanics and determinism",
+         "how does a combustion engine work", "describe the process of evolution",
+         "what are the causes of climate change", "explain supply and demand"] * 3
+LABELS = (["simple"] * 4 + ["complex"] * 4 + ["medium"] * 4) * 3
+
+
+def fit(with_mean: bool):
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import LabelEncoder, StandardScaler
+    from xgboost import XGBClassifier
+
+    tfidf = TfidfVectorizer(max_features=50, ngram_range=(1, 2))
+    label_encoder = LabelEncoder()
+    lengths = sparse.csr_matrix([[len(text), text.count(" ")] for text in TEXTS], dtype=np.float64)
+    X = sparse.hstack((lengths, tfidf.fit_transform(TEXTS)), format="csr")
+    pipeline = Pipeline([("scaler", StandardScaler(with_mean=with_mean)),
+                         ("clf", XGBClassifier(n_estimators=10, max_depth=3, random_state=0))])
+    pipeline.fit(X.toarray() if with_mean else X, label_encoder.fit_transform(LABELS))
+    return pipeline, tfidf, label_encoder, X
+
+
+@pytest.mark.parametrize("with_mean", [True, False])
+def test_artifact_matches_sklearn_and_xgboost(tmp_path, with_mean):
+    pipeline, tfidf, label_encoder, X = fit(with_mean)
+    path = str(tmp_path / "classifier.alp")
+    ClassifierArtifact.from_sklearn(pipeline, tfidf, label_encoder).save(path)
+    artifact = ClassifierArtifact.load(path, verify=True)
+
+    assert isinstance(artifact.arrays["tree_left"], np.memmap)
+    # The vocabulary is mapped like the other arrays, and leaf values are read from the thresholds.
+    assert isinstance(artifact.tfidf.vocabulary.terms, np.memmap)
+    assert sorted(os.listdir(path)) == sorted(["manifest.json"] + [f"{name}.npy" for name in artifact.arrays])
+    assert "tree_value" not in artifact.arrays
+    assert list(artifact.label_encoder.classes_) == ["complex", "medium", "simple"]
+    assert abs(artifact.tfidf.transform(TEXTS) - tfidf.transform(TEXTS)).max() < 1e-12
+    X_input = X.toarray() if with_mean else X
+    assert np.abs(artifact.pipeline.predict_proba(X_input) - pipeline.predict_proba(X_input)).max() < 1e-5
+
+
+def test_vocabulary_lookup():
+    vocabulary = MappedVocabulary(**{name[len("vocabulary_"):]: array for name, array in MappedVocabulary.arrays(
+        {"two": 3, "two plus": 0, "café": 1, "a": 2}).items()})
+    assert len(vocabulary) == 4
+    assert vocabulary.lookup(["two", "café", "tw", "twos", "two plus", "a", "two plus two", "", "zzz"]).tolist() == \
+        [3, 1, -1, -1, 0, 2, -1, -1, -1]  # "two plus two" is longer than any term: no truncated match
+    assert vocabulary.lookup([]).tolist() == []
+    empty = MappedVocabulary(**{name[len("vocabulary_"):]: array for name, array in MappedVocabulary.arrays({}).items()})
+    assert empty.lookup(["two"]).tolist() == [-1]
+
+
+def test_artifact_rejects_other_versions(tmp_path):
+    pipeline, tfidf, label_encoder, _ = fit(False)
+    path = str(tmp_path / "classifier.alp")
+    ClassifierArtifact.from_sklearn(pipeline, tfidf, label_encoder).save(path)
+    manifest_path = os.path.join(path, "manifest.json")
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    manifest["formatVersion"] += 1
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f)
+    with pytest.raises(ValueError, match="version"):
+        ClassifierArtifact.load(path)
+
+
+def test_save_swaps_versions_atomically_under_concurrent_loads(tmp_path, monkeypatch):
+    with_mean, without_mean = (ClassifierArtifact.from_sklearn(*fit(mean)[:3]) for mean in (True, False))
+    path = str(tmp_path / "classifier.alp")
+    # An artifact directory from before versioning is migrated on the first save.
+    without_mean.save(str(tmp_path / "legacy.alp"))
+    os.rename(os.path.realpath(tmp_path / "legacy.alp"), path)
+    with_mean.save(path)
+    assert os.path.islink(path) and os.path.isdir(f"{path}.v0")
+    manifests = [json.dumps(artifact.manifest["tfidf"], sort_keys=True) for artifact in (with_mean, without_mean)]
+
+    errors, loads = [], []
+    stop = threading.Event()
+
+    def load_continuously():
+        while not stop.is_set():
+            try:
+                artifact = ClassifierArtifact.load(path, verify=True)
+                loads.append(json.dumps(artifact.manifest["tfidf"], sort_keys=True) in manifests)
+            except Exception as e:
+                errors.append(e)
+
+    loaders = [threading.Thread(target=load_continuously) for _ in range(2)]
+    for loader in loaders:
+        loader.start()
+    try:
+        for i in range(19):
+            (with_mean if i % 2 else without_mean).save(path)
+    finally:
+        stop.set()
+        for loader in loaders:
+            loader.join()
+    assert errors == [] and loads and all(loads)
+    assert os.path.islink(path)
+    # Only the current and the previous version are kept.
+    assert sorted(name for name in os.listdir(tmp_path) if name.startswith("classifier.alp")) == \
+        ["classifier.alp", "classifier.alp.v19", "classifier.alp.v20"]
+
+    # A save that fails before the swap leaves the current version in place.
+    current = ClassifierArtifact.load(path).manifest
+
+    def crash(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "replace", crash)
+    with pytest.raises(OSError):
+        with_mean.save(path)
+    monkeypatch.undo()
+    assert ClassifierArtifact.load(path, verify=True).manifest == current
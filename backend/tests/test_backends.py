@@ -0,0 +1,84 @@
+"""
+Tests for the generation backends.
+
+To run these tests, use the following command from the backend directory:
+python -m pytest tests/test_backends.py
+"""
+
+import os
+import sys
+import time
+import types
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.backends import MLXBackend, StubBackend, get_backend
+
+
+def test_stub_backend_is_deterministic():
+    backend = StubBackend(latency_scale=0)
+    model, tokenizer = backend.load('simple', "stub/simple")
+    first = backend.generate(model, tokenizer, "What is the capital of France?")
+    second = backend.generate(model, tokenizer, "What is the capital of France?")
+    assert first == second
+    assert first == "".join(backend.stream(model, tokenizer, "What is the capital of France?"))
+
+
+def test_stub_backend_tiers_differ_and_respect_max_tokens():
+    backend = StubBackend(latency_scale=0)
+    simple = backend.load('simple', "stub/simple")
+    medium = backend.load('medium', "stub/medium")
+    prompt = "Explain the concept of supply and demand in economics"
+    assert backend.generate(*simple, prompt) != backend.generate(*medium, prompt)
+    assert len(backend.generate(*simple, prompt, max_tokens=4).split()) <= 4
+
+
+def test_stub_backend_latency_and_footprint_are_tunable():
+    backend = StubBackend(token_latency=0.01, prefill_latency=0, load_latency=0,
+                          memory_footprint={'simple': 1024 * 1024})
+    model, tokenizer = backend.load('simple', "stub/simple")
+    assert model.nbytes == backend.estimate_memory('simple') == 1024 * 1024
+
+    start = time.perf_counter()
+    text = backend.generate(model, tokenizer, "Hello", max_tokens=5)
+    assert time.perf_counter() - start >= 0.01 * len(text.split())
+
+
+def test_get_backend_selects_by_name_and_environment(monkeypatch):
+    assert isinstance(get_backend("stub"), StubBackend)
+    monkeypatch.setenv("ALP_BACKEND", "stub")
+    assert isinstance(get_backend(), StubBackend)
+    with pytest.raises(ValueError):
+        get_backend("tpu")
+
+
+def test_stub_backend_reports_tokens_bytes_and_phases():
+    backend = StubBackend(token_latency=0.01, prefill_latency=0.005, load_latency=0,
+                          memory_footprint={'medium': 2 * 1024 * 1024})
+    model, tokenizer = backend.load('medium', "stub/medium")
+    assert backend.model_nbytes(model) == 2 * 1024 * 1024
+
+    prompt = "What is the capital of France?"
+    text, prefill, decode = backend.generate_timed(model, tokenizer, prompt)
+    assert text == backend.generate(model, tokenizer, prompt)
+    assert prefill >= 0.005 * backend.count_tokens(tokenizer, prompt)
+    assert decode >= 0.01 * backend.count_tokens(tokenizer, text)
+
+
+def test_mlx_backend_downloads_into_cache_dir(monkeypatch, tmp_path):
+    calls = {}
+
+    def snapshot_download(repo_id, cache_dir, allow_patterns):
+        calls["download"] = (repo_id, cache_dir)
+        return str(tmp_path / "snapshot")
+
+    monkeypatch.setitem(sys.modules, "mlx_lm", types.SimpleNamespace(load=lambda path: ("model", path)))
+    monkeypatch.setitem(sys.modules, "huggingface_hub", types.SimpleNamespace(snapshot_download=snapshot_download))
+    backend = MLXBackend()
+    assert backend.load('simple', "org/model", cache_dir=str(tmp_path)) == ("model", str(tmp_path / "snapshot"))
+    assert calls["download"] == ("org/model", str(tmp_path))
+    # Local checkpoints and calls without a cache directory are loaded as given.
+    assert backend.load('simple', str(tmp_path), cache_dir=str(tmp_path)) == ("model", str(tmp_path))
+    assert backend.load('simple', "org/model") == ("model", "org/model")
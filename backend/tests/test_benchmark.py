@@ -0,0 +1,107 @@
+"""
+Tests for the offline benchmark harness and the load generator (scripts/load_test.py).
+
+To run these tests, use the following command from the backend directory:
+python -m pytest tests/test_benchmark.py
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+import httpx
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+
+import load_test
+
+from src.benchmark import (RequestRecorder, build_workload, compare, load_workload, percentiles, save_workload,
+                           workload_digest)
+
+
+def test_workload_is_seeded_and_replays(tmp_path):
+    workload = build_workload(20, seed=3, arrival_rate=5.0)
+    assert workload_digest(workload) == workload_digest(build_workload(20, seed=3, arrival_rate=5.0))
+    assert workload_digest(workload) != workload_digest(build_workload(20, seed=4, arrival_rate=5.0))
+    arrivals = [request['arrival'] for request in workload]
+    assert arrivals == sorted(arrivals) and arrivals[0] > 0
+    assert all(request['label'] == 'complex' for request in build_workload(10, mix={'complex': 1.0}))
+
+    path = str(tmp_path / "workload.jsonl")
+    save_workload(path, workload)
+    assert load_workload(path) == workload
+
+    log = str(tmp_path / "requests.jsonl")
+    recorder = RequestRecorder(log)
+    recorder.record("Hi", model="full")
+    recorder.record("Prove it", policy="quality-first")
+    replayed = load_workload(log)
+    assert [request['id'] for request in replayed] == [0, 1]
+    assert replayed[0]['arrival'] == 0.0 and replayed[1]['arrival'] >= 0.0
+    assert replayed[1]['policy'] == "quality-first"
+
+
+def test_percentiles_and_compare():
+    stats = percentiles([i / 1000 for i in range(1, 101)])
+    assert stats["p50"] == 50.5 and stats["max"] == 100.0
+    assert round(stats["p99"], 2) == 99.01
+    assert percentiles([]) is None
+
+    def results(p50):
+        return {"meta": {"workloadSha256": "x"},
+                "scenarios": {"warm": {"latencyMs": {"p50": p50, "p95": None}}}}
+
+    rows = {row["metric"]: row for row in compare(results(100.0), results(80.0))}
+    assert rows["latencyMs.p50"]["changePercent"] == -20.0
+    assert rows["latencyMs.p95"]["changePercent"] is None
+
+
+def test_load_generator_counts_every_failure_and_keeps_the_schedule():
+    outcomes = iter(["ok", "not json", "429", "raise", "504", "transport"] * 10)
+
+    async def handler(request):
+        await asyncio.sleep(0.05)
+        outcome = next(outcomes)
+        if outcome == "raise":
+            raise ValueError("exception raised by the app")
+        if outcome == "transport":
+            raise httpx.ConnectError("connection refused", request=request)
+        if outcome == "not json":
+            return httpx.Response(200, text="<html>proxy error</html>")
+        if outcome in ("429", "504"):
+            return httpx.Response(int(outcome), json={"detail": outcome})
+        return httpx.Response(200, json={"model": "simple", "response": "4"})
+
+    args = argparse.Namespace(arrival="uniform", mix=None, model="full")
+
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://alp.test") as client:
+            start = time.perf_counter()
+            records = await load_test.open_loop_step(client, rate=30.0, duration=0.4, args=args, seed=0)
+            return records, time.perf_counter() - start
+
+    records, elapsed = asyncio.run(main())
+    arrivals = [request['arrival'] for request in build_workload(30, seed=0, arrival_rate=30.0, arrival="uniform")]
+    assert len(records) == sum(arrival < 0.4 for arrival in arrivals) == 12  # Two rounds of the six outcomes
+    # Open loop: every request is sent on schedule, without waiting for earlier ones.
+    assert elapsed < 0.4 + 0.05 * 3
+    assert all(record['latency'] >= 0.05 for record in records)
+
+    summary = load_test.summarize_step(records, elapsed=1.0, slo=0.1)
+    assert summary["requests"] == 12
+    assert summary["throughput"] == 2.0
+    assert summary["goodput"] == sum(record['latency'] <= 0.1 for record in records if record['status'] == 200)
+    assert summary["backpressureRate"] == summary["timeoutRate"] == 2 / 12
+    assert summary["errorRate"] == 6 / 12
+    assert summary["byTier"]["simple"]["requests"] == 2
+    assert any(sample.startswith("ValueError: exception raised by the app") for sample in summary["errorSamples"])
+    assert any(sample.startswith("ConnectError") for sample in summary["errorSamples"])
+
+    single = [{**summary, "load": 1}, {**summary, "load": 4, "throughput": 0.0}]
+    supervisor = [{**summary, "load": 1, "throughput": 3.0, "goodput": 1.5}, {**summary, "load": 4, "throughput": 1.0}]
+    comparison = load_test.compare_steps(single, supervisor)
+    assert comparison[0]["speedup"] == 1.5 and comparison[0]["goodput"]["supervisor"] == 1.5
+    assert comparison[1]["load"] == 4 and comparison[1]["speedup"] is None  # Nothing served by the single process
@@ -0,0 +1,140 @@
+"""
+Tests for the caching primitives.
+
+To run these tests, use the following command from the backend directory:
+python -m pytest tests/test_caching.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.caching import FeatureCache, LRUCache, prompt_key
+
+
+def test_prompt_key_ignores_case_whitespace_and_trailing_punctuation():
+    assert prompt_key("What is the capital of France?") == prompt_key("  what is the   capital of france ")
+    assert prompt_key("What is 2 + 2?") != prompt_key("What is 2 + 3?")
+    assert prompt_key("hello", "simple") != prompt_key("hello", "medium")
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (3, 1, 1)
+
+
+def test_lru_cache_expires_entries():
+    cache = LRUCache(maxsize=2, ttl=0.01)
+    cache.put("a", 1)
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert cache.get_stats()["expirations"] == 1
+
+
+def test_feature_cache_persists_rows_and_skips_torn_lines(tmp_path):
+    path = str(tmp_path / "features" / "features.jsonl")
+    cache = FeatureCache(path)
+    cache.put_many({cache.key("hello"): {"word_count": 1, "avg_word_length": 5.0}})
+    cache.put_many({cache.key("hello"): {"word_count": 99}})  # Existing rows are never rewritten
+    with open(path, "a") as f:
+        f.write('{"key": "torn", "feat')
+
+    reloaded = FeatureCache(path)
+    assert len(reloaded) == 1 and FeatureCache.key("hello") in reloaded
+    assert reloaded.get(FeatureCache.key("hello")) == {"word_count": 1.0, "avg_word_length": 5.0}
+    assert reloaded.get(FeatureCache.key("Hello")) is None
+
+
+def test_response_cache_tiers(tmp_path):
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from src.response_cache import ResponseCache
+
+    tfidf = TfidfVectorizer().fit(["what color is the sky", "how many days are in a week", "explain photosynthesis"])
+    cache = ResponseCache(vectorizer=tfidf.transform, disk_dir=str(tmp_path), similarity_threshold=0.9)
+    cache.put("What color is the sky?", 'simple', "Blue.")
+
+    assert cache.get("what color is the sky", 'simple') == ("Blue.", "memory")
+    assert cache.get("What color is the sky?", 'medium') is None
+    assert cache.get("The sky is what color?", 'simple') == ("Blue.", "semantic")
+    assert cache.get("How many days are in a week?", 'simple') is None
+
+    cache.memory.clear()
+    assert cache.get("What color is the sky?", 'simple') == ("Blue.", "disk")
+    assert cache.get_stats()["hits"] == {"memory": 1, "disk": 1, "semantic": 1}
+
+
+def test_response_cache_disk_failures_are_best_effort(tmp_path, monkeypatch):
+    from src.response_cache import ResponseCache
+
+    cache = ResponseCache(disk_dir=str(tmp_path), disk_max_entries=2)
+    cache.DISK_PRUNE_INTERVAL = 1
+    for i in range(3):
+        cache.put(f"prompt {i}", 'simple', f"response {i}")
+    assert len(os.listdir(tmp_path)) == 2
+
+    # A file pruned by another writer between listing and stat is skipped.
+    getmtime = os.path.getmtime
+
+    def vanishing_getmtime(path):
+        if path.endswith(f"{cache._key('prompt 1', 'simple', None)}.json"):
+            raise FileNotFoundError(path)
+        return getmtime(path)
+
+    monkeypatch.setattr(os.path, "getmtime", vanishing_getmtime)
+    cache.put("prompt 3", 'simple', "response 3")
+    monkeypatch.undo()
+    assert len(os.listdir(tmp_path)) == 3
+
+    # A failed write still caches the response in memory, and is counted instead of raised.
+    def failing_replace(src, dst):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(os, "replace", failing_replace)
+    cache.put("prompt 4", 'simple', "response 4")
+    assert cache.get("prompt 4", 'simple') == ("response 4", "memory")
+    assert cache.get_stats()["diskErrors"] == 1
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_response_cache_similarity_index_grows_in_chunks(monkeypatch):
+    from scipy import sparse
+    from src.response_cache import ResponseCache, SimilarityIndex
+
+    monkeypatch.setattr(SimilarityIndex, "CHUNK_ROWS", 4)
+    words = [f"word{i}" for i in range(20)]
+
+    def vectorize(texts):
+        # One-hot rows: a prompt is only similar to the prompts with the same first word.
+        return sparse.csr_matrix(([1.0], ([0], [words.index(texts[0].split()[0])])), shape=(1, len(words)))
+
+    seals, scored_unlocked = [], []
+    seal, candidates = SimilarityIndex.seal, SimilarityIndex.candidates
+    monkeypatch.setattr(SimilarityIndex, "seal", staticmethod(lambda chunk: seals.append(chunk.start) or seal(chunk)))
+    cache = ResponseCache(vectorizer=vectorize, max_entries=1, similarity_threshold=0.9, similarity_max_entries=10)
+    monkeypatch.setattr(SimilarityIndex, "candidates", staticmethod(
+        lambda *args: scored_unlocked.append(not cache._lock.locked()) or candidates(*args)))
+
+    for word in words[:14]:
+        cache.put(word, 'simple', word.upper())
+    index = cache._index['simple']
+    # Each full chunk was stacked once, and the first was dropped once its rows were all evicted.
+    assert seals == [0, 4, 8]
+    assert len(index) == 10 and [chunk.start for chunk in index.chunks] == [4, 8, 12]
+
+    assert cache.get("word13 please", 'simple') == ("WORD13", "semantic")  # In the chunk still filling
+    cache.put("word5", 'simple', "five")  # Replaces its row in a full chunk with one at the end
+    assert len(index) == 10 and cache.get("word5 please", 'simple') == ("five", "semantic")
+    assert cache.get("word9 please", 'simple') is None  # Only in the index: dropped from it
+    assert len(index) == 9
+    assert cache.get("word1 please", 'simple') is None  # Evicted from the index
+    assert scored_unlocked and all(scored_unlocked)
+    assert cache.get_stats()["similarityEntries"] == {"simple": 9}
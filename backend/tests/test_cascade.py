@@ -0,0 +1,55 @@
+"""
+Tests for cascade generation.
+
+To run these tests, use the following command from the backend directory:
+python -m pytest tests/test_cascade.py
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.backends import StubBackend
+from src.cascade import CascadeGenerator, heuristic_confidence, logprob_confidence
+
+
+def test_heuristic_confidence():
+    assert heuristic_confidence("") == 0.0
+    assert heuristic_confidence("I'm sorry, but I cannot help with that.") == 0.0
+    assert heuristic_confidence("Paris") == pytest.approx(1 / 3)
+    assert heuristic_confidence("the the the the the the the the") < 0.5
+    assert heuristic_confidence("The capital of France is Paris.") == 1.0
+    assert logprob_confidence([-0.5, -1.5]) == pytest.approx(0.3679, abs=1e-4)
+    assert logprob_confidence(None) is None
+
+
+def test_cascade_escalates_low_confidence_drafts():
+    cascade = CascadeGenerator(['simple', 'medium', 'complex'], threshold=0.5)
+    drafts = {
+        'simple': ("I don't know.", None),
+        'medium': ("The answer is forty two", [-2.0, -2.0]),
+        'complex': ("The answer is forty two", [-0.1]),
+    }
+    result = cascade.run(lambda tier: drafts[tier])
+    assert result['tiers'] == ['simple', 'medium', 'complex'] and result['tier'] == 'complex'
+
+    result = cascade.run(lambda tier: ("The answer is forty two", [-0.2]))
+    assert result['tier'] == 'simple' and not result['escalated']
+
+    stats = cascade.get_stats()
+    assert stats["escalationRate"] == 0.5
+    assert stats["escalations"] == {'simple->medium': 1, 'medium->complex': 1}
+    assert stats["acceptedByTier"] == {'simple': 1, 'medium': 0, 'complex': 1}
+
+
+def test_stub_logprobs_are_deterministic_and_tier_dependent():
+    backend = StubBackend(latency_scale=0, memory_footprint=0)
+    prompt = "Compare the economic policies of two countries"
+    (simple, _), (complex_, _) = backend.load('simple', ""), backend.load('complex', "")
+    text, logprobs = backend.generate_with_logprobs(simple, _, prompt)
+    assert len(logprobs) == len(text.split())
+    assert backend.generate_with_logprobs(simple, _, prompt)[1] == logprobs
+    assert logprob_confidence(logprobs) <= logprob_confidence(backend.generate_with_logprobs(complex_, _, prompt)[1])
@@ -0,0 +1,100 @@
+"""
+Tests for the serving config, its file watcher and the hot-reload hooks of the response cache and router.
+
+To run these tests, use the following command from the backend directory:
+python -m pytest tests/test_config.py
+"""
+
+import os
+import sys
+import json
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config import DEFAULT_TIERS, ConfigWatcher, ServingConfig
+from src.response_cache import ResponseCache
+from src.router import Router
+
+
+def write_config(path, classifier, **tiers):
+    definitions = {tier: dict(spec) for tier, spec in DEFAULT_TIERS.items()}
+    for tier, spec in tiers.items():
+        definitions[tier].update(spec)
+    with open(path, "w") as f:
+        json.dump({"classifier": classifier, "tiers": definitions}, f)
+
+
+def test_config_diff_and_validation(tmp_path):
+    classifier = tmp_path / "classifier.joblib"
+    classifier.write_bytes(b"v1")
+    path = tmp_path / "serving.json"
+    write_config(path, "classifier.joblib")
+    old = ServingConfig.from_file(str(path))
+    assert old.classifier == str(classifier)
+    assert old.diff(ServingConfig.from_file(str(path))) == {
+        "classifier": False, "reloadedTiers": [], "resizedTiers": [], "unchangedTiers": ["simple", "medium", "complex"]}
+
+    write_config(path, "classifier.joblib", medium={"path": "other/70B-8bit", "bits": 8}, complex={"size": 400})
+    classifier.write_bytes(b"v2, retrained")
+    changes = old.diff(ServingConfig.from_file(str(path)))
+    assert changes["classifier"] is True
+    assert changes["reloadedTiers"] == ["medium"]
+    assert changes["resizedTiers"] == ["complex"]
+    assert changes["unchangedTiers"] == ["simple"]
+
+    with pytest.raises(ValueError):
+        ServingConfig({"simple": DEFAULT_TIERS["simple"], "medium": DEFAULT_TIERS["medium"]})
+    with pytest.raises(ValueError):
+        ServingConfig({**DEFAULT_TIERS, "simple": {"path": "x", "size": 0, "bits": 4}})
+    write_config(path, "missing.joblib")
+    with pytest.raises(FileNotFoundError):
+        ServingConfig.from_file(str(path))
+
+
+def test_watcher_reloads_on_change_and_survives_errors(tmp_path):
+    path = tmp_path / "serving.json"
+    path.write_text("{}")
+    reloads = []
+
+    def reload():
+        reloads.append(path.read_text())
+        if path.read_text() == "broken":
+            raise ValueError("invalid config")
+
+    watcher = ConfigWatcher(lambda: [str(path), None], reload, interval=3600)
+    try:
+        assert watcher.check_once() is False
+        path.write_text('{"tiers": {}}')
+        assert watcher.check_once() is True
+        assert watcher.check_once() is False
+        path.write_text("broken")
+        assert watcher.check_once() is False  # Logged; not retried until the file changes again
+        assert watcher.check_once() is False
+        assert reloads == ['{"tiers": {}}', "broken"]
+    finally:
+        watcher.stop()
+
+
+def test_response_cache_revisions_and_router_update():
+    cache = ResponseCache()
+    cache.set_revision("medium", "70B@4bit")
+    cache.put("What is two plus two?", "medium", "four", revision="70B@4bit")
+    assert cache.get("What is two plus two?", "medium") == ("four", "memory")
+
+    cache.set_revision("medium", "70B@8bit")
+    assert cache.get("What is two plus two?", "medium") is None
+    # A request that started on the old weights must not fill the cache for the new ones.
+    cache.put("What is two plus two?", "medium", "stale", revision="70B@4bit")
+    assert cache.get("What is two plus two?", "medium") is None
+    cache.put("What is two plus two?", "medium", "4", revision="70B@8bit")
+    assert cache.get("What is two plus two?", "medium") == ("4", "memory")
+
+    router = Router(["simple", "medium", "complex"], {"simple": 8, "medium": 70, "complex": 405})
+    router.finished("medium", 30.0)
+    learned = router.latency["medium"]
+    router.update_tier("medium", 72)
+    assert router.model_sizes["medium"] == 72 and router.latency["medium"] == learned
+    router.update_tier("medium", 72, new_weights=True)
+    assert router.latency["medium"] < learned
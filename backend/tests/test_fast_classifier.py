@@ -0,0 +1,65 @@
+"""
+Tests for the fast-path classifier and its fallback in TaskClassifier.
+
+To run these tests, use the following command from the backend directory:
+python -m pytest tests/test_fast_classifier.py
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.fast_classifier import FastClassifier
+from src.task_classifier import TaskClassifier
+
+SIMPLE = ["What is 2 + 2?", "Hi there", "What color is the sky?", "Name a fruit", "How are you?", "What day is it?"]
+COMPLEX = [
+    "Analyze the long-term macroeconomic implications of quantitative easing on emerging market debt.",
+    "Discuss the philosophical implications of consciousness for artificial general intelligence research.",
+    "Derive the relativistic corrections to hydrogen spectral lines and compare them with experimental data.",
+    "Evaluate competing interpretations of quantum mechanics and their consequences for determinism.",
+    "Critically compare Keynesian and monetarist explanations of stagflation during the nineteen seventies.",
+    "Explain how transformer architectures scale with sequence length and propose memory-efficient alternatives.",
+]
+
+
+def train_fast() -> FastClassifier:
+    fast = FastClassifier(n_buckets=2 ** 12)
+    fast.train(SIMPLE + COMPLEX, ["simple"] * len(SIMPLE) + ["complex"] * len(COMPLEX))
+    return fast
+
+
+def test_fast_classifier_learns_and_round_trips(tmp_path):
+    fast = train_fast()
+    assert fast.classes == ["complex", "simple"]
+    assert fast.predict_with_confidence("What is 3 + 3?")[0] == "simple"
+    assert fast.predict_with_confidence(
+        "Analyze the geopolitical implications of semiconductor export controls on global supply chains.")[0] == "complex"
+    probabilities = fast.predict_proba("Hello")
+    assert abs(sum(probabilities.values()) - 1.0) < 1e-6
+
+    path = str(tmp_path / "fast.npz")
+    fast.save(path)
+    loaded = FastClassifier.load(path)
+    assert loaded.predict_proba("Hello") == probabilities
+
+
+def test_task_classifier_falls_back_below_threshold():
+    classifier = TaskClassifier(lazy=True)  # spaCy is never loaded unless the full path runs
+    full_calls = []
+
+    def classify(prompt):
+        full_calls.append(prompt)
+        return {"complex": 0.1, "medium": 0.8, "simple": 0.1}
+
+    classifier.classify = classify
+    classifier.set_fast_classifier(train_fast(), threshold=0.0)
+    assert classifier.classify_with_confidence("What is 2 + 2?")[0] == "simple"
+    assert full_calls == []
+
+    classifier.set_fast_classifier(classifier.fast_classifier, threshold=1.0)
+    assert classifier.classify_with_confidence("What is 2 + 2?") == ("medium", 0.8)
+    assert full_calls == ["What is 2 + 2?"]
+    stats = classifier.get_path_stats()
+    assert (stats["fast"], stats["full"], stats["threshold"]) == (1, 1, 1.0)
@@ -0,0 +1,43 @@
+"""
+Tests for the metric primitives and the Prometheus exposition.
+
+To run these tests, use the following command from the backend directory:
+python -m pytest tests/test_metrics.py
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.metrics import HistogramMap, PrometheusExposition
+
+
+def test_histogram_map_keys_and_merge():
+    latency = HistogramMap(buckets=(0.1, 1.0), keys=['simple'])
+    latency.observe('simple', 0.05)
+    latency.observe('complex', 0.5)
+    latency.observe('complex', 5.0)
+    assert set(latency.snapshot()) == {'simple', 'complex'}
+    merged = latency.merged()
+    assert merged.counts == [1, 1, 1]
+    assert merged.count == 3 and merged.sum == 5.55
+    assert latency.get_stats()["byKey"]["complex"]["count"] == 2
+
+
+def test_exposition_renders_cumulative_labeled_histograms():
+    latency = HistogramMap(buckets=(0.1, 1.0))
+    latency.observe('simple', 0.05)
+    latency.observe('simple', 0.5)
+    exposition = PrometheusExposition(namespace="alp")
+    exposition.histogram("latency_seconds", "Request latency.", latency.snapshot())
+    exposition.gauge("memory_budget_bytes", "Memory budget.", {(): 1024}, labels=())
+    exposition.counter("tokens_total", "Tokens.", {"prompt": 3}, labels=("kind",))
+    lines = exposition.render().splitlines()
+    assert lines[:2] == ["# HELP alp_latency_seconds Request latency.", "# TYPE alp_latency_seconds histogram"]
+    assert 'alp_latency_seconds_bucket{tier="simple",le="0.1"} 1' in lines
+    assert 'alp_latency_seconds_bucket{tier="simple",le="1.0"} 2' in lines
+    assert 'alp_latency_seconds_bucket{tier="simple",le="+Inf"} 2' in lines
+    assert 'alp_latency_seconds_count{tier="simple"} 2' in lines
+    assert "alp_memory_budget_bytes 1024" in lines
+    assert 'alp_tokens_total{kind="prompt"} 3' in lines
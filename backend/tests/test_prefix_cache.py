@@ -0,0 +1,59 @@
+"""
+Tests for the prompt-prefix KV cache.
+
+To run these tests, use the following command from the backend directory:
+python -m pytest tests/test_prefix_cache.py
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.backends import StubBackend
+from src.prefix_cache import PrefixCache
+
+
+def test_longest_shared_prefix_is_reused():
+    cache = PrefixCache(max_bytes=1000, block_size=4)
+    first = list(range(20))
+    assert cache.lookup(first) == (0, None)
+    cache.put(first[:cache.boundary(first)], "state-16", nbytes=10)
+
+    # Shares the first 9 tokens, so the first two blocks are reused from the longer state.
+    second = list(range(9)) + [99] * 10
+    assert cache.lookup(second) == (8, "state-16")
+    # A prompt that is exactly one block long leaves nothing cacheable.
+    assert cache.lookup(first[:4]) == (0, None)
+    assert cache.get_stats()["prefillTokensSaved"] == 8
+
+
+def test_eviction_keeps_the_cache_under_its_byte_budget():
+    cache = PrefixCache(max_bytes=25, block_size=2)
+    cache.put([1, 2, 3, 4], "a", nbytes=10)
+    cache.put([5, 6], "b", nbytes=10)
+    cache.lookup([1, 2, 3, 4, 0])  # Touch "a" so "b" is the oldest
+    cache.put([7, 8], "c", nbytes=10)
+    assert cache.used_bytes == 20
+    assert cache.lookup([5, 6, 0]) == (0, None)
+    assert cache.lookup([1, 2, 0]) == (2, "a")
+    assert not cache.put([9, 10], "too big", nbytes=26)
+
+
+def test_stub_decode_from_cached_prefix_matches_generate():
+    backend = StubBackend(latency_scale=0, memory_footprint=0)
+    model, tokenizer = backend.load('medium', "stub/medium")
+    cache = PrefixCache(max_bytes=1024 ** 3, block_size=4)
+    system = "You are a helpful assistant that answers questions about geography briefly and accurately ."
+    for question in ("What is the capital of France ?", "What is the longest river ?"):
+        prompt = f"{system} {question}"
+        ids = tokenizer.encode(prompt)
+        cached_tokens, state = cache.lookup(ids)
+        state = backend.truncate_state(state, cached_tokens) if state is not None else None
+        boundary = cache.boundary(ids)
+        state = backend.prefill(model, tokenizer, ids[cached_tokens:boundary], state)
+        assert state.ids == tuple(ids[:boundary])
+        cache.put(ids[:boundary], state, backend.state_nbytes(state))
+        assert backend.decode(model, tokenizer, prompt, state, ids[boundary:]) == backend.generate(model, tokenizer, prompt)
+    # Both questions also start with "What is the".
+    assert cache.get_stats()["prefillTokensSaved"] == (len(tokenizer.encode(system)) + 3) // 4 * 4
@@ -0,0 +1,135 @@
+"""
+Tests for the ModelRegistry and the thread-safe counters it relies on.
+
+To run these tests, use the following command from the backend directory:
+python -m pytest tests/test_registry.py
+"""
+
+import os
+import sys
+import time
+import threading
+import concurrent.futures
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.metrics import Counter, CounterMap
+from src.registry import ModelRegistry
+from src.residency import ModelResidencyManager
+
+
+def make_registry(memory_budget=100):
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+    return ModelRegistry(ModelResidencyManager(memory_budget=memory_budget), executor), executor
+
+
+def slow_loader(calls, tier, delay=0.05):
+    def load():
+        calls.append(tier)
+        time.sleep(delay)
+        return object(), object()
+    return load
+
+
+def test_concurrent_cold_requests_load_once():
+    registry, executor = make_registry()
+    calls = []
+    barrier = threading.Barrier(32)
+
+    def request():
+        barrier.wait()
+        return registry.load_async('medium', slow_loader(calls, 'medium'), nbytes=40).result(timeout=5)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=32) as pool:
+        results = list(pool.map(lambda _: request(), range(32)))
+
+    assert calls == ['medium']
+    assert all(result is results[0] for result in results)
+    assert registry.peek('medium') == results[0]
+    stats = registry.get_stats()
+    assert stats["loads"] == {'medium': 1}
+    assert stats["memoryReserved"] == 0 and stats["memoryUsed"] == 40
+    executor.shutdown()
+
+
+def test_contended_tiers_each_load_once():
+    registry, executor = make_registry()
+    calls = []
+    tiers = ['simple', 'medium', 'complex'] * 20
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(tiers)) as pool:
+        futures = [pool.submit(lambda tier=tier: registry.load_async(tier, slow_loader(calls, tier), nbytes=30).result(5))
+                   for tier in tiers]
+        results = [future.result() for future in futures]
+
+    assert sorted(calls) == ['complex', 'medium', 'simple']
+    for tier in ('simple', 'medium', 'complex'):
+        assert all(result == registry.peek(tier) for result, t in zip(results, tiers) if t == tier)
+    assert registry.get_stats()["memoryUsed"] == 90
+    executor.shutdown()
+
+
+def test_failed_load_releases_reservation():
+    registry, executor = make_registry()
+
+    def broken_loader():
+        time.sleep(0.01)
+        raise RuntimeError("weights missing")
+
+    future = registry.load_async('complex', broken_loader, nbytes=80)
+    with pytest.raises(RuntimeError):
+        future.result(timeout=5)
+    assert 'complex' not in registry
+    assert not registry.is_loading('complex')
+    assert registry.get_stats()["memoryUsed"] == 0
+
+    # A tier larger than the budget fails through the future without starting a load.
+    with pytest.raises(MemoryError):
+        registry.load_async('complex', broken_loader, nbytes=200).result(timeout=5)
+    executor.shutdown()
+
+
+def test_counters_are_exact_under_contention():
+    counter = Counter()
+    counter_map = CounterMap(("full", "8bit", "4bit"))
+
+    def work():
+        for i in range(1000):
+            counter.inc()
+            counter_map.inc(("full", "8bit", "4bit")[i % 3])
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert counter.value == 8000
+    assert sum(counter_map.snapshot().values()) == 8000
+
+
+def test_proxy_pins_the_tier_a_request_generates_with(monkeypatch):
+    from src.adaptive_llama_mlx import AdaptiveLlamaProxy
+    from src.backends import StubBackend
+
+    monkeypatch.delenv("ALP_CONFIG", raising=False)
+    backend = StubBackend(latency_scale=0, memory_footprint={'simple': 40, 'medium': 40, 'complex': 50})
+    proxy = AdaptiveLlamaProxy(backend=backend, memory_budget=100, fast_startup=True, prefetch=False,
+                               config_watch=False)
+    try:
+        stream = proxy.adaptive_generate_stream("Name a fruit.", task_complexity="simple")
+        assert "token" in next(stream)
+        proxy.load_model('medium')
+        # Making room for the complex tier evicts medium: simple is still generating.
+        proxy.load_model('complex')
+        assert proxy.get_loaded_models() == ['simple', 'complex']
+
+        proxy.unload_model('simple')
+        assert proxy.registry.get_stats()["memoryUsed"] == 90
+        events = list(stream)
+        assert events[-1]["metrics"]["model_used"] == "simple"
+        assert proxy.registry.get_stats()["memoryUsed"] == 50
+    finally:
+        proxy.close()
@@ -0,0 +1,83 @@
+"""
+Tests for the ModelResidencyManager.
+
+To run these tests, use the following command from the backend directory:
+python -m pytest tests/test_residency.py
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.residency import ModelResidencyManager
+
+
+def test_hits_and_misses_are_counted():
+    residency = ModelResidencyManager(memory_budget=100)
+    assert residency.get('simple') is None
+    residency.add('simple', "model", "tokenizer", nbytes=10, load_time=1.0)
+    assert residency.get('simple') == ("model", "tokenizer")
+    stats = residency.get_stats()
+    assert (stats["hits"], stats["misses"], stats["memoryUsed"]) == (1, 1, 10)
+
+
+def test_reserve_evicts_cheapest_tier_first():
+    released = []
+    residency = ModelResidencyManager(memory_budget=100, on_evict=lambda tier, model, tokenizer: released.append(tier))
+    residency.add('simple', "s", "t", nbytes=40, load_time=1.0)
+    residency.add('medium', "m", "t", nbytes=40, load_time=30.0)
+    for _ in range(5):
+        residency.get('simple')
+
+    # 'medium' is used less but is far more expensive to reload, so it survives.
+    assert residency.reserve('complex', 50) == ['simple']
+    assert released == ['simple']
+    assert 'medium' in residency
+    # The reservation counts against the budget until the tier is added.
+    assert residency.used_memory == 90
+    residency.add('complex', "c", "t", nbytes=50, load_time=60.0)
+    assert residency.get_stats()["memoryReserved"] == 0
+    assert residency.get_stats()["evictions"] == 1
+
+
+def test_reserve_without_eviction_fails_when_full():
+    residency = ModelResidencyManager(memory_budget=100)
+    residency.add('simple', "s", "t", nbytes=60, load_time=1.0)
+    with pytest.raises(MemoryError):
+        residency.reserve('medium', 50, evict=False)
+    assert 'simple' in residency and not residency.reserved
+
+
+def test_reserve_rejects_tiers_larger_than_budget():
+    residency = ModelResidencyManager(memory_budget=100)
+    residency.add('simple', "s", "t", nbytes=40, load_time=1.0)
+    with pytest.raises(MemoryError):
+        residency.reserve('complex', 200)
+    assert 'simple' in residency
+
+
+def test_pinned_tiers_are_not_evicted_and_removal_waits_for_release():
+    released = []
+    residency = ModelResidencyManager(memory_budget=100, on_evict=lambda tier, model, tokenizer: released.append(tier))
+    residency.add('simple', "s", "t", nbytes=40, load_time=1.0)
+    residency.add('medium', "m", "t", nbytes=40, load_time=30.0)
+    entry = residency.acquire('simple')
+    assert entry.model == "s" and residency.acquire('complex') is None
+
+    # 'simple' is the cheaper victim, but a request is generating with it.
+    assert residency.reserve('complex', 50) == ['medium']
+    residency.cancel_reservation('complex')
+    with pytest.raises(MemoryError):
+        residency.reserve('complex', 70)
+    assert 'simple' in residency
+
+    # An explicit removal keeps the bytes counted until the last request releases the model.
+    residency.remove('simple')
+    assert 'simple' not in residency and released == ['medium']
+    assert residency.used_memory == 40 and residency.get_stats()["draining"] == ['simple']
+    residency.release(entry)
+    assert released == ['medium', 'simple'] and entry.released.is_set()
+    assert residency.used_memory == 0
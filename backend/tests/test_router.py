@@ -0,0 +1,58 @@
+"""
+Tests for the latency/cost-aware Router.
+
+To run these tests, use the following command from the backend directory:
+python -m pytest tests/test_router.py
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.router import Router
+
+TIERS = ['simple', 'medium', 'complex']
+SIZES = {'simple': 8, 'medium': 70, 'complex': 405}
+
+
+def test_adequacy_is_cumulative_over_tiers():
+    router = Router(TIERS, SIZES)
+    adequacy = router.adequacy({'simple': 0.6, 'medium': 0.3, 'complex': 0.1})
+    assert adequacy['simple'] == pytest.approx(0.6)
+    assert adequacy['medium'] == pytest.approx(0.9)
+    assert adequacy['complex'] == 1.0
+
+
+def test_quality_first_never_routes_below_the_classifier():
+    router = Router(TIERS, SIZES, policy="quality-first")
+    probabilities = {'simple': 0.2, 'medium': 0.7, 'complex': 0.1}
+    assert router.choose(probabilities, resident=TIERS) == 'medium'
+    # A cold medium tier is slower than the resident complex tier, so quality-first moves up, never down.
+    router.latency['complex'] = 0.5
+    assert router.choose(probabilities, resident=['simple', 'complex']) == 'complex'
+
+
+def test_latency_slo_prefers_the_best_tier_within_the_slo():
+    router = Router(TIERS, SIZES, policy="latency-slo", quality_floor=0.8, latency_slo=2.0)
+    probabilities = {'simple': 0.85, 'medium': 0.1, 'complex': 0.05}
+    assert router.choose(probabilities, resident=TIERS) == 'medium'
+    # Queued requests on medium push it past the SLO.
+    for _ in range(3):
+        router.started('medium')
+    assert router.choose(probabilities, resident=TIERS) == 'simple'
+    # A low-confidence prompt does not meet the floor on the simple tier.
+    assert router.choose({'simple': 0.5, 'medium': 0.4, 'complex': 0.1}, resident=TIERS) == 'medium'
+
+
+def test_memory_saver_and_latency_tracking():
+    router = Router(TIERS, SIZES)
+    assert router.choose({'simple': 0.9, 'medium': 0.1}, policy="memory-saver", resident=['complex']) == 'simple'
+    router.started('simple')
+    router.finished('simple', latency=1.16)
+    assert router.latency['simple'] == pytest.approx(0.16 + 0.2 * 1.0)
+    assert router.get_stats()["decisions"]["memory-saver"]["simple"] == 1
+    with pytest.raises(ValueError):
+        router.choose({'simple': 1.0}, policy="cheapest")
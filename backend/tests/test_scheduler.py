@@ -0,0 +1,49 @@
+"""
+Tests for the per-tier BatchScheduler.
+
+To run these tests, use the following command from the backend directory:
+python -m pytest tests/test_scheduler.py
+"""
+
+import os
+import sys
+import concurrent.futures
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.backends import StubBackend
+from src.scheduler import BatchScheduler
+
+
+def test_concurrent_requests_are_batched_with_unchanged_outputs():
+    backend = StubBackend(token_latency=0.001, prefill_latency=0, load_latency=0)
+    model, tokenizer = backend.load('simple', "stub/simple")
+    scheduler = BatchScheduler(backend, 'simple', max_batch_size=4, max_wait=0.05)
+    prompts = [f"Question number {i}" for i in range(8)]
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as pool:
+            futures = list(pool.map(lambda prompt: scheduler.submit(prompt, model, tokenizer), prompts))
+            responses = [future.result(timeout=5) for future in futures]
+    finally:
+        scheduler.stop()
+
+    assert responses == [backend.generate(model, tokenizer, prompt) for prompt in prompts]
+    stats = scheduler.get_stats()
+    assert stats["requests"] == 8
+    assert stats["batches"] < 8
+    assert stats["queueWait"]["count"] == 8
+
+
+def test_requests_for_different_models_are_not_mixed():
+    backend = StubBackend(latency_scale=0)
+    simple = backend.load('simple', "stub/simple")
+    medium = backend.load('medium', "stub/medium")
+    scheduler = BatchScheduler(backend, 'simple', max_batch_size=8, max_wait=0.05)
+    try:
+        first = scheduler.submit("Hello there", *simple)
+        second = scheduler.submit("Hello there", *medium)
+        assert first.result(timeout=5) == backend.generate(*simple, "Hello there")
+        assert second.result(timeout=5) == backend.generate(*medium, "Hello there")
+    finally:
+        scheduler.stop()
+    assert scheduler.get_stats()["batches"] == 2
@@ -0,0 +1,99 @@
+"""
+Tests for the per-tier admission control in front of the proxy: backpressure, timeouts and the release
+of concurrency slots.
+
+To run these tests, use the following command from the backend directory:
+python -m pytest tests/test_serving.py
+"""
+
+import os
+import sys
+import time
+import asyncio
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.backends import StubBackend
+from src.serving import QueueFullError, RequestTimeoutError, TierAdmissionController, parse_tier_setting
+
+PROMPT = "Explain the concept of supply and demand in economics"
+
+
+@pytest.fixture
+def generate():
+    """Blocking generation on a stub tier that takes at least 0.16s (8 tokens or more at 20ms each)."""
+    backend = StubBackend(token_latency=0.02, prefill_latency=0, load_latency=0, memory_footprint=0)
+    models = {tier: backend.load(tier, f"stub/{tier}") for tier in ('simple', 'medium')}
+    return lambda tier, prompt=PROMPT: backend.generate(*models[tier], prompt)
+
+
+async def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        await asyncio.sleep(0.005)
+
+
+def test_parse_tier_setting():
+    assert parse_tier_setting(None, default=2) == {'simple': 2, 'medium': 2, 'complex': 2}
+    assert parse_tier_setting("3", default=2) == {'simple': 3, 'medium': 3, 'complex': 3}
+    assert parse_tier_setting("simple=4,complex=1", default=2) == {'simple': 4, 'medium': 2, 'complex': 1}
+    assert parse_tier_setting({'medium': 5}, default=2) == {'simple': 2, 'medium': 5, 'complex': 2}
+
+
+def test_full_queue_rejects_without_affecting_other_tiers(generate):
+    admission = TierAdmissionController(max_workers=4, tier_concurrency=1, max_queue=1, request_timeout=30)
+
+    async def main():
+        running = asyncio.create_task(admission.run('simple', generate, 'simple'))
+        await wait_until(lambda: admission.active['simple'] == 1)
+        queued = asyncio.create_task(admission.run('simple', generate, 'simple'))
+        await wait_until(lambda: admission.waiting['simple'] == 1)
+        with pytest.raises(QueueFullError):
+            await admission.run('simple', generate, 'simple')
+
+        # The medium tier has its own slots and queue.
+        assert await admission.run('medium', generate, 'medium') == generate('medium')
+        assert admission.active['simple'] == 1
+        assert await running == await queued == generate('simple')
+
+    try:
+        asyncio.run(main())
+        stats = admission.get_stats()
+        assert stats["rejected"] == {'simple': 1, 'medium': 0, 'complex': 0}
+        assert stats["active"] == stats["waiting"] == {'simple': 0, 'medium': 0, 'complex': 0}
+    finally:
+        admission.shutdown()
+
+
+def test_timeouts_and_failures_release_slots(generate):
+    admission = TierAdmissionController(max_workers=4, tier_concurrency=1, max_queue=4, request_timeout=30)
+
+    def fail():
+        time.sleep(0.01)
+        raise ValueError("backend failure")
+
+    async def main():
+        # Timed out while running: the slot is held until the worker thread finishes.
+        with pytest.raises(RequestTimeoutError):
+            await admission.run('simple', generate, 'simple', timeout=0.05)
+        assert admission.active['simple'] == 1
+        # Timed out while waiting for that slot.
+        with pytest.raises(RequestTimeoutError):
+            await admission.run('simple', generate, 'simple', timeout=0.01)
+        assert admission.waiting['simple'] == 0
+        await wait_until(lambda: admission.active['simple'] == 0)
+
+        with pytest.raises(ValueError):
+            await admission.run('simple', fail)
+        assert admission.active['simple'] == 0
+        # The slot is free again: a request that fits in its timeout runs right away.
+        assert await admission.run('simple', generate, 'simple', timeout=5) == generate('simple')
+
+    try:
+        asyncio.run(main())
+        assert admission.get_stats()["timeouts"]['simple'] == 2
+    finally:
+        admission.shutdown()
@@ -0,0 +1,78 @@
+"""
+Tests for speculative decoding.
+
+To run these tests, use the following command from the backend directory:
+python -m pytest tests/test_speculative.py
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.backends import StubBackend
+from src.speculative import SpeculativeDecoder
+
+PROMPTS = [
+    "What is the capital of France?",
+    "Explain the concept of supply and demand in economics",
+    "Discuss the philosophical implications of artificial intelligence",
+]
+
+
+@pytest.fixture
+def backend():
+    return StubBackend(latency_scale=0, memory_footprint=0)
+
+
+@pytest.mark.parametrize("draft_length", [1, 4, 7])
+def test_speculative_output_matches_target_greedy_decoding(backend, draft_length):
+    draft = backend.load('simple', "stub/simple")
+    decoder = SpeculativeDecoder(backend, draft_length=draft_length)
+    for tier in ('medium', 'complex'):
+        target = backend.load(tier, f"stub/{tier}")
+        for prompt in PROMPTS:
+            assert decoder.generate(*target, *draft, prompt, tier=tier) == backend.generate(*target, prompt)
+            assert (decoder.generate(*target, *draft, prompt, max_tokens=5, tier=tier)
+                    == backend.generate(*target, prompt, max_tokens=5))
+
+
+def test_speculative_acceptance_metrics(backend):
+    draft = backend.load('simple', "stub/simple")
+    target = backend.load('medium', "stub/medium")
+    decoder = SpeculativeDecoder(backend, draft_length=4)
+    for prompt in PROMPTS:
+        decoder.generate(*target, *draft, prompt, tier='medium')
+    stats = decoder.get_stats()
+    assert stats["requests"] == {'medium': 3}
+    # The stub tiers agree on most tokens, so steps produce more than one token on average.
+    assert 0.3 < stats["acceptanceRate"] < 1.0
+    assert stats["tokensPerStep"] > 1.5
+    with pytest.raises(ValueError):
+        SpeculativeDecoder(backend, draft_length=0)
+
+
+def test_each_step_only_runs_the_new_tokens(backend, monkeypatch):
+    states = []
+    make_state = backend.speculative_state
+    monkeypatch.setattr(backend, "speculative_state", lambda *model: states.append(make_state(*model)) or states[-1])
+    draft = backend.load('simple', "stub/simple")
+    target = backend.load('complex', "stub/complex")
+    decoder = SpeculativeDecoder(backend, draft_length=4)
+    prompt = " ".join(["Summarize the following report on regional water supply and demand."] * 20)
+    prompt_tokens = len(draft[1].encode(prompt))
+
+    text = decoder.generate(*target, *draft, prompt, max_tokens=60, tier='complex')
+    assert text == backend.generate(*target, prompt, max_tokens=60)
+    steps = decoder.get_stats()["steps"]['complex']
+    draft_state, target_state = states
+    # The prompt is run through each model once; afterwards a step only adds the bonus token and the
+    # draft, instead of re-running the whole prefix (which would be at least steps * prompt_tokens).
+    assert steps > 5
+    assert draft_state.fed <= prompt_tokens + steps * (decoder.draft_length + 1)
+    assert target_state.fed <= prompt_tokens + steps * (decoder.draft_length + 1)
+    # The caches end up trimmed to the accepted tokens plus the last step's draft.
+    generated = backend.completion_ids(target[0], target[1], prompt, 60)
+    assert target_state.tokens[:prompt_tokens + len(generated) - 1] == draft[1].encode(prompt) + generated[:-1]
@@ -0,0 +1,144 @@
+"""
+Tests for multi-process serving: shared-memory slots, tier workers and their restart after a crash.
+
+To run these tests, use the following command from the backend directory:
+python -m pytest tests/test_supervisor.py
+"""
+
+import os
+import sys
+import time
+import signal
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.supervisor import SharedSlots, Supervisor
+
+
+def test_shared_slots_round_trip():
+    owner = SharedSlots(2, 16)
+    try:
+        attached = SharedSlots(2, 16, name=owner.name)
+        slots = [owner.acquire(), owner.acquire()]
+        assert sorted(slots) == [0, 1] and owner.acquire() == -1
+        assert owner.write(slots[0], "héllo") == len("héllo".encode("utf-8"))
+        assert attached.read(slots[0], 6) == "héllo"
+        assert owner.write(slots[0], "lo!", offset=6) == 3 and attached.read(slots[0], 9) == "héllolo!"
+        assert owner.write(slots[0], "x", offset=16) == -1
+        assert attached.write(slots[1], "x" * 17) == -1  # Too large: sent through the pipe instead
+        owner.release(slots[0])
+        assert owner.acquire() == slots[0]
+        attached.shm.close()
+    finally:
+        owner.close()
+
+
+@pytest.fixture
+def make_supervisor(monkeypatch):
+    monkeypatch.setenv("ALP_BACKEND", "stub")
+    monkeypatch.setenv("ALP_STUB_LATENCY_SCALE", "0")
+    monkeypatch.delenv("ALP_CONFIG", raising=False)
+    supervisors = []
+
+    def make(**kwargs):
+        supervisors.append(Supervisor(**{"classifier_workers": 0, "tiers": ["simple", "medium"], "slot_size": 1024,
+                                         "tier_concurrency": {"simple": 2, "medium": 1}, "start_timeout": 120,
+                                         **kwargs}))
+        return supervisors[-1]
+
+    yield make
+    for supervisor in supervisors:
+        supervisor.close()
+
+
+@pytest.fixture
+def supervisor(make_supervisor):
+    return make_supervisor()
+
+
+def wait_for(condition, timeout=120):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+
+
+def test_tier_workers_serve_and_restart_after_crash(supervisor):
+    assert supervisor.get_loaded_models() == ["simple", "medium"]
+    result = supervisor.adaptive_generate("What is two plus two?", task_complexity="simple")
+    assert result["model_used"] == "simple" and result["response"]
+    # Larger than a slot, so the prompt and response go through the pipe.
+    assert supervisor.adaptive_generate("two " * 1000, task_complexity="simple")["response"]
+    # No complex worker: served by the nearest tier that has one.
+    assert supervisor.adaptive_generate("Prove it.", task_complexity="complex")["fallback_from"] == "complex"
+    events = list(supervisor.adaptive_generate_stream("Name a fruit.", task_complexity="medium"))
+    assert events[-1]["metrics"]["model_used"] == "medium"
+    assert "".join(event["token"] for event in events[:-1])
+
+    os.kill(supervisor.tier_workers["medium"].process.pid, signal.SIGKILL)
+    deadline = time.monotonic() + 120
+    while supervisor.get_metrics()["workers"]["medium"]["crashes"] == 0 or not supervisor.tier_workers["medium"].ready:
+        # The simple worker and the front keep serving while the medium worker restarts.
+        assert "error" not in supervisor.adaptive_generate("Hi", task_complexity="simple")
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    assert supervisor.adaptive_generate("Hi again", task_complexity="medium")["model_used"] == "medium"
+    metrics = supervisor.get_metrics()
+    assert metrics["workers"]["medium"]["starts"] == 2
+    assert metrics["modelUsage"]["simple"] >= 3
+
+
+def test_hung_worker_is_reaped_without_blocking_dispatch(supervisor):
+    handle = supervisor.tier_workers["medium"]
+    hung = handle.process
+    os.kill(hung.pid, signal.SIGSTOP)  # Alive and ignoring even SIGTERM, as if its pipe broke while it hung
+    start = time.monotonic()
+    supervisor._crashed(handle)
+    assert time.monotonic() - start < 0.5  # The reaper waits for the process, not the caller
+    assert "error" not in supervisor.adaptive_generate("Hi", task_complexity="simple")
+    deadline = time.monotonic() + 120
+    while not handle.ready or handle.process is hung:
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    hung.join(timeout=10)
+    assert hung.exitcode == -signal.SIGKILL
+    assert supervisor.adaptive_generate("Hi again", task_complexity="medium")["model_used"] == "medium"
+
+
+def test_requests_on_a_wedged_worker_time_out_and_it_is_restarted(make_supervisor):
+    supervisor = make_supervisor(request_timeout=1, cancel_grace=1)
+    handle = supervisor.tier_workers["medium"]
+    wedged = handle.process
+    os.kill(wedged.pid, signal.SIGSTOP)  # Alive, its pipe open, but never answering
+    start = time.monotonic()
+    result = supervisor.adaptive_generate("Hi", task_complexity="medium")
+    assert "timed out" in result["error"] and time.monotonic() - start < 5
+    # Its slot stays in use while the worker might still write to it...
+    assert len(handle.pending) == 0 and len(handle.cancelled) == 1
+    events = list(supervisor.adaptive_generate_stream("Hi", task_complexity="medium"))
+    assert "timed out" in events[-1]["error"]
+    # ...until the worker, which never stops the cancelled requests, is restarted.
+    wait_for(lambda: handle.ready and handle.process is not wedged)
+    assert not handle.cancelled and len(handle.slots._free) == handle.slots.slots
+    assert supervisor.adaptive_generate("Hi again", task_complexity="medium")["model_used"] == "medium"
+
+
+def test_closed_stream_is_cancelled_on_the_worker(make_supervisor, monkeypatch):
+    monkeypatch.setenv("ALP_STUB_LATENCY_SCALE", "10")  # 20ms per token
+    supervisor = make_supervisor(tiers=["simple"], cancel_grace=60)
+    handle = supervisor.tier_workers["simple"]
+    read = handle.slots.read
+    slot_reads = []
+    monkeypatch.setattr(handle.slots, "read", lambda *args: slot_reads.append(args) or read(*args))
+
+    stream = supervisor.adaptive_generate_stream("Tell me a long story.", task_complexity="simple")
+    tokens = [next(stream)["token"] for _ in range(3)]
+    assert "".join(tokens) and len(slot_reads) == 3  # Streamed through the request's slot
+    stream.close()
+    assert len(handle.pending) == 0 and len(handle.cancelled) == 1
+    # The worker stops at its next token and frees the slot, well before the grace period.
+    wait_for(lambda: not handle.cancelled, timeout=10)
+    assert len(handle.slots._free) == handle.slots.slots
+    assert handle.process is not None and handle.starts == 1
@@ -0,0 +1,102 @@
+"""
+Tests for the TaskClassifier's batched classification and its startup-optimized modes.
+
+Most tests do not need the en_core_web_sm model: a blank spaCy pipeline with a rule-based sentencizer
+stands in for it, and the classifier is the trained artifact in data/. The lightweight-mode test compares
+the real pipelines and is skipped without the model.
+
+To run these tests, use the following command from the backend directory:
+python -m pytest tests/test_task_classifier.py
+"""
+
+import os
+import sys
+import json
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.task_classifier import TaskClassifier
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+ARTIFACT_PATH = os.path.join(DATA_DIR, 'task_classifier.alp')
+PROMPTS = [
+    "What is the capital of France?",
+    "Explain the concept of supply and demand in economics. Give two examples.",
+    "Discuss the philosophical implications of artificial intelligence on society.",
+    "Hi",
+]
+
+
+def blank_nlp():
+    spacy = pytest.importorskip("spacy")
+    nlp = spacy.blank("en")
+    nlp.add_pipe("sentencizer")
+    return nlp
+
+
+@pytest.fixture
+def classifier():
+    classifier = TaskClassifier(lazy=True)
+    classifier._nlp = blank_nlp()
+    classifier.load_model(ARTIFACT_PATH)
+    return classifier
+
+
+def test_classify_many_matches_classify(classifier):
+    assert classifier.classify_many([]) == []
+    prompts = PROMPTS + [PROMPTS[1], PROMPTS[0]]  # Duplicates within the batch
+    batched = classifier.classify_many(prompts, batch_size=2)
+    assert len(batched) == len(prompts)
+    for prompt, probabilities in zip(prompts, batched):
+        expected = classifier.classify(prompt)
+        assert probabilities.keys() == expected.keys()
+        assert probabilities == pytest.approx(expected)
+    assert batched[-1] == pytest.approx(batched[0]) and batched[-2] == pytest.approx(batched[1])
+
+
+def test_lazy_mode_defers_spacy_and_the_artifact_to_the_first_classification(monkeypatch):
+    loads = []
+
+    def load_nlp(self):
+        loads.append(self)
+        self._nlp = blank_nlp()
+
+    monkeypatch.setattr(TaskClassifier, "_load_nlp", load_nlp)
+    classifier = TaskClassifier(lightweight=True, lazy=True)
+    classifier.load_model(ARTIFACT_PATH)
+    assert loads == [] and classifier.pipeline is None
+    assert "artifactLoad" not in classifier.get_startup_metrics()
+
+    first = classifier.classify(PROMPTS[0])
+    assert loads == [classifier] and classifier.pipeline is not None
+    assert classifier.classify(PROMPTS[0]) == first and len(loads) == 1
+    metrics = classifier.get_startup_metrics()
+    assert metrics["coldStart"] >= metrics["artifactLoad"] > 0
+
+    # Eager mode loads spaCy in the constructor.
+    TaskClassifier(lightweight=True)
+    assert len(loads) == 2
+
+
+def test_lightweight_features_agree_with_the_full_pipeline():
+    spacy = pytest.importorskip("spacy")
+    if not spacy.util.is_package("en_core_web_sm"):
+        pytest.skip("en_core_web_sm is not installed")
+    with open(os.path.join(DATA_DIR, 'task_classification_data.json')) as f:
+        prompts = [prompt for prompts in json.load(f).values() for prompt in prompts]
+    full, lightweight = TaskClassifier(), TaskClassifier(lightweight=True)
+    for classifier in (full, lightweight):
+        classifier.load_model(ARTIFACT_PATH)
+    assert "parser" not in lightweight.nlp.pipe_names
+
+    # Only the sentence features come from a different component.
+    sentence_features = {'sentence_count', 'avg_sentence_length'}
+    for expected, actual in zip(full.extract_features_many(prompts), lightweight.extract_features_many(prompts)):
+        assert {name: value for name, value in expected.items() if name not in sentence_features} == \
+            {name: value for name, value in actual.items() if name not in sentence_features}
+
+    predictions = [(max(a, key=a.get), max(b, key=b.get))
+                   for a, b in zip(full.classify_many(prompts), lightweight.classify_many(prompts))]
+    assert sum(a == b for a, b in predictions) / len(predictions) >= 0.95
@@ -0,0 +1,66 @@
+"""
+Tests for the tracing layer.
+
+To run these tests, use the following command from the backend directory:
+python -m pytest tests/test_tracing.py
+"""
+
+import os
+import sys
+import json
+import contextvars
+import concurrent.futures
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.tracing import FileExporter, NOOP_SPAN, Tracer
+
+
+def read_spans(path):
+    with open(path) as f:
+        return [span for line in f for span in json.loads(line)["resourceSpans"][0]["scopeSpans"][0]["spans"]]
+
+
+def test_nested_spans_are_exported_as_otlp_json_across_threads(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    tracer = Tracer(sample_rate=1.0, exporter=FileExporter(str(path)))
+
+    def classify():
+        with tracer.span("classify", prompts=1):
+            pass
+
+    with tracer.span("adaptive_generate") as root:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as pool:
+            pool.submit(contextvars.copy_context().run, classify).result()
+        with pytest.raises(RuntimeError):
+            with tracer.span("load_model", tier="simple"):
+                raise RuntimeError("out of memory")
+        root.set_attribute("tier", "simple")
+    tracer.close()
+
+    spans = {span["name"]: span for span in read_spans(path)}
+    assert set(spans) == {"adaptive_generate", "classify", "load_model"}
+    root = spans["adaptive_generate"]
+    assert "parentSpanId" not in root and root["attributes"] == [{"key": "tier", "value": {"stringValue": "simple"}}]
+    assert spans["classify"]["parentSpanId"] == root["spanId"]
+    assert spans["classify"]["traceId"] == root["traceId"]
+    assert spans["classify"]["attributes"] == [{"key": "prompts", "value": {"intValue": "1"}}]
+    assert spans["load_model"]["status"] == {"code": 2, "message": "RuntimeError: out of memory"}
+    assert int(root["endTimeUnixNano"]) >= int(spans["load_model"]["endTimeUnixNano"])
+
+
+def test_unsampled_traces_record_nothing(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    assert not Tracer().enabled
+    with Tracer().span("adaptive_generate") as span:
+        assert span is NOOP_SPAN
+
+    tracer = Tracer(sample_rate=0.0, exporter=FileExporter(str(path)))
+    with tracer.span("adaptive_generate"):
+        with tracer.span("generate") as child:
+            assert child is NOOP_SPAN
+    assert not path.exists()
+    with pytest.raises(ValueError):
+        Tracer(sample_rate=2.0)
@@ -2,20 +2,22 @@
 
 import React, { useState } from 'react';
 import { useAppContext } from '../context/AppContext';
-import { sendPrompt, ApiResponse } from '../lib/api';
+import { sendPrompt, ApiResponse, ModelTier } from '../lib/api';
 
-interface ComparisonResult {
-  full: ApiResponse | null;
-  '8bit': ApiResponse | null;
-  '4bit': ApiResponse | null;
-}
+type ComparisonResult = Record<ModelTier, ApiResponse | null>;
+
+const TIER_LABELS: Record<ModelTier, string> = {
+  complex: 'Complex (405B)',
+  medium: 'Medium (70B)',
+  simple: 'Simple (8B)',
+};
 
 const ComparisonMode: React.FC = () => {
   const { isComparisonMode, setIsComparisonMode, input } = useAppContext();
   const [comparisonResults, setComparisonResults] = useState<ComparisonResult>({
-    full: null,
-    '8bit': null,
-    '4bit': null,
+    complex: null,
+    medium: null,
+    simple: null,
   });
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
@@ -25,7 +27,7 @@ const ComparisonMode: React.FC = () => {
     if (!isComparisonMode) {
       runComparison();
     } else {
-      setComparisonResults({ full: null, '8bit': null, '4bit': null });
+      setComparisonResults({ complex: null, medium: null, simple: null });
       setError(null); // Clear any previous errors when disabling comparison mode
     }
   };
@@ -39,29 +41,29 @@ const ComparisonMode: React.FC = () => {
     setIsLoading(true);
     setError(null);
     try {
-      const [fullModelResponse, eightBitResponse, fourBitResponse] = await Promise.all([
-        sendPrompt(input, 'full').catch(e => {
-          console.error('Error with full model:', e);
+      const [complexResponse, mediumResponse, simpleResponse] = await Promise.all([
+        sendPrompt(input, 'complex').catch(e => {
+          console.error('Error with complex model:', e);
           return null;
         }),
-        sendPrompt(input, '8bit').catch(e => {
-          console.error('Error with 8bit model:', e);
+        sendPrompt(input, 'medium').catch(e => {
+          console.error('Error with medium model:', e);
           return null;
         }),
-        sendPrompt(input, '4bit').catch(e => {
-          console.error('Error with 4bit model:', e);
+        sendPrompt(input, 'simple').catch(e => {
+          console.error('Error with simple model:', e);
           return null;
         })
       ]);
 
-      if (!fullModelResponse && !eightBitResponse && !fourBitResponse) {
+      if (!complexResponse && !mediumResponse && !simpleResponse) {
         throw new Error('All model requests failed');
       }
 
       setComparisonResults({
-        full: fullModelResponse,
-        '8bit': eightBitResponse,
-        '4bit': fourBitResponse,
+        complex: complexResponse,
+        medium: mediumResponse,
+        simple: simpleResponse,
       });
     } catch (error) {
       console.error('Error running comparison:', error);
@@ -76,13 +78,14 @@ const ComparisonMode: React.FC = () => {
       <div className="mt-4 grid grid-cols-1 sm:grid-cols-2 lg:grid-cols-3 gap-4">
         {Object.entries(comparisonResults).map(([model, result]) => (
           <div key={model} className="bg-white p-4 rounded shadow">
-            <h3 className="font-bold mb-2 text-lg">{model === 'full' ? 'Full Model' : `${model} Model`}</h3>
+            <h3 className="font-bold mb-2 text-lg">{TIER_LABELS[model as ModelTier]}</h3>
             {result ? (
               <>
                 <p className="mb-2 text-sm sm:text-base">{result.response}</p>
                 <ul className="text-xs sm:text-sm space-y-1">
-                  <li>Latency: {result.metrics.latency}ms</li>
-                  <li>Memory Usage: {result.metrics.memoryUsage}GB</li>
+                  <li>Latency: {result.metrics.latency.toFixed(0)}ms</li>
+                  <li>Tokens: {result.metrics.tokens.prompt ?? '-'} prompt / {result.metrics.tokens.completion ?? '-'} completion</li>
+                  <li>Memory Usage: {result.metrics.memoryUsage.toFixed(2)}GB</li>
                   <li>Task Complexity: {result.metrics.taskComplexity}</li>
                 </ul>
               </>
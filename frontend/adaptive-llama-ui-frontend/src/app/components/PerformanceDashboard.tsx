@@ -11,13 +11,13 @@ const PerformanceDashboard: React.FC = () => {
   const { apiResponse, cumulativeMetrics } = useAppContext();
 
   const modelUsageData = {
-    labels: ['Full Model', '8-bit Model', '4-bit Model'],
+    labels: ['Simple (8B)', 'Medium (70B)', 'Complex (405B)'],
     datasets: [
       {
         data: apiResponse ? [
-            apiResponse.metrics.modelUsage.full,
-            apiResponse.metrics.modelUsage['8bit'],
-            apiResponse.metrics.modelUsage['4bit'],
+            apiResponse.metrics.modelUsage.simple,
+            apiResponse.metrics.modelUsage.medium,
+            apiResponse.metrics.modelUsage.complex,
         ] : [0, 0, 0],
         backgroundColor: [
           'rgba(255, 99, 132, 0.5)',
@@ -75,7 +75,7 @@ const PerformanceDashboard: React.FC = () => {
         <div className="mb-4 sm:mb-0">
           <h3 className="font-semibold text-sm sm:text-base">Memory Savings</h3>
           <p className="text-xl sm:text-2xl font-bold">{apiResponse ? `${apiResponse.metrics.memorySavings.toFixed(2)}%` : 'N/A'}</p>
-          <p className="text-xs sm:text-sm text-gray-500">Compared to always using full model</p>
+          <p className="text-xs sm:text-sm text-gray-500">Compared to always using the 405B model</p>
         </div>
       </div>
       {apiResponse && (
@@ -83,8 +83,22 @@ const PerformanceDashboard: React.FC = () => {
           <h3 className="font-semibold text-sm sm:text-base">Latest Request Performance</h3>
           <ul className="mt-2 space-y-1 text-xs sm:text-sm">
             <li>Model Used: <span className="font-bold">{apiResponse.model}</span></li>
-            <li>Latency: <span className="font-bold">{apiResponse.metrics.latency}ms</span></li>
-            <li>Memory Usage: <span className="font-bold">{apiResponse.metrics.memoryUsage}GB</span></li>
+            <li>Latency: <span className="font-bold">{apiResponse.metrics.latency.toFixed(0)}ms</span></li>
+            <li>
+              Phases:{' '}
+              <span className="font-bold">
+                {Object.entries(apiResponse.metrics.phases)
+                  .filter(([, ms]) => ms !== null)
+                  .map(([phase, ms]) => `${phase} ${(ms as number).toFixed(0)}ms`)
+                  .join(' · ')}
+              </span>
+            </li>
+            <li>
+              Tokens: <span className="font-bold">
+                {apiResponse.metrics.tokens.prompt ?? '-'} prompt / {apiResponse.metrics.tokens.completion ?? '-'} completion
+              </span>
+            </li>
+            <li>Memory Usage: <span className="font-bold">{apiResponse.metrics.memoryUsage.toFixed(2)}GB</span></li>
           </ul>
         </div>
       )}
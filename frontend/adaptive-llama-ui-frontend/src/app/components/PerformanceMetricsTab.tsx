@@ -70,15 +70,15 @@ const PerformanceMetricsTab: React.FC = () => {
           <ul className="space-y-2 text-sm sm:text-base">
             <li className="flex items-center flex-wrap">
               <span className="mr-1">Latency:</span>
-              <span className="font-bold">{apiResponse.metrics.latency}ms</span>
-              <CustomTooltip content="The time taken to process the input and generate a response.">
+              <span className="font-bold">{apiResponse.metrics.latency.toFixed(0)}ms</span>
+              <CustomTooltip content="End-to-end time: queueing, classification, model loading, prefill and decode.">
                 <span className="ml-1 cursor-help text-gray-500">ⓘ</span>
               </CustomTooltip>
             </li>
             <li className="flex items-center flex-wrap">
               <span className="mr-1">Memory Usage:</span>
-              <span className="font-bold">{apiResponse.metrics.memoryUsage}GB</span>
-              <CustomTooltip content="The amount of memory used by the model during processing.">
+              <span className="font-bold">{apiResponse.metrics.memoryUsage.toFixed(2)}GB</span>
+              <CustomTooltip content="The resident size of the model tier that served the request.">
                 <span className="ml-1 cursor-help text-gray-500">ⓘ</span>
               </CustomTooltip>
             </li>
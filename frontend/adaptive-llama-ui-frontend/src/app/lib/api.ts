@@ -2,19 +2,33 @@ export interface ApiResponse {
     response: string;
     model: string;
     metrics: {
-      latency: number;
-      memoryUsage: number;
+      latency: number;  // End-to-end, in ms
+      phases: {  // In ms; prefill is null when the generation path does not separate it from decode
+        queue: number | null;
+        classify: number | null;
+        load: number | null;
+        prefill: number | null;
+        decode: number | null;
+      };
+      tokens: {
+        prompt: number | null;
+        completion: number | null;
+      };
+      memoryUsage: number;  // Resident size of the tier that served the request, in GB
       taskComplexity: string;
       modelUsage: {
-        full: number;
-        '8bit': number;
-        '4bit': number;
+        simple: number;
+        medium: number;
+        complex: number;
       };
-      memorySavings: number;
+      memorySavings: number;  // Percent saved compared with serving from the complex tier
+      memorySavedBytes: number;
     };
   }
   
-  export async function sendPrompt(prompt: string, model: 'full' | '8bit' | '4bit' = 'full'): Promise<ApiResponse> {
+  export type ModelTier = 'simple' | 'medium' | 'complex';
+
+  export async function sendPrompt(prompt: string, model: 'full' | ModelTier = 'full'): Promise<ApiResponse> {
     const response = await fetch('/api/proxy', {
       method: 'POST',
       headers: {